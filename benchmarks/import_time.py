@@ -0,0 +1,83 @@
+"""
+Import time of requestez and its subpackages, each measured in fresh interpreters (median of --runs).
+Also lists which heavy third party modules an import pulls in and the top -X importtime contributors.
+
+    python benchmarks/import_time.py                     # all modules
+    python benchmarks/import_time.py requestez --top 15  # one module, bigger contributor table
+    python benchmarks/import_time.py --max-ms 120        # exit code 1 if `import requestez` is slower
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Optional, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES = ["requestez", "requestez.parsers", "requestez.encryption", "requestez.kurl", "requestez.asynchronous"]
+HEAVY = ["requests", "bs4", "m3u8", "yarl", "regex", "curl_cffi", "httpx", "moviepy", "asyncio", "multiprocessing"]
+
+_PROBE = """
+import sys, time, json
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps([elapsed, [name for name in {heavy!r} if name in sys.modules]]))
+"""
+
+
+def _run(args: List[str]) -> subprocess.CompletedProcess:
+    env = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    return subprocess.run([sys.executable, *args], capture_output=True, text=True, env=env, cwd=ROOT, check=True)
+
+
+def measure(module: str, runs: int) -> Tuple[float, List[str]]:
+    """Median import seconds over runs fresh interpreters, and the heavy modules the import loaded."""
+    timings = []
+    loaded: List[str] = []
+    for _ in range(runs):
+        elapsed, loaded = json.loads(_run(["-c", _PROBE.format(module=module, heavy=HEAVY)]).stdout)
+        timings.append(elapsed)
+    return statistics.median(timings), loaded
+
+
+def contributors(module: str, top: int) -> List[Tuple[int, int, str]]:
+    """(self us, cumulative us, module) of the top imports by self time, parsed from -X importtime."""
+    rows = []
+    for line in _run(["-X", "importtime", "-c", f"import {module}"]).stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        rows.append((int(own), int(cumulative), name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("modules", nargs="*", default=MODULES, help="modules to time (default: requestez and subpackages)")
+    parser.add_argument("--runs", type=int, default=7, help="fresh interpreters per module, the median is reported")
+    parser.add_argument("--top", type=int, default=8, help="-X importtime contributors listed per module")
+    parser.add_argument("--max-ms", type=float, help="budget for `import requestez`, exit code 1 when exceeded")
+    args = parser.parse_args(argv)
+
+    results: Dict[str, float] = {}
+    for module in args.modules:
+        elapsed, loaded = measure(module, args.runs)
+        results[module] = elapsed
+        print(f"\n{module:<28} {elapsed * 1000:>8.1f} ms   heavy: {', '.join(loaded) or '-'}")
+        for own, cumulative, name in contributors(module, args.top):
+            print(f"    {name:<40} {own / 1000:>8.1f} ms self {cumulative / 1000:>8.1f} ms cumulative")
+
+    if args.max_ms is not None:
+        elapsed = results.get("requestez")
+        if elapsed is None:
+            elapsed, _ = measure("requestez", args.runs)
+        if elapsed * 1000 > args.max_ms:
+            print(f"\nimport requestez took {elapsed * 1000:.1f} ms, over the {args.max_ms:.1f} ms budget")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,277 @@
+"""
+Micro benchmarks for the parser and encryption hot paths, on synthetic corpora (multi-MB html, nested escaped json,
+packed scripts, long playlists). Reports time per call and the tracemalloc allocation peak, and compares against a
+saved baseline so optimisations can be measured and regressions caught.
+
+    python benchmarks/micro.py                               # run everything
+    python benchmarks/micro.py -k aes -k packer              # only benchmarks whose name contains aes or packer
+    python benchmarks/micro.py --save baseline.json          # record a baseline
+    python benchmarks/micro.py --compare baseline.json       # exit code 1 if anything got slower than --threshold
+"""
+import argparse
+import json
+import os
+import platform
+import re
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from requestez import parsers  # noqa: E402
+from requestez.encryption import aes_dec, aes_enc, bytes_to_key, clear_caches  # noqa: E402
+from requestez.encryption.unpack import PACKER, Unbaser  # noqa: E402
+
+# name -> factory building the corpus once and returning the zero argument callable to time
+BENCHMARKS: Dict[str, Callable[[], Callable[[], object]]] = {}
+
+
+def benchmark(name: str):
+    def register(factory):
+        BENCHMARKS[name] = factory
+        return factory
+    return register
+
+
+# corpora
+
+def html_page(mb: float = 2.0) -> str:
+    row = ('<tr class="row"><td><a href="/watch/{0}?ref=list&amp;page=1">Episode {0} &ndash; title</a></td>'
+           '<td data-id="{0}">&quot;{0}&quot;</td><td><script>var cfg_{0} = {{file: "https:\\/\\/cdn.example\\/v{0}.m3u8", '
+           'label: "720p", id: {0}}};</script></td></tr>\n')
+    rows = []
+    size = 0
+    index = 0
+    while size < mb * 1024 * 1024:
+        rows.append(row.format(index))
+        size += len(rows[-1])
+        index += 1
+    return "<html><head><title>bench</title></head><body><table>\n" + "".join(rows) + "</table></body></html>"
+
+
+def nested_json(depth: int = 4, width: int = 40) -> str:
+    """json whose string values are themselves (html escaped) json, several levels deep."""
+    inner = {"id": 1, "name": "leaf", "values": list(range(20))}
+    for level in range(depth):
+        inner = {f"k{i}": (json.dumps(inner) if i % 2 else {"n": i, "level": level}) for i in range(width)}
+    return json.dumps(inner).replace('"', "&quot;")
+
+
+def packed_script(words: int = 20000, radix: int = 62) -> str:
+    script = " ".join(f"var item{i} = document.getElementById('node{i % 997}');" for i in range(words // 4))
+    tokens = re.findall(r"\b\w+\b", script)
+    counts: Dict[str, int] = {}
+    for token in tokens:
+        counts[token] = counts.get(token, 0) + 1
+    symbols = sorted(counts, key=lambda token: (-counts[token], token))
+    unbaser = Unbaser(radix)
+    encoded = {token: unbaser.encode(index) for index, token in enumerate(symbols)}
+    payload = re.sub(r"\b\w+\b", lambda match: encoded[match.group(0)], script).replace("'", "\\'")
+    return ("<script>eval(function(p,a,c,k,e,d){while(c--)if(k[c])p=p.replace(new RegExp('\\\\b'+c.toString(a)"
+            "+'\\\\b','g'),k[c]);return p}('%s',%d,%d,'%s'.split('|'),0,{}))</script>"
+            % (payload, radix, len(symbols), "|".join(symbols)))
+
+
+def playlist(segments: int = 20000) -> str:
+    lines = ["#EXTM3U", "#EXT-X-VERSION:3", "#EXT-X-TARGETDURATION:6", "#EXT-X-MEDIA-SEQUENCE:0"]
+    for index in range(segments):
+        lines += [f"#EXTINF:6.006,", f"https://cdn.example/hls/720p/segment{index:06d}.ts?token=abcdef{index}"]
+    lines.append("#EXT-X-ENDLIST")
+    return "\n".join(lines)
+
+
+_KEY = bytes(range(32))
+_IV = bytes(range(16))
+
+
+# benchmarks
+
+@benchmark("parsers.regex 2MB")
+def _regex():
+    page = html_page()
+    return lambda: parsers.regex(page, r'file:"(.*?)"')
+
+
+@benchmark("parsers.get_val_js_var 2MB")
+def _get_val_js_var():
+    page = html_page()
+    return lambda: parsers.get_val_js_var("label", page)
+
+
+@benchmark("parsers.html 2MB")
+def _html():
+    page = html_page()
+    return lambda: parsers.html(page)
+
+
+@benchmark("parsers.load nested escaped json")
+def _load():
+    document = nested_json(depth=3, width=30)
+    return lambda: parsers.load(document, iterate=True)
+
+
+@benchmark("parsers.stringify nested dict")
+def _stringify():
+    document = json.loads(nested_json(depth=3, width=30).replace("&quot;", '"'))
+    # stringify mutates its argument, so every call gets a fresh shallow copy of the top level
+    return lambda: parsers.stringify(dict(document))
+
+
+@benchmark("parsers.m3u8 20k segments")
+def _m3u8():
+    text = playlist()
+    return lambda: parsers.m3u8(text)
+
+
+@benchmark("aes_enc 1KB")
+def _aes_enc_small():
+    text = "x" * 1024
+    return lambda: aes_enc(_KEY, _IV, text)
+
+
+@benchmark("aes_dec 1KB")
+def _aes_dec_small():
+    payload = aes_enc(_KEY, _IV, "x" * 1024)
+    return lambda: aes_dec(_KEY, _IV, payload)
+
+
+@benchmark("aes_dec 4MB")
+def _aes_dec_large():
+    payload = aes_enc(_KEY, _IV, "x" * 4 * 1024 * 1024)
+    return lambda: aes_dec(_KEY, _IV, payload)
+
+
+@benchmark("bytes_to_key cached")
+def _bytes_to_key_cached():
+    return lambda: bytes_to_key(b"passphrase", b"saltsalt")
+
+
+@benchmark("bytes_to_key cold")
+def _bytes_to_key_cold():
+    def run():
+        clear_caches()
+        return bytes_to_key(b"passphrase", b"saltsalt")
+    return run
+
+
+@benchmark("PACKER 20k words")
+def _packer():
+    page = packed_script()
+    return lambda: PACKER(page)
+
+
+# measurement
+
+def time_per_call(func: Callable[[], object], min_time: float, repeat: int) -> Tuple[int, List[float]]:
+    """Calibrates a loop count running at least min_time / repeat, then returns it with the per call times."""
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time / repeat or loops >= 1 << 20:
+            break
+        loops *= 2 if elapsed == 0 else max(2, min(10, int(min_time / repeat / elapsed) + 1))
+    timings = [elapsed / loops]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        timings.append((time.perf_counter() - start) / loops)
+    return loops, timings
+
+
+def allocations(func: Callable[[], object]) -> Tuple[int, int]:
+    """(peak, retained) bytes allocated by one call."""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = func()
+        current, peak = tracemalloc.get_traced_memory()
+        del result
+        return peak - before, current - before
+    finally:
+        tracemalloc.stop()
+
+
+def run(names: List[str], min_time: float, repeat: int) -> Dict[str, Dict]:
+    results = {}
+    for name in names:
+        func = BENCHMARKS[name]()
+        func()  # warm up caches and lazy imports
+        loops, timings = time_per_call(func, min_time, repeat)
+        peak, retained = allocations(func)
+        results[name] = {"loops": loops, "best_us": min(timings) * 1e6, "median_us": statistics.median(timings) * 1e6,
+                         "peak_kb": peak / 1024, "retained_kb": retained / 1024}
+        print(f"{name:<36} {results[name]['best_us']:>14.1f} us  {results[name]['peak_kb']:>10.1f} KB peak",
+              file=sys.stderr)
+    return results
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], threshold: float) -> List[str]:
+    """Prints a comparison table and returns the names slower than threshold times the baseline."""
+    regressions = []
+    print(f"\n{'benchmark':<36} {'baseline us':>12} {'now us':>12} {'ratio':>7} {'peak KB':>10} {'was':>10}")
+    for name, result in results.items():
+        old = baseline.get(name)
+        if old is None:
+            print(f"{name:<36} {'-':>12} {result['best_us']:>12.1f} {'new':>7} {result['peak_kb']:>10.1f} {'-':>10}")
+            continue
+        ratio = result["best_us"] / old["best_us"] if old["best_us"] else float("inf")
+        flag = ""
+        if ratio > threshold:
+            flag = "  SLOWER"
+            regressions.append(name)
+        elif ratio < 1 / threshold:
+            flag = "  faster"
+        print(f"{name:<36} {old['best_us']:>12.1f} {result['best_us']:>12.1f} {ratio:>7.2f} "
+              f"{result['peak_kb']:>10.1f} {old['peak_kb']:>10.1f}{flag}")
+    return regressions
+
+
+def print_results(results: Dict[str, Dict]):
+    print(f"\n{'benchmark':<36} {'best us':>12} {'median us':>12} {'loops':>7} {'peak KB':>10} {'retained KB':>12}")
+    for name, result in results.items():
+        print(f"{name:<36} {result['best_us']:>12.1f} {result['median_us']:>12.1f} {result['loops']:>7} "
+              f"{result['peak_kb']:>10.1f} {result['retained_kb']:>12.1f}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-k", dest="filters", action="append", default=[],
+                        help="only run benchmarks whose name contains this (repeatable)")
+    parser.add_argument("--min-time", type=float, default=1.0, help="seconds spent timing each benchmark")
+    parser.add_argument("--repeat", type=int, default=5, help="timed repeats, the best is compared")
+    parser.add_argument("--save", help="write the results as a baseline json file")
+    parser.add_argument("--compare", help="baseline json file to compare against")
+    parser.add_argument("--threshold", type=float, default=1.15, help="slowdown ratio reported as a regression")
+    parser.add_argument("--list", action="store_true", help="list the benchmarks and exit")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        print("\n".join(BENCHMARKS))
+        return 0
+    names = [name for name in BENCHMARKS if not args.filters or any(f in name for f in args.filters)]
+    results = run(names, args.min_time, args.repeat)
+    if args.save:
+        with open(args.save, "w") as file:
+            json.dump({"python": platform.python_version(), "platform": platform.platform(), "results": results},
+                      file, indent=2)
+    if not args.compare:
+        print_results(results)
+        return 0
+    with open(args.compare) as file:
+        baseline = json.load(file)["results"]
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) above x{args.threshold}: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,167 @@
+"""
+Local HTTP/1.1 stand-in server for the benchmarks, so they run offline and reproducibly.
+
+Routes:
+    /page?kb=N            synthetic html page of about N KB (default 32)
+    /json?items=N         json document with N items (default 100)
+    /file?size=N          N bytes of deterministic binary data (default 1 MB), honours Range
+    /hls/playlist.m3u8?segments=N&size=N   media playlist with N segments of size bytes
+    /hls/seg<i>.ts?size=N one segment
+    /redirect?hops=N      chain of N redirects ending at /json
+
+HTTP/2 is not served: the stdlib has no h2 support and the benchmarks must not depend on extra servers,
+so every backend is measured over HTTP/1.1 keep-alive connections.
+
+Run standalone with `python benchmarks/server.py [port]`.
+"""
+import json
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+from urllib.parse import parse_qs, urlsplit
+
+_BLOCK = bytes(range(256)) * 4096  # 1 MB of deterministic data
+
+
+def _int(query: Dict[str, list], name: str, default: int) -> int:
+    try:
+        return int(query[name][0])
+    except (KeyError, ValueError, IndexError):
+        return default
+
+
+def synthetic_page(kb: int) -> bytes:
+    row = ('<tr><td class="name"><a href="/item/{0}">item {0}</a></td><td>{0}</td>'
+           '<td><script>var price_{0} = {{"value": {0}, "currency": "EUR"}};</script></td></tr>\n')
+    rows = []
+    size = 0
+    index = 0
+    while size < kb * 1024:
+        rows.append(row.format(index))
+        size += len(rows[-1])
+        index += 1
+    return ("<!DOCTYPE html><html><head><meta charset=\"utf-8\"><title>bench</title></head><body><table>\n"
+            + "".join(rows) + "</table></body></html>").encode()
+
+
+def file_bytes(size: int, start: int = 0) -> bytes:
+    out = bytearray()
+    position = start
+    end = start + size
+    while position < end:
+        offset = position % len(_BLOCK)
+        take = min(len(_BLOCK) - offset, end - position)
+        out += _BLOCK[offset:offset + take]
+        position += take
+    return bytes(out)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # headers and body go out in separate writes, without TCP_NODELAY delayed ACKs add ~40ms per response
+    disable_nagle_algorithm = True
+    # cached bodies, the benchmarks should measure the client and not the server
+    _pages: Dict[int, bytes] = {}
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, body: bytes, content_type: str, status: int = 200, headers: Optional[Dict[str, str]] = None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def do_HEAD(self):
+        self.do_GET()
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length)
+        self._send(json.dumps({"received": len(body)}).encode(), "application/json")
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        path = url.path
+        if path == "/page":
+            kb = _int(query, "kb", 32)
+            page = self._pages.get(kb)
+            if page is None:
+                page = self._pages[kb] = synthetic_page(kb)
+            self._send(page, "text/html; charset=utf-8")
+        elif path == "/json":
+            items = _int(query, "items", 100)
+            body = json.dumps({"items": [{"id": i, "name": f"item {i}", "tags": ["a", "b"]} for i in range(items)]})
+            self._send(body.encode(), "application/json")
+        elif path == "/file" or (path.startswith("/hls/seg") and path.endswith(".ts")):
+            size = _int(query, "size", 1024 * 1024 if path == "/file" else 188 * 1000)
+            start = 0
+            status = 200
+            headers = {"Accept-Ranges": "bytes"}
+            requested = self.headers.get("Range", "")
+            if requested.startswith("bytes=") and requested.endswith("-"):
+                start = min(int(requested[6:-1]), size)
+                status = 206
+                headers["Content-Range"] = f"bytes {start}-{size - 1}/{size}"
+            content_type = "application/octet-stream" if path == "/file" else "video/mp2t"
+            self._send(file_bytes(size - start, start), content_type, status, headers)
+        elif path == "/hls/playlist.m3u8":
+            segments = _int(query, "segments", 10)
+            size = _int(query, "size", 188 * 1000)
+            lines = ["#EXTM3U", "#EXT-X-VERSION:3", "#EXT-X-TARGETDURATION:4", "#EXT-X-MEDIA-SEQUENCE:0"]
+            for index in range(segments):
+                lines += ["#EXTINF:4.0,", f"seg{index}.ts?size={size}"]
+            lines.append("#EXT-X-ENDLIST")
+            self._send("\n".join(lines).encode(), "application/vnd.apple.mpegurl")
+        elif path == "/redirect":
+            hops = _int(query, "hops", 1)
+            location = f"/redirect?hops={hops - 1}" if hops > 1 else "/json?items=1"
+            self._send(b"", "text/plain", 302, {"Location": location})
+        else:
+            self._send(b"not found", "text/plain", 404)
+
+
+class StandInServer:
+    """
+    Threaded stand-in server on 127.0.0.1, usable as a context manager.
+
+    :param port: 0 picks a free port
+    """
+    def __init__(self, port: int = 0):
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), _Handler)
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def start(self) -> "StandInServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="stand-in-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+if __name__ == "__main__":
+    server = StandInServer(int(sys.argv[1]) if len(sys.argv) > 1 else 8765)
+    print("serving on", server.url)
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,207 @@
+"""
+Session benchmarks against the local stand-in server (benchmarks/server.py), no network needed.
+
+Measures requests/sec, latency percentiles and allocation peak for Session, kurl.Session,
+asynchronous.Session and kurl.AsyncSession, plus download and download_m3u8 throughput.
+
+    python benchmarks/sessions.py                       # everything, default sizes
+    python benchmarks/sessions.py --requests 2000 --concurrency 64 --only async kurl_async
+    python benchmarks/sessions.py --json results.json   # machine readable results
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from server import StandInServer  # noqa: E402
+from requestez import Session  # noqa: E402
+from requestez.asynchronous import Session as AsyncSession  # noqa: E402
+from requestez.helpers import pbar, set_log_level  # noqa: E402
+from requestez.kurl import AsyncSession as KurlAsyncSession, Session as KurlSession  # noqa: E402
+
+SYNC_SESSIONS = {"requests": Session, "kurl": KurlSession}
+ASYNC_SESSIONS = {"async": AsyncSession, "kurl_async": KurlAsyncSession}
+
+
+def percentile(samples: List[float], q: float) -> float:
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, int(round(q * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def summarize(name: str, latencies: List[float], elapsed: float, peak: int) -> Dict:
+    return {
+        "name": name,
+        "requests": len(latencies),
+        "rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 0.5) * 1000,
+        "p90_ms": percentile(latencies, 0.9) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "mean_ms": statistics.fmean(latencies) * 1000 if latencies else 0.0,
+        "peak_kb": peak / 1024,
+    }
+
+
+def allocation_peak(run: Callable[[], None]) -> int:
+    """Peak traced allocation of one (short) extra run, kept out of the timed runs since tracing slows them."""
+    tracemalloc.start()
+    try:
+        run()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def bench_sync(name: str, factory, url: str, count: int) -> Dict:
+    session = factory()
+
+    def run(n: int, latencies: List[float]):
+        for _ in range(n):
+            start = time.perf_counter()
+            session.get(url, notify=False, text=False)
+            latencies.append(time.perf_counter() - start)
+
+    run(min(20, count), [])  # warm up the connection pool
+    latencies: List[float] = []
+    start = time.perf_counter()
+    run(count, latencies)
+    elapsed = time.perf_counter() - start
+    peak = allocation_peak(lambda: run(min(50, count), []))
+    return summarize(name, latencies, elapsed, peak)
+
+
+def bench_async(name: str, factory, url: str, count: int, concurrency: int) -> Dict:
+    async def run(session, n: int, latencies: List[float]):
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one():
+            async with semaphore:
+                start = time.perf_counter()
+                await session.get(url, read_as="bytes")
+                latencies.append(time.perf_counter() - start)
+
+        await asyncio.gather(*(one() for _ in range(n)))
+
+    async def main():
+        async with factory() as session:
+            await run(session, min(concurrency, count), [])
+            latencies: List[float] = []
+            start = time.perf_counter()
+            await run(session, count, latencies)
+            elapsed = time.perf_counter() - start
+            tracemalloc.start()
+            try:
+                await run(session, min(50, count), [])
+                peak = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+            return summarize(name, latencies, elapsed, peak)
+
+    return asyncio.run(main())
+
+
+def bench_download(name: str, factory, url: str, size: int, repeat: int) -> Dict:
+    session = factory()
+    folder = tempfile.mkdtemp(prefix="requestez-bench-")
+    try:
+        timings = []
+        for index in range(repeat):
+            path = os.path.join(folder, f"file{index}.bin")
+            start = time.perf_counter()
+            session.download(f"{url}/file?size={size}", path, continue_download=False, quiet=True)
+            timings.append(time.perf_counter() - start)
+            assert os.path.getsize(path) == size
+        best = min(timings)
+        return {"name": name, "bytes": size, "best_s": best, "mb_per_s": size / best / 1e6,
+                "median_s": statistics.median(timings)}
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+def bench_m3u8(name: str, factory, url: str, segments: int, segment_size: int, threads: int) -> Dict:
+    session = factory()
+    folder = tempfile.mkdtemp(prefix="requestez-bench-")
+    try:
+        playlist = f"{url}/hls/playlist.m3u8?segments={segments}&size={segment_size}"
+        start = time.perf_counter()
+        _, count, _ = session.download_m3u8(playlist, os.path.join(folder, "hls"), multiple_threads=threads > 1,
+                                            max_threads=max(threads, 1))
+        elapsed = time.perf_counter() - start
+        return {"name": name, "segments": count, "seconds": elapsed,
+                "mb_per_s": segments * segment_size / elapsed / 1e6}
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+def print_table(title: str, rows: List[Dict]):
+    if not rows:
+        return
+    print(f"\n{title}")
+    columns = list(rows[0])
+    widths = {column: max(len(column), *(len(_cell(row[column])) for row in rows)) for column in columns}
+    print("  ".join(column.ljust(widths[column]) for column in columns))
+    for row in rows:
+        print("  ".join(_cell(row[column]).ljust(widths[column]) for column in columns))
+
+
+def _cell(value) -> str:
+    return f"{value:.2f}" if isinstance(value, float) else str(value)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500, help="requests per session")
+    parser.add_argument("--concurrency", type=int, default=32, help="in flight requests for async sessions")
+    parser.add_argument("--route", default="/json?items=20", help="route requested by the request benchmarks")
+    parser.add_argument("--file-size", type=int, default=32 * 1024 * 1024, help="bytes per download")
+    parser.add_argument("--downloads", type=int, default=3, help="downloads per session (best is reported)")
+    parser.add_argument("--segments", type=int, default=40, help="segments in the m3u8 playlist")
+    parser.add_argument("--segment-size", type=int, default=256 * 1024)
+    parser.add_argument("--threads", type=int, default=8, help="download_m3u8 worker threads (1 = sequential)")
+    parser.add_argument("--only", nargs="*", choices=list(SYNC_SESSIONS) + list(ASYNC_SESSIONS),
+                        help="sessions to benchmark (default all)")
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args(argv)
+
+    selected = set(args.only or list(SYNC_SESSIONS) + list(ASYNC_SESSIONS))
+    set_log_level("e")
+    pbar.headless = True
+    results = {"python": platform.python_version(), "platform": platform.platform(), "requests": [],
+               "downloads": [], "m3u8": []}
+    with StandInServer() as server:
+        url = server.url + args.route
+        for name, factory in SYNC_SESSIONS.items():
+            if name in selected:
+                results["requests"].append(bench_sync(name, factory, url, args.requests))
+        for name, factory in ASYNC_SESSIONS.items():
+            if name in selected:
+                results["requests"].append(bench_async(name, factory, url, args.requests, args.concurrency))
+        for name, factory in SYNC_SESSIONS.items():
+            if name in selected:
+                results["downloads"].append(bench_download(name, factory, server.url, args.file_size, args.downloads))
+                results["m3u8"].append(bench_m3u8(name, factory, server.url, args.segments, args.segment_size,
+                                                  args.threads))
+
+    print_table(f"GET {args.route} x{args.requests}", results["requests"])
+    print_table(f"download {args.file_size} bytes", results["downloads"])
+    print_table(f"download_m3u8 {args.segments} x {args.segment_size} bytes", results["m3u8"])
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(results, file, indent=2)
+    return results
+
+
+if __name__ == "__main__":
+    main()
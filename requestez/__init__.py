@@ -1,6 +1,5 @@
-import requests
 from typing import Any
-from .base import BaseSession
+from .base import BaseSession, DownloadStalled
 
 class Session(BaseSession):
     """
@@ -8,7 +7,11 @@ class Session(BaseSession):
     """
     def __init__(self, human_browsing=False):
         super().__init__(human_browsing=human_browsing)
+        import requests
         self.session = requests.Session()
 
     def _perform_request(self, method: str, url: str, **kwargs) -> Any:
         return self.session.request(method, url, **kwargs)
+
+    def _cookie_jar(self):
+        return self.session.cookies
@@ -1,18 +1,29 @@
-import httpx
 import time
 import asyncio
-from typing import Optional, Any, Dict, List, Tuple
+from typing import Optional, Any, Dict, Tuple, TYPE_CHECKING
 from ..base import BaseAsyncSession
 
+if TYPE_CHECKING:
+    import httpx
+
+# httpx trace event -> telemetry phase (first completion wins, later requests on a reused connection skip them)
+_TRACE_PHASES = {
+    "connection.connect_tcp.complete": "connect",
+    "connection.start_tls.complete": "tls",
+    "http11.receive_response_headers.complete": "ttfb",
+    "http2.receive_response_headers.complete": "ttfb",
+}
+
 class Session(BaseAsyncSession):
     """
     Standard Asynchronous Session using httpx.
     """
     def __init__(self):
         super().__init__()
-        self._client: Optional[httpx.AsyncClient] = None
+        self._client: Optional["httpx.AsyncClient"] = None
 
     async def __aenter__(self):
+        import httpx
         self._client = httpx.AsyncClient(follow_redirects=True)
         return self
 
@@ -21,41 +32,35 @@ class Session(BaseAsyncSession):
             await self._client.aclose()
 
     @property
-    def client(self) -> httpx.AsyncClient:
+    def client(self) -> "httpx.AsyncClient":
         if self._client is None or self._client.is_closed:
             raise RuntimeError("Session is not active. Use 'async with Session() as session:' syntax.")
         return self._client
 
     async def _perform_request(self, method: str, url: str, **kwargs) -> Any:
-        if "follow_redirects" not in kwargs:
+        if "allow_redirects" in kwargs:
+            # requests / curl_cffi spelling, so callers (and the hybrid session) can use one for every backend
+            kwargs["follow_redirects"] = kwargs.pop("allow_redirects")
+        elif "follow_redirects" not in kwargs:
             kwargs["follow_redirects"] = True
-        return await self.client.request(method, url, **kwargs)
-
-    async def save_data(self) -> Dict[str, Any]:
-        cookies: List[Dict[str, Any]] = []
-        for cookie in self.client.cookies.jar:
-            cookies.append({
-                "name": cookie.name,
-                "value": cookie.value,
-                "domain": cookie.domain,
-                "path": cookie.path,
-                "expires": cookie.expires,
-                "secure": cookie.secure,
-                "httponly": cookie.has_nonstandard_attr("HttpOnly"),
-            })
-        return {"cookies": cookies, "current_url": self._current_url}
-
-    async def load_data(self, data: Dict[str, Any]):
-        self.client.cookies.clear()
-        self._current_url = data.get("current_url")
-        now = int(time.time())
-        for cookie_dict in data.get("cookies", []):
-            expires = cookie_dict.get("expires")
-            if expires is not None and expires < now:
-                continue
-            self.client.cookies.set(
-                name=cookie_dict["name"],
-                value=cookie_dict["value"],
-                domain=cookie_dict.get("domain", ""),
-                path=cookie_dict.get("path", "/"),
-            )
\ No newline at end of file
+        if not self._telemetry_active() or "extensions" in kwargs:
+            return await self.client.request(method, url, **kwargs)
+        # httpx reports connection phases through the trace extension
+        start = time.perf_counter()
+        timings: Dict[str, float] = {}
+
+        async def trace(event_name: str, info: Dict[str, Any]):
+            phase = _TRACE_PHASES.get(event_name)
+            if phase is not None:
+                timings.setdefault(phase, time.perf_counter() - start)
+
+        kwargs["extensions"] = {"trace": trace}
+        response = await self.client.request(method, url, **kwargs)
+        response.extensions["requestez_timings"] = timings
+        return response
+
+    def _timings(self, response: Any) -> Dict[str, float]:
+        return response.extensions.get("requestez_timings", {})
+
+    def _cookie_jar(self):
+        return self.client.cookies.jar
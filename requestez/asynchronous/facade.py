@@ -0,0 +1,192 @@
+"""
+Synchronous facade over an async session.
+FacadeSession keeps the BaseSession API (get, post, where_to, download, download_m3u8, Referer tracking) but performs
+every request on an asyncio loop running in one background thread, so get_many can keep thousands of requests in
+flight from synchronous code without a thread per request.
+"""
+import asyncio
+import concurrent.futures
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+from ..base import BaseAsyncSession, BaseSession
+from ..middleware import Request
+from ..response import Response, decode_response
+from . import Session as HttpxSession
+
+
+async def _next_chunk(chunks) -> Optional[bytes]:
+    try:
+        return await chunks.__anext__()
+    except StopAsyncIteration:
+        return None
+
+
+class _StreamedResponse:
+    """Streamed backend response whose body is pulled chunk by chunk from the facade's loop."""
+    def __init__(self, facade: "FacadeSession", response: Any):
+        self._facade = facade
+        self._response = response
+
+    def __getattr__(self, name):
+        return getattr(self._response, name)
+
+    def iter_content(self, chunk_size: Optional[int] = None):
+        response = self._response
+        if hasattr(response, "aiter_bytes"):
+            chunks = response.aiter_bytes(chunk_size)
+        else:
+            chunks = response.aiter_content(chunk_size)
+        try:
+            while True:
+                chunk = self._facade._call(_next_chunk(chunks))
+                if chunk is None:
+                    return
+                if chunk:
+                    yield chunk
+        finally:
+            self.close()
+
+    def close(self):
+        self._facade._call(self._response.aclose())
+
+
+class FacadeSession(BaseSession):
+    """
+    Synchronous Session running its requests on a background asyncio loop.
+
+        with FacadeSession() as session:
+            page = session.get(url)                  # blocking, like requestez.Session
+            futures = session.get_many(urls)         # all in flight at once
+            pages = [future.result() for future in futures]
+
+    :param backend: the async session doing the work (not entered yet), asynchronous.Session() by default,
+        kurl.AsyncSession() for impersonation
+    :param max_concurrency: requests in flight at the same time, the others wait on the loop.
+        get_many runs the sync hooks of the session's middlewares (e.g. Coalesce) on up to as many threads and decodes
+        the bodies on a small thread pool, so neither stalls the loop
+    """
+    def __init__(self, human_browsing=False, backend: Optional[BaseAsyncSession] = None,
+                 max_concurrency: int = 1000):
+        super().__init__(human_browsing=human_browsing)
+        self.backend = backend if backend is not None else HttpxSession()
+        self._httpx = isinstance(self.backend, HttpxSession)
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="requestez-facade", daemon=True)
+        self._thread.start()
+        self._limit: Optional[asyncio.Semaphore] = None
+        # threads are only started when a sync middleware hook runs, one per slot at most so a hook waiting for
+        # another request (a Coalesce follower) never takes the thread that request needs
+        self._hook_pool = concurrent.futures.ThreadPoolExecutor(max_concurrency, thread_name_prefix="requestez-hook")
+        # decoding is CPU work, more threads than the executor's default would not make it faster
+        self._decode_pool = concurrent.futures.ThreadPoolExecutor(thread_name_prefix="requestez-decode")
+        self._call(self._open(max_concurrency))
+        self._closed = False
+
+    async def _open(self, max_concurrency: int):
+        self._limit = asyncio.Semaphore(max_concurrency)
+        await self.backend.__aenter__()
+
+    def _submit(self, coroutine) -> concurrent.futures.Future:
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop)
+
+    def _call(self, coroutine) -> Any:
+        if threading.current_thread() is self._thread:
+            coroutine.close()
+            raise RuntimeError("FacadeSession methods block, they can't be called from its own event loop.")
+        return self._submit(coroutine).result()
+
+    def _adapt(self, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        """requests style keyword arguments (as BaseSession builds them) -> the backend's."""
+        kwargs = dict(kwargs)
+        kwargs.pop("stream", None)
+        # requests drops None headers (the unset Referer), httpx and curl_cffi would send or reject them
+        headers = {name: value for name, value in (kwargs.get("headers") or {}).items() if value is not None}
+        cookies = kwargs.pop("cookies", None)
+        if isinstance(cookies, str):
+            headers["Cookie"] = cookies
+        elif cookies:
+            kwargs["cookies"] = cookies
+        kwargs["headers"] = headers
+        if self._httpx:
+            if "allow_redirects" in kwargs:
+                kwargs["follow_redirects"] = kwargs.pop("allow_redirects")
+            timeout = kwargs.get("timeout")
+            if isinstance(timeout, tuple):
+                import httpx
+                kwargs["timeout"] = httpx.Timeout(timeout[1], connect=timeout[0])
+        return kwargs
+
+    async def _fetch(self, method: str, url: str, kwargs: Dict[str, Any]) -> Any:
+        stream = kwargs.get("stream", False)
+        kwargs = self._adapt(kwargs)
+        async with self._limit:
+            if not stream:
+                return await self.backend._perform_request(method, url, **kwargs)
+            if self._httpx:
+                follow_redirects = kwargs.pop("follow_redirects", True)
+                client = self.backend.client
+                response = await client.send(client.build_request(method, url, **kwargs), stream=True,
+                                             follow_redirects=follow_redirects)
+            else:
+                response = await self.backend.client.request(method, url, stream=True, **kwargs)
+            return _StreamedResponse(self, response)
+
+    def _perform_request(self, method: str, url: str, **kwargs) -> Any:
+        return self._call(self._fetch(method, url, kwargs))
+
+    def _cookie_jar(self):
+        return self.backend._cookie_jar()
+
+    def _timings(self, response: Any) -> Dict[str, float]:
+        return self.backend._timings(response)
+
+    async def _get_one(self, url: str, kwargs: Dict[str, Any], text: bool, lazy: bool) -> Any:
+        async def send(request: Request) -> Any:
+            # the backend's _transmit records the metrics and telemetry of the request
+            return await self.backend._transmit(request.method, request.url, **self._adapt(request.kwargs))
+
+        async with self._limit:
+            response = await self.middlewares.arun(self, Request("GET", url, kwargs), send, self._hook_pool)
+        if lazy:
+            return Response.from_backend(response, self.charsets)
+        if not text:
+            return response
+        # charset sniffing (or detection) is CPU work, on the loop it would stall every request in flight
+        return await asyncio.get_running_loop().run_in_executor(self._decode_pool, decode_response, response,
+                                                                self.charsets)
+
+    def get_many(self, urls: Iterable[str], headers: Optional[Dict[str, str]] = None,
+                 text: bool = True, lazy: bool = False) -> List[concurrent.futures.Future]:
+        """
+        Starts a GET for every url at once (up to max_concurrency in flight) and returns their futures right away.
+        The Referer is the page set by the last get; last_html_url is not changed by these requests.
+
+        :param text: futures resolve to the body text, otherwise to the backend's response
+        :param lazy: futures resolve to a requestez.response.Response (takes precedence over text)
+        :return: concurrent.futures.Future per url, in order
+        """
+        if self._state_pending:
+            self._restore_state()
+        _headers = self._build_headers(headers)
+        return [self._submit(self._get_one(url, {"headers": _headers.copy(), "timeout": 60}, text, lazy))
+                for url in urls]
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            self._call(self.backend.__aexit__(None, None, None))
+        finally:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop.close()
+            self._hook_pool.shutdown(wait=False)
+            self._decode_pool.shutdown(wait=False)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
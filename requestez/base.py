@@ -1,20 +1,55 @@
 import abc
+import functools
+import importlib.util
 import os
 import random
 import time
 import threading
 from abc import ABC, abstractmethod
-from typing import Dict, Any, Optional, List, Tuple
-from requests.structures import CaseInsensitiveDict
-from m3u8 import parse as _parse
-from .helpers import log, pbar
+from typing import Dict, Any, Optional, List, Tuple, Union, Callable, TYPE_CHECKING
+from urllib.parse import urlsplit
+from .helpers import log, pbar, MultiBar, RateEstimator
+from .helpers.metrics import (IN_FLIGHT, DOWNLOADS, DOWNLOAD_BYTES, DOWNLOAD_SECONDS, SEGMENTS,
+                              SEGMENT_BATCH_SECONDS, observe_error, observe_request)
+from .helpers.telemetry import Telemetry, build_record, get_telemetry
+from .helpers.tracing import span, traced
+from .middleware import MiddlewareChain, Request
+from .response import CharsetResolver, Response, decode_response
+from .services.cache import LRUCache
+from .services.state import StateStore, export_cookies, import_cookies
+from .parsers import m3u8 as parse_m3u8
+from .parsers.offload import ParsePool, get_default_pool
 
-try:
-    from moviepy.video.io.VideoFileClip import VideoFileClip
-    MOVIEPY_AVAILABLE = True
-except ImportError:
-    VideoFileClip = None
-    MOVIEPY_AVAILABLE = False
+if TYPE_CHECKING:
+    from http.cookiejar import CookieJar
+    from requests.structures import CaseInsensitiveDict
+
+
+@functools.lru_cache(maxsize=None)
+def _video_file_clip():
+    """moviepy's VideoFileClip, imported on first use since importing moviepy alone takes seconds. None if missing."""
+    try:
+        from moviepy.video.io.VideoFileClip import VideoFileClip
+    except ImportError:
+        return None
+    return VideoFileClip
+
+
+def __getattr__(name):
+    # VideoFileClip / MOVIEPY_AVAILABLE used to be resolved at import time, keep them available lazily
+    if name == "VideoFileClip":
+        return _video_file_clip()
+    if name == "MOVIEPY_AVAILABLE":
+        return importlib.util.find_spec("moviepy") is not None
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+_MIN_CHUNK = 8192
+_MAX_CHUNK = 1024 * 1024
+
+
+class DownloadStalled(IOError):
+    """Raised by download when the transfer stays below min_rate for longer than stall_timeout."""
 
 
 class BaseSession(ABC):
@@ -23,6 +58,7 @@ class BaseSession(ABC):
     Contains common logic for Referer tracking, downloader, and anti-bot measures.
     """
     def __init__(self, human_browsing=False):
+        from requests.structures import CaseInsensitiveDict
         self.headers = CaseInsensitiveDict({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko)'
                           ' Chrome/114.0.0.0 Safari/537.36',
@@ -40,28 +76,140 @@ class BaseSession(ABC):
         self.human_browsing = human_browsing
         self.min_sleep = 1
         self.max_sleep = 7
+        # telemetry emitter for this session, None uses the process wide one (helpers.telemetry.get_telemetry())
+        self.telemetry: Optional[Telemetry] = None
+        # charset resolution for text, None uses the process wide one (response.get_charset_resolver())
+        self.charsets: Optional[CharsetResolver] = None
+        # performs the requests instead of _perform_request when set (services.replay.Recorder / Replayer)
+        self.transport: Any = None
+        # hooks every request goes through (see requestez.middleware)
+        self.middlewares = MiddlewareChain()
+        # host -> bytes per second of the last download, sizes the next download's chunks
+        self._host_throughput = LRUCache(maxsize=256)
+        # (store, identity) set by use_state, restored before the next request while _state_pending
+        self._state: Optional[Tuple[StateStore, str]] = None
+        self._state_pending = False
 
     @abstractmethod
     def _perform_request(self, method: str, url: str, **kwargs) -> Any:
         """Must return a response object with: status_code, headers, url, text, content, and iter_content()"""
         pass
 
-    def where_to(self, url, headers=None, post=False, body=None, notify=True):
-        if headers is None:
-            headers = {}
+    def _cookie_jar(self) -> Optional["CookieJar"]:
+        """The backend's http.cookiejar.CookieJar, None when it keeps no cookies."""
+        return None
+
+    def save_data(self) -> Dict[str, Any]:
+        """
+        Saves the current session state (cookies, last html url, headers) to a JSON-dumpable dictionary.
+        """
+        return {"cookies": export_cookies(self._cookie_jar()), "last_html_url": self.last_html_url,
+                "headers": dict(self.headers)}
+
+    def load_data(self, data: Dict[str, Any]):
+        """
+        Loads session state from a dictionary returned by save_data.
+        """
+        import_cookies(self._cookie_jar(), data.get("cookies", []))
+        self.last_html_url = data.get("last_html_url")
+        if data.get("headers"):
+            self.headers.update(data["headers"])
+
+    def use_state(self, store: StateStore, identity: str):
+        """
+        Binds the session to identity in store. The saved state is loaded lazily, right before the next request.
+
+        :param store: services.state.StateStore shared by the workers
+        :param identity: key of this session's state in the store
+        """
+        self._state = (store, identity)
+        self._state_pending = True
+
+    def save_state(self) -> int:
+        """
+        Writes the session state to the store bound with use_state, only what changed since the last save.
+
+        :return: number of rows written
+        """
+        if self._state is None:
+            raise RuntimeError("No state store bound, call use_state(store, identity) first.")
+        # a session saved before its first request must not overwrite the stored state with an empty one
+        self._restore_state()
+        store, identity = self._state
+        return store.save(identity, self.save_data())
+
+    def _restore_state(self):
+        if self._state_pending:
+            self._state_pending = False
+            store, identity = self._state
+            data = store.load(identity)
+            if data is not None:
+                self.load_data(data)
+
+    def _timings(self, response: Any) -> Dict[str, float]:
+        """Backend specific phase timings (seconds since the request started) for telemetry records."""
+        elapsed = getattr(response, "elapsed", None)
+        if elapsed is None:
+            return {}
+        return {"ttfb": elapsed.total_seconds()}
+
+    def _send(self, method: str, url: str, **kwargs) -> Any:
+        """Every request of the session goes through here, through the middleware chain when there is one."""
+        if self._state_pending:
+            self._restore_state()
+        if not self.middlewares:
+            return self._transmit(method, url, **kwargs)
+        return self.middlewares.run(self, Request(method, url, kwargs),
+                                    lambda request: self._transmit(request.method, request.url, **request.kwargs))
+
+    def _transmit(self, method: str, url: str, **kwargs) -> Any:
+        """Performs the request, records its metrics and, when a telemetry sink is listening, emits a RequestRecord."""
+        telemetry = self.telemetry or get_telemetry()
+        backend = type(self).__name__
+        started = time.time()
+        start = time.perf_counter()
+        IN_FLIGHT.inc()
+        try:
+            with span("http.request", "network", method=method, url=url):
+                if self.transport is None:
+                    response = self._perform_request(method, url, **kwargs)
+                else:
+                    response = self.transport.perform(self, method, url, kwargs)
+        except Exception as e:
+            observe_error(backend, url, e)
+            if telemetry.active:
+                telemetry.emit(build_record(method, url, kwargs, started=started, total=time.perf_counter() - start,
+                                            backend=backend, error=e))
+            raise
+        finally:
+            IN_FLIGHT.dec()
+        total = time.perf_counter() - start
+        observe_request(backend, method, url, response.status_code, total)
+        if telemetry.active:
+            telemetry.emit(build_record(method, url, kwargs, response, started=started, total=total,
+                                        timings=self._timings(response), backend=backend))
+        return response
+
+    def _build_headers(self, headers: Optional[Dict[str, str]] = None) -> "CaseInsensitiveDict":
+        """Session headers with the Referer of the last html page, overridden by the per-call headers."""
         _headers = self.headers.copy()
         if self.last_html_url:
             _headers['Referer'] = self.last_html_url
-        _headers.update(headers)
+        if headers:
+            _headers.update(headers)
+        return _headers
+
+    def where_to(self, url, headers=None, post=False, body=None, notify=True):
+        _headers = self._build_headers(headers)
         if notify:
             log("getting :", url, end="", color="yellow")
         
         kwargs = {"headers": _headers, "allow_redirects": False}
         if post:
             kwargs["data"] = body
-            resp = self._perform_request("POST", url, **kwargs)
+            resp = self._send("POST", url, **kwargs)
         else:
-            resp = self._perform_request("GET", url, **kwargs)
+            resp = self._send("GET", url, **kwargs)
             
         if notify:
             log("\rgot : ", resp.url, "\ncode : ", resp.status_code, color="green")
@@ -73,31 +221,34 @@ class BaseSession(ABC):
         }
         return ret
 
+    @traced("session.get", "session")
     def get(self, url, headers=None, post=False, body=None, notify=True, text=True, return_final_page_url=False,
-            return_cookies=False, set_html=True, sleep_for_anti_bot=True):
+            return_cookies=False, set_html=True, sleep_for_anti_bot=True, lazy=False):
+        """
+        :param text: returns the body text instead of the backend response
+        :param lazy: returns a requestez.response.Response instead (takes precedence over text), its text, json()
+            and soup are only decoded when first used
+        """
         if self.human_browsing and sleep_for_anti_bot:
             time.sleep(random.randint(self.min_sleep, self.max_sleep))
         if notify:
             log("getting :", url, end="", color="yellow")
-        if headers is None:
-            headers = {}
-        _headers = self.headers.copy()
-        if self.last_html_url:
-            _headers['Referer'] = self.last_html_url
-        _headers.update(headers)
+        _headers = self._build_headers(headers)
         
         kwargs = {"headers": _headers, "timeout": 60}
         if post:
             kwargs["data"] = body
-            response = self._perform_request("POST", url, **kwargs)
+            response = self._send("POST", url, **kwargs)
         else:
-            response = self._perform_request("GET", url, **kwargs)
+            response = self._send("GET", url, **kwargs)
 
         if 'text/html' in response.headers.get('Content-Type', '') and set_html:
             self.last_html_url = str(response.url)
         
-        if text:
-            resp = response.text
+        if lazy:
+            resp = Response.from_backend(response, self.charsets)
+        elif text:
+            resp = decode_response(response, self.charsets)
         else:
             resp = response
             
@@ -120,18 +271,23 @@ class BaseSession(ABC):
         return resp
 
     def post(self, url, headers=None, post=True, body=None, notify=True, text=True, return_final_page_url=False,
-             return_cookies=False, set_html=False, sleep_for_anti_bot=True):
+             return_cookies=False, set_html=False, sleep_for_anti_bot=True, lazy=False):
         return self.get(url=url, headers=headers, post=post, body=body, notify=notify, text=text,
                         return_final_page_url=return_final_page_url,
-                        return_cookies=return_cookies, set_html=set_html, sleep_for_anti_bot=sleep_for_anti_bot)
+                        return_cookies=return_cookies, set_html=set_html, sleep_for_anti_bot=sleep_for_anti_bot,
+                        lazy=lazy)
 
-    def download(self, url, file_name, headers=None, continue_download=True, bar_end="\n", color="reset", quiet=False):
-        if headers is None:
-            headers = {}
-        _headers = self.headers.copy()
-        if self.last_html_url:
-            _headers['Referer'] = self.last_html_url
-        _headers.update(headers)
+    def download(self, url, file_name, headers=None, continue_download=True, bar_end="\n", color="reset", quiet=False,
+                 stall_timeout: Optional[float] = None, min_rate: float = 1024):
+        """
+        Streams url into file_name (appending / resuming with a Range header when the file exists).
+
+        :param stall_timeout: seconds the transfer may trickle below min_rate before DownloadStalled is raised
+            (a socket silent for that long raises the backend's read timeout instead). The partial file is kept,
+            so calling download again resumes it. None waits forever.
+        :param min_rate: bytes per second below which the transfer counts as stalled
+        """
+        _headers = self._build_headers(headers)
         
         try:
             cookies = _headers.pop("Cookie")
@@ -144,29 +300,58 @@ class BaseSession(ABC):
             if not continue_download and quiet:
                 return False
             file_size = os.path.getsize(file_name)
-            headers['Range'] = f'bytes={file_size}-'
+            _headers['Range'] = f'bytes={file_size}-'
             
-        response = self._perform_request("GET", url, headers=_headers, cookies=cookies, stream=True)
-        
-        total_size = int(response.headers.get('content-length', 0))
-        with open(file_name, 'ab') as file:
-            if not quiet:
-                _pbar = pbar(total=total_size, unit='kb')
-            for chunk in response.iter_content(chunk_size=8192):
-                file.write(chunk)
+        start = time.perf_counter()
+        host = urlsplit(url).hostname or ""
+        written = 0
+        throughput = RateEstimator()
+        kwargs = {}
+        if stall_timeout is not None:
+            # (connect, read): every backend then aborts a socket that stays silent for stall_timeout
+            kwargs["timeout"] = (30, stall_timeout)
+        try:
+            response = self._send("GET", url, headers=_headers, cookies=cookies, stream=True, **kwargs)
+
+            total_size = int(response.headers.get('content-length', 0))
+            with open(file_name, 'ab') as file:
                 if not quiet:
-                    _pbar.update(plus=len(chunk), color=color, finish=bar_end)
+                    _pbar = pbar(total=total_size, unit='kb')
+                for chunk in response.iter_content(chunk_size=self._chunk_size(host)):
+                    file.write(chunk)
+                    written += len(chunk)
+                    throughput.add(len(chunk))
+                    if not quiet:
+                        _pbar.update(plus=len(chunk), color=color, finish=bar_end)
+                    if stall_timeout is not None and throughput.stalled(min_rate, stall_timeout):
+                        raise DownloadStalled(f"{url} stalled at {throughput.rate():.0f} B/s after {written} bytes")
+                if not quiet:
+                    _pbar.close(bar_end)
+        except Exception:
+            DOWNLOADS.labels("error").inc()
+            raise
+        finally:
+            DOWNLOAD_BYTES.labels(host).inc(written)
+        if written:
+            self._host_throughput.set(host, throughput.average())
+        DOWNLOADS.labels("ok").inc()
+        DOWNLOAD_SECONDS.labels(host).observe(time.perf_counter() - start)
+
+    def _chunk_size(self, host: str) -> int:
+        """iter_content chunk size sized to about 50ms of the throughput last seen from host (8 KB to 1 MB)."""
+        rate = self._host_throughput.get(host)
+        if not rate:
+            return _MIN_CHUNK
+        size = _MIN_CHUNK
+        while size < _MAX_CHUNK and size < rate * 0.05:
+            size *= 2
+        return size
 
     def download_m3u8(self, url, folder_name, headers=None, color="reset", multiple_threads=False, max_threads=5):
-        if headers is None:
-            headers = {}
-        _headers = self.headers.copy()
-        if self.last_html_url:
-            _headers['Referer'] = self.last_html_url
-        _headers.update(headers)
+        _headers = self._build_headers(headers)
         
         response = self.get(url, headers=_headers, text=False)
-        playlist = _parse(response.text)
+        playlist = parse_m3u8(response.text)
         segments = playlist['segments']
         domain_start = "/".join(url.split('/')[:-1])
         count, paths = self._download_segments(segments, folder_name, domain=domain_start, color=color,
@@ -176,7 +361,13 @@ class BaseSession(ABC):
     def _download_segments(self, segments, folder_name, domain, color="reset", multiple_threads=False, max_threads=5):
         if not os.path.exists(folder_name):
             os.makedirs(folder_name)
-        bar = pbar(total=len(segments), unit='segment', color=color)
+        start = time.perf_counter()
+        if multiple_threads:
+            # workers report finished segments, the shared bar is redrawn at most every min_interval
+            bar = MultiBar(total=len(segments), unit='segment', color=color)
+        else:
+            # redrawn once per segment, the per file bar below relies on it to keep its line
+            bar = pbar(total=len(segments), unit='segment', color=color, min_interval=0, min_delta=0)
         seg_download_count = 0
         file_names = []
         thread_list = []
@@ -187,9 +378,7 @@ class BaseSession(ABC):
                 segment_url = segment['uri']
             segment_file_name = segment_url.split("?")[0].split("/")[-1]
             segment_file_path = os.path.join(folder_name, segment_file_name)
-            if multiple_threads:
-                bar.update(seg_download_count, new_line=False)
-            else:
+            if not multiple_threads:
                 bar.update(seg_download_count, new_line=True)
             file_names.append(segment_file_path)
             if multiple_threads:
@@ -197,8 +386,10 @@ class BaseSession(ABC):
                     for thread in thread_list:
                         if not thread.is_alive():
                             thread_list.remove(thread)
-                thread = threading.Thread(target=self.download, args=(
-                segment_url, segment_file_path, None, False, "\r\033[F\033[F", color, True))
+                # threads are per segment, the bar counts per worker slot so it shows max_threads workers at most
+                worker = f"worker-{seg_download_count % max_threads}"
+                thread = threading.Thread(target=self._download_segment,
+                                          args=(segment_url, segment_file_path, bar, worker))
                 thread.start()
                 thread_list.append(thread)
             else:
@@ -209,11 +400,22 @@ class BaseSession(ABC):
                 for thread in thread_list:
                     if not thread.is_alive():
                         thread_list.remove(thread)
+        if multiple_threads:
+            bar.close()
+        SEGMENTS.inc(seg_download_count)
+        SEGMENT_BATCH_SECONDS.observe(time.perf_counter() - start)
         return [seg_download_count, [file_names, folder_name]]
 
+    def _download_segment(self, segment_url, segment_file_path, bar, worker=None):
+        try:
+            self.download(segment_url, segment_file_path, continue_download=False, quiet=True)
+        finally:
+            bar.update(plus=1, worker=worker)
+
     @staticmethod
     def _join_segments(output_file_name, segment_paths, color="reset"):
-        if not MOVIEPY_AVAILABLE:
+        VideoFileClip = _video_file_clip()
+        if VideoFileClip is None:
             log("moviepy not installed", color="red", log_level="c")
             log("install moviepy to use this feature", color="red", log_level="c")
             log("pip install moviepy[optional]", color="red", log_level="c")
@@ -256,6 +458,19 @@ class BaseAsyncSession(ABC):
             "SEC-CH-UA-MOBILE": "?0",
             "SEC-CH-UA-PLATFORM": "Linux",
         }
+        # pool parse() dispatches to, None uses the shared default process pool
+        self.parse_pool: Optional[ParsePool] = None
+        # telemetry emitter for this session, None uses the process wide one (helpers.telemetry.get_telemetry())
+        self.telemetry: Optional[Telemetry] = None
+        # charset resolution for text, None uses the process wide one (response.get_charset_resolver())
+        self.charsets: Optional[CharsetResolver] = None
+        # performs the requests instead of _perform_request when set (services.replay.Recorder / Replayer)
+        self.transport: Any = None
+        # hooks every request goes through (see requestez.middleware)
+        self.middlewares = MiddlewareChain()
+        # (store, identity) set by use_state, restored before the next request while _state_pending
+        self._state: Optional[Tuple[StateStore, str]] = None
+        self._state_pending = False
 
     @property
     def current_url(self) -> Optional[str]:
@@ -266,6 +481,113 @@ class BaseAsyncSession(ABC):
         """Must return a response object with: status_code, headers, url, text, content, json()"""
         pass
 
+    def _cookie_jar(self) -> Optional["CookieJar"]:
+        """The client's http.cookiejar.CookieJar, None when it keeps no cookies."""
+        return None
+
+    async def save_data(self) -> Dict[str, Any]:
+        """
+        Saves the current session state (cookies, current url, headers) to a JSON-dumpable dictionary.
+        """
+        return {"cookies": export_cookies(self._cookie_jar()), "current_url": self._current_url,
+                "headers": dict(self.default_headers)}
+
+    async def load_data(self, data: Dict[str, Any]):
+        """
+        Loads session state from a dictionary returned by save_data.
+        """
+        import_cookies(self._cookie_jar(), data.get("cookies", []))
+        self._current_url = data.get("current_url")
+        if data.get("headers"):
+            self.default_headers.update(data["headers"])
+
+    def use_state(self, store: StateStore, identity: str):
+        """
+        Binds the session to identity in store. The saved state is loaded lazily, right before the next request.
+
+        :param store: services.state.StateStore shared by the workers
+        :param identity: key of this session's state in the store
+        """
+        self._state = (store, identity)
+        self._state_pending = True
+
+    async def save_state(self) -> int:
+        """
+        Writes the session state to the store bound with use_state, only what changed since the last save.
+
+        :return: number of rows written
+        """
+        if self._state is None:
+            raise RuntimeError("No state store bound, call use_state(store, identity) first.")
+        # a session saved before its first request must not overwrite the stored state with an empty one
+        await self._restore_state()
+        store, identity = self._state
+        return store.save(identity, await self.save_data())
+
+    async def _restore_state(self):
+        if self._state_pending:
+            self._state_pending = False
+            store, identity = self._state
+            data = store.load(identity)
+            if data is not None:
+                await self.load_data(data)
+
+    def _timings(self, response: Any) -> Dict[str, float]:
+        """Backend specific phase timings (seconds since the request started) for telemetry records."""
+        return {}
+
+    def _telemetry_active(self) -> bool:
+        return (self.telemetry or get_telemetry()).active
+
+    async def _send(self, method: str, url: str, **kwargs) -> Any:
+        """Every request of the session goes through here, through the middleware chain when there is one."""
+        if self._state_pending:
+            await self._restore_state()
+        if not self.middlewares:
+            return await self._transmit(method, url, **kwargs)
+        return await self.middlewares.arun(
+            self, Request(method, url, kwargs),
+            lambda request: self._transmit(request.method, request.url, **request.kwargs))
+
+    async def _transmit(self, method: str, url: str, **kwargs) -> Any:
+        """Performs the request, records its metrics and, when a telemetry sink is listening, emits a RequestRecord."""
+        telemetry = self.telemetry or get_telemetry()
+        backend = type(self).__name__
+        started = time.time()
+        start = time.perf_counter()
+        IN_FLIGHT.inc()
+        try:
+            with span("http.request", "network", method=method, url=url):
+                if self.transport is None:
+                    response = await self._perform_request(method, url, **kwargs)
+                else:
+                    response = await self.transport.aperform(self, method, url, kwargs)
+        except Exception as e:
+            observe_error(backend, url, e)
+            if telemetry.active:
+                telemetry.emit(build_record(method, url, kwargs, started=started, total=time.perf_counter() - start,
+                                            backend=backend, error=e))
+            raise
+        finally:
+            IN_FLIGHT.dec()
+        total = time.perf_counter() - start
+        observe_request(backend, method, url, response.status_code, total)
+        if telemetry.active:
+            telemetry.emit(build_record(method, url, kwargs, response, started=started, total=total,
+                                        timings=self._timings(response), backend=backend))
+        return response
+
+    def _build_headers(self, headers: Optional[Dict[str, str]] = None,
+                       suppress_referer: bool = False) -> Dict[str, str]:
+        """Default headers overridden by the per-call headers, plus the current url as Referer unless given."""
+        _headers = self.default_headers.copy()
+        if headers:
+            _headers.update(headers)
+        if "Referer" not in _headers and not suppress_referer and self._current_url:
+            _headers["Referer"] = self._current_url
+        return _headers
+
+    @traced("session.request", "session")
     async def _request(
             self,
             method: str,
@@ -275,34 +597,32 @@ class BaseAsyncSession(ABC):
             suppress_referer: bool = False,
             update_url: bool = False,
             **kwargs,
-    ) -> Tuple[int, Any, Any]:
-        headers = self.default_headers.copy()
-        headers.update(kwargs.get("headers", {}).copy())
-        if (
-                "Referer" not in headers
-                and not suppress_referer
-                and self._current_url
-        ):
-            headers["Referer"] = self._current_url
-
-        kwargs["headers"] = headers
-        
-        response = await self._perform_request(method, url, **kwargs)
+    ) -> Union[Tuple[int, Any, Any], Response]:
+        """
+        :param read_as: "json", "text" or "bytes" return (status, headers, decoded body), "response" returns a
+            requestez.response.Response that only decodes its body when text, json() or soup is used
+        """
+        kwargs["headers"] = self._build_headers(kwargs.get("headers"), suppress_referer)
         
+        response = await self._send(method, url, **kwargs)
+
+        if 200 <= response.status_code < 300 and update_url:
+            self._current_url = str(response.url)
+
+        if read_as == "response":
+            return Response.from_backend(response, self.charsets)
+
         content = None
         try:
             if read_as == "json":
                 content = response.json()
             elif read_as == "text":
-                content = response.text
+                content = decode_response(response, self.charsets)
             elif read_as == "bytes":
                 content = response.content
         except Exception as e:
             print(f"Error reading response body from {url}: {e}")
 
-        if 200 <= response.status_code < 300 and update_url:
-            self._current_url = str(response.url)
-
         return response.status_code, response.headers, content
 
     async def get(self, url: str, read_as: str = "json", **kwargs):
@@ -326,10 +646,16 @@ class BaseAsyncSession(ABC):
     async def open(self, url: str, read_as: str = "json", **kwargs):
         return await self._request("GET", url, read_as=read_as, suppress_referer=True, update_url=True, **kwargs)
 
-    @abstractmethod
-    async def save_data(self) -> Dict[str, Any]:
-        pass
+    async def parse(self, content: Any, parser: Union[str, Callable] = "html", *args, **kwargs) -> Any:
+        """
+        Runs a registered parser (see parsers.offload.register_parser) on content in the session's parse pool,
+        so CPU bound parsing does not stall the other in-flight requests. Without a parse_pool a shared thread pool
+        is used; set parse_pool = ParsePool("auto") to run the parsers returning plain data in processes (html / xml,
+        whose BeautifulSoup results are slow to pickle, stay in threads).
 
-    @abstractmethod
-    async def load_data(self, data: Dict[str, Any]):
-        pass
+        :param content: the first argument passed to the parser (usually a response body)
+        :param parser: registered parser name ("html", "js", "packer", "extract", ...) or an importable function
+        :return: the parser's result
+        """
+        pool = self.parse_pool or get_default_pool()
+        return await pool.run(parser, content, *args, **kwargs)
@@ -1,9 +1,10 @@
-from Crypto.Cipher import AES
-from Crypto.Util.Padding import pad, unpad
 import base64
-from hashlib import md5
 import secrets
 import string as strings
+from typing import Iterable, List, Union
+from .cipher import CipherContext, get_cipher, resolve_mode, bytes_to_key, aes_dec_salted, aes_enc_salted, \
+    clear_caches
+from ..helpers.tracing import traced
 
 _ITERABLES = (list, set, tuple)
 
@@ -23,6 +24,7 @@ def generate_random_string(length) -> str:
     return random_string
 
 
+@traced("encryption.aes_enc", "crypto")
 def aes_enc(key, iv, string, mode="cbc", decode=True) -> str:
     """
         :param key: your 32bytes key
@@ -32,17 +34,10 @@ def aes_enc(key, iv, string, mode="cbc", decode=True) -> str:
         :param decode: return bytes if False otherwise return decoded_data.decode("utf-8")
         :return: encoded string
     """
-    cip = AES.new(key, getattr(AES, f"MODE_{mode.upper()}"), iv)
-    if type(string) == str:
-        string = string.encode("utf-8")
-    string = pad(string, cip.block_size)
-    string = cip.encrypt(string)
-    string = base64.b64encode(string)
-    if decode:
-        string = string.decode("utf-8")
-    return string
+    return get_cipher(key, iv, mode).encrypt(string, decode=decode)
 
 
+@traced("encryption.aes_dec", "crypto")
 def aes_dec(key, iv, string, mode="cbc", decode=True, decoded=False, unpad_data=True) -> str or bytes:
     """
     :param key: your 32bytes key
@@ -54,19 +49,18 @@ def aes_dec(key, iv, string, mode="cbc", decode=True, decoded=False, unpad_data=
     :param unpad_data: wether the data should be unpaded after decryption
     :return: decrypted str (or bytes if decode=False)
     """
-    cip = AES.new(key, getattr(AES, f"MODE_{mode.upper()}"), iv)
-    if not decoded:
-        string = base64.b64decode(string)
-    try:
-        string = cip.decrypt(string)
-    except ValueError:
-        string = pad(string, cip.block_size)
-        string = cip.decrypt(string)
-    if unpad_data:
-        string = unpad(string, cip.block_size)
-    if decode:
-        string = string.decode("utf-8")
-    return string
+    return get_cipher(key, iv, mode).decrypt(string, decode=decode, decoded=decoded, unpad_data=unpad_data)
+
+
+@traced("encryption.aes_dec_many", "crypto")
+def aes_dec_many(key, iv, strings: Iterable, mode="cbc", decode=True, decoded=False,
+                 unpad_data=True) -> List[Union[str, bytes]]:
+    """
+    Decrypts many payloads sharing the same key, iv and mode with a single cipher context.
+    :param strings: iterable of payloads (same format as aes_dec's string)
+    :return: list of decrypted str (or bytes if decode=False) in input order
+    """
+    return get_cipher(key, iv, mode).decrypt_many(strings, decode=decode, decoded=decoded, unpad_data=unpad_data)
 
 
 def base_64_enc(string) -> str:
@@ -75,14 +69,3 @@ def base_64_enc(string) -> str:
 
 def base_64_dec(string, decode_utf_8=False) -> str:
     return base64.b64decode(string) if not decode_utf_8 else base64.b64decode(string).decode('utf-8')
-
-
-def bytes_to_key(data, salt, output=48) -> bytes:
-    assert len(salt) == 8, len(salt)
-    data = bytes(data, "utf-8") + salt
-    key = md5(data).digest()
-    final_key = key
-    while len(final_key) < output:
-        key = md5(key + data).digest()
-        final_key += key
-    return final_key[:output]
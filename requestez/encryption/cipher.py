@@ -0,0 +1,196 @@
+import base64
+import secrets
+from hashlib import md5
+from typing import Iterable, List, Optional, Union
+from Crypto.Cipher import AES
+from Crypto.Util.Padding import pad, unpad
+from ..services.cache import LRUCache
+from ..helpers.tracing import traced
+
+_OPENSSL_MAGIC = b"Salted__"
+# below this size a cbc decryption through the cached ecb cipher + one xor beats building a new cbc cipher
+_CBC_FAST_PATH_LIMIT = 4096
+
+_CIPHERS = LRUCache(maxsize=64)
+_DERIVED_KEYS = LRUCache(maxsize=256)
+_MODES = {}
+
+
+def resolve_mode(mode: Union[str, int]) -> int:
+    """
+    :param mode: mode name (cbc, ecb, cfb, ofb, ctr, ccm, gcm, xts, eax) or an AES.MODE_* constant
+    :return: the AES.MODE_* constant
+    """
+    if isinstance(mode, int):
+        return mode
+    try:
+        return _MODES[mode]
+    except KeyError:
+        value = _MODES[mode] = getattr(AES, f"MODE_{mode.upper()}")
+        return value
+
+
+class CipherContext:
+    """
+    Reusable AES context for a fixed key, iv and mode.
+    The mode is resolved once and, for ECB/CBC, the stateless ECB primitive is built once and shared by every call.
+    """
+    def __init__(self, key: bytes, iv: Optional[bytes] = None, mode: Union[str, int] = "cbc"):
+        self.key = key
+        self.iv = iv
+        self.mode = resolve_mode(mode)
+        self.block_size = AES.block_size
+        if self.mode == AES.MODE_CBC and iv is not None and len(iv) != self.block_size:
+            raise ValueError(f"Incorrect IV length (it must be {self.block_size} bytes long)")
+        self._ecb = AES.new(key, AES.MODE_ECB) if self.mode in (AES.MODE_ECB, AES.MODE_CBC) else None
+
+    def new(self):
+        """Returns a fresh pycryptodome cipher (cipher objects are stateful and cannot be reused across messages)."""
+        if self.mode == AES.MODE_ECB:
+            return self._ecb
+        if self.iv is None:
+            return AES.new(self.key, self.mode)
+        return AES.new(self.key, self.mode, self.iv)
+
+    def _decrypt_raw(self, data: bytes) -> bytes:
+        if (self.mode == AES.MODE_CBC and self.iv is not None and len(data) <= _CBC_FAST_PATH_LIMIT
+                and len(data) % self.block_size == 0):
+            decrypted = self._ecb.decrypt(data)
+            previous = self.iv + data[:-self.block_size]
+            return (int.from_bytes(decrypted, "big") ^ int.from_bytes(previous, "big")).to_bytes(len(data), "big")
+        return self.new().decrypt(data)
+
+    def _encrypt_raw(self, data: bytes) -> bytes:
+        return self.new().encrypt(pad(data, self.block_size))
+
+    def encrypt(self, string, decode=True) -> Union[str, bytes]:
+        """
+        :param string: str or bytes to encrypt
+        :param decode: return bytes if False otherwise return the base64 text decoded as utf-8
+        :return: base64 encoded cipher text
+        """
+        if isinstance(string, str):
+            string = string.encode("utf-8")
+        string = base64.b64encode(self._encrypt_raw(string))
+        if decode:
+            string = string.decode("utf-8")
+        return string
+
+    def decrypt(self, string, decode=True, decoded=False, unpad_data=True) -> Union[str, bytes]:
+        """
+        :param string: base64 cipher text (or raw bytes when decoded is True)
+        :param decode: return bytes if False otherwise return decoded_data.decode("utf-8")
+        :param decoded: has the string been base64 decoded already
+        :param unpad_data: wether the data should be unpaded after decryption
+        :return: decrypted str (or bytes if decode=False)
+        """
+        if not decoded:
+            string = base64.b64decode(string)
+        try:
+            string = self._decrypt_raw(string)
+        except ValueError:
+            string = self._decrypt_raw(pad(string, self.block_size))
+        if unpad_data:
+            string = unpad(string, self.block_size)
+        if decode:
+            string = string.decode("utf-8")
+        return string
+
+    def decrypt_many(self, strings: Iterable, decode=True, decoded=False, unpad_data=True) -> List[Union[str, bytes]]:
+        return [self.decrypt(string, decode=decode, decoded=decoded, unpad_data=unpad_data) for string in strings]
+
+
+def get_cipher(key: bytes, iv: Optional[bytes] = None, mode: Union[str, int] = "cbc") -> CipherContext:
+    """
+    Returns a cached CipherContext for (key, iv, mode), building it on first use.
+    """
+    if not isinstance(key, bytes):
+        key = bytes(key)
+    if iv is not None and not isinstance(iv, bytes):
+        iv = bytes(iv)
+    cache_key = (key, iv, mode)
+    context = _CIPHERS.get(cache_key)
+    if context is None:
+        context = CipherContext(key, iv, mode)
+        _CIPHERS.set(cache_key, context)
+    return context
+
+
+# traced here rather than on bytes_to_key so memoised lookups stay free
+@traced("encryption.bytes_to_key", "crypto")
+def _derive(data: bytes, output: int) -> bytes:
+    key = md5(data).digest()
+    final_key = key
+    while len(final_key) < output:
+        key = md5(key + data).digest()
+        final_key += key
+    return final_key[:output]
+
+
+def bytes_to_key(data, salt, output=48) -> bytes:
+    """
+    OpenSSL EVP_BytesToKey (md5, one iteration) as used by CryptoJS passphrase encryption.
+    Results are memoised so repeated passphrase + salt pairs skip the md5 chain.
+
+    :param data: passphrase
+    :param salt: 8 byte salt
+    :param output: number of key + iv bytes to derive
+    :return: derived bytes
+    """
+    assert len(salt) == 8, len(salt)
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    cache_key = (data, bytes(salt), output)
+    key = _DERIVED_KEYS.get(cache_key)
+    if key is None:
+        key = _derive(data + salt, output)
+        _DERIVED_KEYS.set(cache_key, key)
+    return key
+
+
+@traced("encryption.aes_dec_salted", "crypto")
+def aes_dec_salted(passphrase, string, decode=True, decoded=False) -> Union[str, bytes]:
+    """
+    Decrypts an OpenSSL / CryptoJS style payload ("Salted__" + 8 byte salt + aes-256-cbc cipher text).
+
+    :param passphrase: passphrase the payload was encrypted with
+    :param string: base64 payload (or raw bytes when decoded is True)
+    :param decode: return bytes if False otherwise return decoded_data.decode("utf-8")
+    :param decoded: has the string been base64 decoded already
+    :return: decrypted str (or bytes if decode=False)
+    """
+    if not decoded:
+        string = base64.b64decode(string)
+    if string[:8] != _OPENSSL_MAGIC:
+        raise ValueError("payload is not in the OpenSSL salted format")
+    derived = bytes_to_key(passphrase, string[8:16], 48)
+    return get_cipher(derived[:32], derived[32:], "cbc").decrypt(string[16:], decode=decode, decoded=True)
+
+
+@traced("encryption.aes_enc_salted", "crypto")
+def aes_enc_salted(passphrase, string, salt: Optional[bytes] = None, decode=True) -> Union[str, bytes]:
+    """
+    Encrypts into the OpenSSL / CryptoJS salted format, the inverse of aes_dec_salted.
+
+    :param passphrase: passphrase to derive the key and iv from
+    :param string: str or bytes to encrypt
+    :param salt: 8 byte salt (random if not given)
+    :param decode: return bytes if False otherwise return the base64 text decoded as utf-8
+    :return: base64 encoded payload
+    """
+    if salt is None:
+        salt = secrets.token_bytes(8)
+    derived = bytes_to_key(passphrase, salt, 48)
+    if isinstance(string, str):
+        string = string.encode("utf-8")
+    cipher_text = get_cipher(derived[:32], derived[32:], "cbc")._encrypt_raw(string)
+    payload = base64.b64encode(_OPENSSL_MAGIC + salt + cipher_text)
+    if decode:
+        payload = payload.decode("utf-8")
+    return payload
+
+
+def clear_caches():
+    """Drops every cached cipher context and derived key."""
+    _CIPHERS.clear()
+    _DERIVED_KEYS.clear()
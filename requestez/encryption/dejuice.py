@@ -1,33 +1,22 @@
-import base64
-from .unpack import PACKER
-import re
+from .extract import find_scripts, decode_block
+from ..helpers import log
+from ..helpers.tracing import traced
 
 
+@traced("encryption.DEJUICE", "crypto")
 def DEJUICE(content):
-    def find_single_match(data, patron, index=0):
-        try:
-            if index == 0:
-                matches = re.search(patron, data, flags=re.DOTALL)
-                if matches:
-                    if len(matches.groups()) == 1:
-                        return matches.group(1)
-                    elif len(matches.groups()) > 1:
-                        return matches.groups()
-                    else:
-                        return matches.group()
-                else:
-                    return ""
-            else:
-                matches = re.findall(patron, data, flags=re.DOTALL)
-                return matches[index]
-        except:
-            return ""
+    """
+    Decodes the first JuicyCodes.Run blob in content (unpacking it if the decoded script is packed).
+    Use encryption.extract.extract_scripts to decode every blob of a page.
 
-    def dejuice(data):
-        juiced = find_single_match(data, r'JuicyCodes.Run\((.*?)\);')
-        b64_data = juiced.replace('+', '').replace('"', '')
-        b64_decode = base64.b64decode(b64_data)
-        dejuiced = PACKER(b64_decode)
-        return dejuiced
-
-    return dejuice(data=content)
+    :param content: page or script containing a JuicyCodes.Run(...) call
+    :return: the decoded script, or "" if no blob could be decoded
+    """
+    blocks = find_scripts(content, kinds=("juiced",))
+    if not blocks:
+        return ""
+    script, error = decode_block("juiced", blocks[0][4])
+    if error is not None:
+        log(error, log_level="e", color="red")
+        return ""
+    return script
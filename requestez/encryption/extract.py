@@ -0,0 +1,137 @@
+import base64
+import binascii
+import re
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Iterable, List, Optional, Sequence, Tuple
+from .unpack import PACKED_PATTERN, UnpackingError, detect, unpack
+from ..helpers.tracing import traced
+
+KINDS = ("packed", "juiced", "base64")
+
+# one alternation so the whole page is scanned in a single pass
+_SCRIPTS = re.compile(
+    r"(?P<packed>" + PACKED_PATTERN + r")"
+    r"|(?P<juiced>JuicyCodes\.Run\((?P<juiced_body>.*?)\);)"
+    r"|(?P<atob>atob\(\s*(?P<atob_quote>['\"])(?P<atob_body>[A-Za-z0-9+/=\s]{16,}?)(?P=atob_quote)\s*\))"
+    r"|(?P<data_uri>data:(?:text|application)/(?:x-)?javascript;base64,(?P<data_body>[A-Za-z0-9+/=]+))",
+    re.DOTALL,
+)
+_JUICE_JOIN = re.compile(r"[\"'+\s]")
+
+
+class DecodedScript:
+    """
+    A script block found in a page.
+
+    :ivar kind: one of "packed", "juiced", "base64"
+    :ivar start: offset of the block in the scanned page
+    :ivar end: offset just past the block
+    :ivar source: the raw block as it appears in the page
+    :ivar script: the decoded javascript (None if decoding failed)
+    :ivar error: why decoding failed (None on success)
+    """
+    __slots__ = ("kind", "start", "end", "source", "script", "error")
+
+    def __init__(self, kind: str, start: int, end: int, source: str, script: Optional[str] = None,
+                 error: Optional[str] = None):
+        self.kind = kind
+        self.start = start
+        self.end = end
+        self.source = source
+        self.script = script
+        self.error = error
+
+    def __repr__(self):
+        return f"<DecodedScript {self.kind} [{self.start}:{self.end}] {'ok' if self.error is None else self.error}>"
+
+
+def _b64_text(data: str) -> str:
+    raw = base64.b64decode(data + "=" * (-len(data) % 4))
+    return raw.decode("utf-8", errors="replace")
+
+
+def _maybe_unpack(script: str) -> str:
+    if detect(script):
+        return unpack(script)
+    return script
+
+
+def decode_block(kind: str, payload: str) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Decodes one block's payload. Module level (and returning plain tuples) so it can run in a process pool.
+
+    :param kind: one of KINDS
+    :param payload: packed source, JuicyCodes.Run arguments or base64 text
+    :return: (script, None) on success otherwise (None, error message)
+    """
+    try:
+        if kind == "packed":
+            return unpack(payload), None
+        if kind == "juiced":
+            return _maybe_unpack(_b64_text(_JUICE_JOIN.sub("", payload))), None
+        if kind == "base64":
+            return _maybe_unpack(_b64_text("".join(payload.split()))), None
+        return None, f"unknown kind {kind}"
+    except (UnpackingError, binascii.Error, ValueError) as e:
+        return None, str(e)
+
+
+def _decode_args(args: Tuple[str, str]) -> Tuple[Optional[str], Optional[str]]:
+    return decode_block(*args)
+
+
+def find_scripts(page: str, kinds: Sequence[str] = KINDS) -> List[Tuple[str, int, int, str, str]]:
+    """
+    Scans page once and returns every encoded block without decoding it.
+    :return: list of (kind, start, end, source, payload)
+    """
+    blocks = []
+    for match in _SCRIPTS.finditer(page):
+        if match.group("packed") is not None:
+            kind, payload = "packed", match.group("packed")
+        elif match.group("juiced") is not None:
+            kind, payload = "juiced", match.group("juiced_body")
+        elif match.group("atob") is not None:
+            kind, payload = "base64", match.group("atob_body")
+        else:
+            kind, payload = "base64", match.group("data_body")
+        if kind in kinds:
+            blocks.append((kind, match.start(), match.end(), match.group(0), payload))
+    return blocks
+
+
+@traced("encryption.extract_scripts", "crypto")
+def extract_scripts(page: str, kinds: Sequence[str] = KINDS, executor: Optional[Executor] = None) -> List[DecodedScript]:
+    """
+    Finds and decodes every packed / juiced / base64 script block in page.
+
+    :param page: html document (or raw javascript)
+    :param kinds: which block kinds to look for
+    :param executor: optional executor (e.g. a ProcessPoolExecutor) the blocks are decoded in
+    :return: list of DecodedScript ordered by offset
+    """
+    blocks = find_scripts(page, kinds)
+    jobs = [(kind, payload) for kind, _, _, _, payload in blocks]
+    if executor is not None and len(jobs) > 1:
+        results = list(executor.map(_decode_args, jobs))
+    else:
+        results = [decode_block(kind, payload) for kind, payload in jobs]
+    return [DecodedScript(kind, start, end, source, script, error)
+            for (kind, start, end, source, _), (script, error) in zip(blocks, results)]
+
+
+def extract_scripts_many(pages: Iterable[str], kinds: Sequence[str] = KINDS, processes: Optional[int] = None,
+                         min_pool_batch: int = 8) -> List[List[DecodedScript]]:
+    """
+    extract_scripts over many pages, spread over a process pool once the batch is large enough to amortise it.
+
+    :param pages: html documents
+    :param processes: pool size (None lets ProcessPoolExecutor pick the cpu count)
+    :param min_pool_batch: below this many pages everything runs in the calling process
+    :return: one list of DecodedScript per page, in input order
+    """
+    pages = list(pages)
+    if len(pages) < min_pool_batch:
+        return [extract_scripts(page, kinds) for page in pages]
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        return list(pool.map(extract_scripts, pages, [kinds] * len(pages), chunksize=max(1, len(pages) // 32)))
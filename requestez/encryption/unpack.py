@@ -1,163 +1,254 @@
 import re
 import urllib.parse as urllib
+from functools import lru_cache
+from typing import Dict
 from ..parsers import regex
 from ..helpers import log
+from ..helpers.tracing import traced
+
+_WORD = re.compile(r'\b\w+\b')
+_CLEAN_FUNCTION = re.compile(r"=\"([^\"]+).*}\s*\((\d+)\)", re.DOTALL)
+_CLEAN_LETTER = re.compile(r"[a-zA-Z]")
+_CLEAN_URI = re.compile(r"(^decodeURIComponent\s*\(\s*(['\"]))|((['\"])\s*\)$)")
+_CLEAN_DOUBLE_QUOTED = re.compile(r"(^\")|(\"$)|(\".*?\")")
+_CLEAN_SINGLE_QUOTED = re.compile(r"(^')|('$)|('.*?')")
+_JUICERS = (
+    re.compile(r"}\s*\(\s*(.*?)\s*,\s*(\d+)\s*,\s*(\d+)\s*,\s*\((.*?)\).split\((.*?)\)", re.DOTALL),
+    re.compile(r"}\('(.*)', *(\d+), *(\d+), *'(.*)'\.split\('(.*?)'\)", re.DOTALL),
+)
+_STRING_TABLE = re.compile(r'var *(_\w+)=\["(.*?)"];', re.DOTALL)
+# a whole packed block, from eval( to the closing parenthesis after the symtab's split()
+PACKED_PATTERN = (r"eval\(function\(p,a,c,k,e,[rd]\).*?\.split\(\s*(?P<sep>['\"]).*?(?P=sep)\s*\)"
+                  r"(?:\s*,\s*\d+\s*,\s*\{\}\s*\))?\s*\)")
+_PACKED = re.compile(PACKED_PATTERN, re.DOTALL)
+
+
+class UnpackingError(Exception):
+    """Badly packed source or general error."""
+
+
+class Unbaser(object):
+    """Functor for a given base. Will efficiently convert
+    strings to natural numbers (and back with encode)."""
+    ALPHABET = {
+        36: '0123456789abcdefghijklmnopqrstuvwxyz',
+        62: '0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ',
+        95: (r' !"#$%&\'()*+,-./0123456789:;<=>?@ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+             r'[\]^_`abcdefghijklmnopqrstuvwxyz{|}~')
+    }
+
+    def __init__(self, base):
+        # Error not possible, use 36 by default
+        if base == 0:
+            base = 36
+        self.base = base
+
+        if base < 2:
+            # base 1 has no digits, encode() would never terminate
+            raise TypeError('Unsupported base encoding.')
+        elif base <= 36:
+            self.alphabet = self.ALPHABET[36][:base]
+        elif base < 62:
+            self.alphabet = self.ALPHABET[62][:base]
+        elif base == 62:
+            self.alphabet = self.ALPHABET[62]
+        elif base < 95:
+            self.alphabet = self.ALPHABET[95][:base]
+        elif base == 95:
+            self.alphabet = self.ALPHABET[95]
+        else:
+            raise TypeError('Unsupported base encoding.')
+
+        # If base can be handled by int() builtin, let it do it for us
+        if base <= 36:
+            self.unbase = lambda _string: int(_string, base)
+        else:
+            # Build conversion dictionary cache
+            self.dictionary = dict((cipher, index) for index, cipher in enumerate(self.alphabet))
+            self.unbase = self._dict_unbaser
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def for_base(base) -> "Unbaser":
+        """Returns the shared Unbaser for base."""
+        return Unbaser(base)
+
+    def __call__(self, _string):
+        return self.unbase(_string)
+
+    def _dict_unbaser(self, _string):
+        """Decodes a  value to an integer."""
+        ret = 0
+        base = self.base
+        dictionary = self.dictionary
+        for cipher in _string:
+            ret = ret * base + dictionary[cipher]
+        return ret
+
+    def encode(self, number: int) -> str:
+        """Encodes a natural number the way the packer's e() function does."""
+        if number == 0:
+            return self.alphabet[0]
+        digits = []
+        base = self.base
+        while number:
+            number, remainder = divmod(number, base)
+            digits.append(self.alphabet[remainder])
+        return "".join(reversed(digits))
+
+
+class cPacker:
+
+    @staticmethod
+    def detect(source):
+        """Detects whether `source` is P.A.C.K.E.R. coded."""
+        return source.replace(' ', '').startswith('eval(function(p,a,c,k,e,')
+
+    def unpack(self, source):
+        """Unpacks P.A.C.K.E.R. packed js code."""
+        payload, symtab, radix, count = self._filter_args(source)
+
+        # correction pour eviter bypass
+        if (len(symtab) > count) and (count > 0):
+            del symtab[count:]
+        if (len(symtab) < count) and (count > 0):
+            symtab.append('BUGGED')
+
+        if count != len(symtab):
+            raise UnpackingError('Malformed p.a.c.k.e.r. symtab.')
+
+        try:
+            unbase = Unbaser.for_base(radix)
+        except TypeError:
+            raise UnpackingError('Unknown p.a.c.k.e.r. encoding.')
+
+        symbols = self._symbol_map(symtab, unbase)
+
+        def lookup(match):
+            """Look up symbols in the synthetic symtab."""
+            word = match.group(0)
+            return symbols.get(word, word)
+
+        source = _WORD.sub(lookup, payload)
+        return self._replace_strings(source)
+
+    @staticmethod
+    def _symbol_map(symtab, unbase: Unbaser) -> Dict[str, str]:
+        """Builds the encoded word -> symbol mapping once per payload (empty symbols keep the word)."""
+        return {unbase.encode(index): symbol for index, symbol in enumerate(symtab) if symbol}
+
+    @staticmethod
+    def _clean_str(_str):
+        _str = _str.strip()
+        if _str.find("function") == 0:
+            args = _CLEAN_FUNCTION.search(_str)
+            if args:
+                a = args.groups()
 
+                def openload_re(match):
+                    c = match.group(0)
+                    b = ord(c) + int(a[1])
+                    return chr(b if (90 if c <= "Z" else 122) >= b else b - 26)
 
-def PACKER(string, cust_pattern=None):
-    class cPacker:
+                _str = _CLEAN_LETTER.sub(openload_re, a[0])
+                _str = urllib.unquote(_str)
 
-        @staticmethod
-        def detect(source):
-            """Detects whether `source` is P.A.C.K.E.R. coded."""
-            return source.replace(' ', '').startswith('eval(function(p,a,c,k,e,')
+        elif _str.find("decodeURIComponent") == 0:
+            _str = _CLEAN_URI.sub("", _str)
+            _str = urllib.unquote(_str)
+        elif _str.find("\"") == 0:
+            _str = _CLEAN_DOUBLE_QUOTED.sub("", _str)
+        elif _str.find("'") == 0:
+            _str = _CLEAN_SINGLE_QUOTED.sub("", _str)
 
-        def unpack(self, source):
-            """Unpacks P.A.C.K.E.R. packed js code."""
-            payload, symtab, radix, count = self._filter_args(source)
+        return _str
 
-            # correction pour eviter bypass
-            if (len(symtab) > count) and (count > 0):
-                del symtab[count:]
-            if (len(symtab) < count) and (count > 0):
-                symtab.append('BUGGED')
+    def _filter_args(self, source):
+        """Juice from a source file the four args needed by decoder."""
 
-            if count != len(symtab):
-                raise UnpackingError('Malformed p.a.c.k.e.r. symtab.')
+        source = source.replace(',[],', ',0,').replace("\\'", "'")
 
+        args = _JUICERS[0].search(source)
+        if args:
+            a = args.groups()
             try:
-                unbase = Unbaser(radix)
-            except TypeError:
-                raise UnpackingError('Unknown p.a.c.k.e.r. encoding.')
-
-            def lookup(match):
-                """Look up symbols in the synthetic symtab."""
-                word = match.group(0)
-                return symtab[unbase(word)] or word
-
-            source = re.sub(r'\b\w+\b', lookup, payload)
-            return self._replace_strings(source)
-
-        @staticmethod
-        def _clean_str(_str):
-            _str = _str.strip()
-            if _str.find("function") == 0:
-                _pattern = r"=\"([^\"]+).*}\s*\((\d+)\)"
-                args = re.search(_pattern, _str, re.DOTALL)
-                if args:
-                    a = args.groups()
-
-                    def openload_re(match):
-                        c = match.group(0)
-                        b = ord(c) + int(a[1])
-                        return chr(b if (90 if c <= "Z" else 122) >= b else b - 26)
-
-                    _str = re.sub(r"[a-zA-Z]", openload_re, a[0])
-                    _str = urllib.unquote(_str)
-
-            elif _str.find("decodeURIComponent") == 0:
-                _str = re.sub(r"(^decodeURIComponent\s*\(\s*(['\"]))|((['\"])\s*\)$)", "", _str)
-                _str = urllib.unquote(_str)
-            elif _str.find("\"") == 0:
-                _str = re.sub(r"(^\")|(\"$)|(\".*?\")", "", _str)
-            elif _str.find("'") == 0:
-                _str = re.sub(r"(^')|('$)|('.*?')", "", _str)
+                return self._clean_str(a[0]), self._clean_str(a[3]).split(self._clean_str(a[4])), int(a[1]), \
+                    int(a[2])
+            except ValueError:
+                raise UnpackingError('Corrupted p.a.c.k.e.r. data.')
+
+        args = _JUICERS[1].search(source)
+        if args:
+            a = args.groups()
+            try:
+                return a[0], a[3].split(a[4]), int(a[1]), int(a[2])
+            except ValueError:
+                raise UnpackingError('Corrupted p.a.c.k.e.r. data.')
 
-            return _str
+        # could not find a satisfying regex
+        raise UnpackingError('Could not make sense of p.a.c.k.e.r data (unexpected code structure)')
 
-        def _filter_args(self, source):
-            """Juice from a source file the four args needed by decoder."""
+    @staticmethod
+    def _replace_strings(source):
+        """Strip string lookup table (list) and replace values in source."""
+        match = _STRING_TABLE.search(source)
 
-            source = source.replace(',[],', ',0,').replace("\\'", "'")
+        if match:
+            varname, strings = match.groups()
+            startpoint = len(match.group(0))
+            lookup = strings.split('","')
 
-            juicer = r"}\s*\(\s*(.*?)\s*,\s*(\d+)\s*,\s*(\d+)\s*,\s*\((.*?)\).split\((.*?)\)"
-            args = re.search(juicer, source, re.DOTALL)
-            if args:
-                a = args.groups()
-                try:
-                    return self._clean_str(a[0]), self._clean_str(a[3]).split(self._clean_str(a[4])), int(a[1]), \
-                        int(a[2])
-                except ValueError:
-                    raise UnpackingError('Corrupted p.a.c.k.e.r. data.')
-
-            juicer = r"}\('(.*)', *(\d+), *(\d+), *'(.*)'\.split\('(.*?)'\)"
-            #           juicer = (r"}\(\\'(.*)', *(\d+), *(\d+), *\\'(.*)'\.split\(\\'(.*?)\\'\)")
-            args = re.search(juicer, source, re.DOTALL)
-            if args:
-                a = args.groups()
-                try:
-                    return a[0], a[3].split(a[4]), int(a[1]), int(a[2])
-                except ValueError:
-                    raise UnpackingError('Corrupted p.a.c.k.e.r. data.')
-
-            # could not find a satisfying regex
-            raise UnpackingError('Could not make sense of p.a.c.k.e.r data (unexpected code structure)')
-
-        @staticmethod
-        def _replace_strings(source):
-            """Strip string lookup table (list) and replace values in source."""
-            match = re.search(r'var *(_\w+)=\["(.*?)"];', source, re.DOTALL)
-
-            if match:
-                varname, strings = match.groups()
-                startpoint = len(match.group(0))
-                lookup = strings.split('","')
-                variable = '%s[%%d]' % varname
-                for index, value in enumerate(lookup):
-                    source = source.replace(variable % index, '"%s"' % value)
-                return source[startpoint:]
-            return source
-
-    def UnpackingError(err):
-        # Badly packed source or general error.#
-        log(err, log_level="e", color="red")
-
-    class Unbaser(object):
-        """Functor for a given base. Will efficiently convert
-    strings to natural numbers."""
-        ALPHABET = {
-            62: '0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ',
-            95: (r' !"#$%&\'()*+,-./0123456789:;<=>?@ABCDEFGHIJKLMNOPQRSTUVWXYZ'
-                 r'[\]^_`abcdefghijklmnopqrstuvwxyz{|}~')
-        }
-
-        def __init__(self, base):
-            self.base = base
-
-            # Error not possible, use 36 by default
-            if base == 0:
-                base = 36
-
-            # If base can be handled by int() builtin, let it do it for us
-            if 2 <= base <= 36:
-                self.unbase = lambda _string: int(_string, base)
-            else:
-                if base < 62:
-                    self.ALPHABET[base] = self.ALPHABET[62][0:base]
-                elif 62 < base < 95:
-                    self.ALPHABET[base] = self.ALPHABET[95][0:base]
-                # Build conversion dictionary cache
-                try:
-                    self.dictionary = dict((cipher, index) for index, cipher in enumerate(self.ALPHABET[base]))
-                except KeyError:
-                    raise TypeError('Unsupported base encoding.')
-
-                self.unbase = self._dict_unbaser
-
-        def __call__(self, _string):
-            return self.unbase(_string)
-
-        def _dict_unbaser(self, _string):
-            """Decodes a  value to an integer."""
-            ret = 0
-            for index, cipher in enumerate(_string[::-1]):
-                ret += (self.base ** index) * self.dictionary[cipher]
-            return ret
-
-    pattern = r'(eval\(function\(p,a,c,k,e(?:.|\s)+?\))<\/script>'
+            def replace(index_match):
+                index = int(index_match.group(1))
+                if index < len(lookup):
+                    return '"%s"' % lookup[index]
+                return index_match.group(0)
+
+            source = re.sub(re.escape(varname) + r"\[(\d+)\]", replace, source)
+            return source[startpoint:]
+        return source
+
+
+_packer = cPacker()
+
+
+def detect(source) -> bool:
+    """Detects whether `source` is P.A.C.K.E.R. coded."""
+    return _packer.detect(source)
+
+
+@traced("encryption.unpack", "crypto")
+def unpack(source) -> str:
+    """
+    Unpacks P.A.C.K.E.R. packed js code.
+    :raises UnpackingError: if the source is not valid p.a.c.k.e.r. data
+    """
+    return _packer.unpack(source)
+
+
+@traced("encryption.PACKER", "crypto")
+def PACKER(string, cust_pattern=None):
+    """
+    Unpacks the first P.A.C.K.E.R. block found in string.
+    Use encryption.extract.extract_scripts to decode every block of a page.
+
+    :param string: page or script containing packed code
+    :param cust_pattern: custom pattern (matched against the parsers.regex normalised string) whose first group is
+        the packed code
+    :return: the unpacked code, or string unchanged if nothing could be unpacked
+    """
     if cust_pattern is not None:
-        pattern = cust_pattern
-    result = regex(string, pattern)
-    if result[0] is True:
-        string = cPacker().unpack(result[1][0])
+        result = regex(string, cust_pattern)
+    else:
+        match = _PACKED.search(string)
+        result = [match.group(0)] if match else []
+    if result:
+        packed = result[0]
+        if isinstance(packed, tuple):
+            # findall gives one tuple per match when the pattern has several groups
+            packed = packed[0]
+        try:
+            string = _packer.unpack(packed)
+        except UnpackingError as err:
+            log(err, log_level="e", color="red")
     return string
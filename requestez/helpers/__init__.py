@@ -1,5 +1,5 @@
 from time import sleep
 from .merge import merge
 from .logger import log, set_log_level, get_logger, LOGGER, critical, error, warning, info, debug
-from .progress_bar import pbar, Colors
+from .progress_bar import pbar, MultiBar, RateEstimator, Colors
 
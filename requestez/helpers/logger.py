@@ -5,12 +5,47 @@ and the log() method to log messages
 refer to the colors class to know the colors available
 """
 import logging
+import logging.handlers
+import atexit
+import queue
 import inspect
 import os
 import json
 import datetime
 import sys
-from typing import Optional
+import threading
+from functools import lru_cache
+from typing import Optional, List
+from .tracing import span
+
+_LEVELS = {
+    "i": logging.INFO, "info": logging.INFO,
+    "w": logging.WARNING, "warning": logging.WARNING,
+    "c": logging.CRITICAL, "critical": logging.CRITICAL,
+    "e": logging.ERROR, "error": logging.ERROR,
+    "d": logging.DEBUG, "debug": logging.DEBUG
+}
+
+
+@lru_cache(maxsize=1024)
+def _relative_path(pathname: str) -> str:
+    """Memoised per pathname, records from the same file skip the filesystem check."""
+    return os.path.relpath(pathname) if os.path.exists(pathname) else pathname
+
+
+class _Message:
+    """Joins the messages only when a handler actually formats the record."""
+    __slots__ = ("messages", "sep", "_text")
+
+    def __init__(self, messages, sep=" "):
+        self.messages = messages
+        self.sep = sep
+        self._text = None
+
+    def __str__(self):
+        if self._text is None:
+            self._text = self.sep.join(map(str, self.messages))
+        return self._text
 
 class Colors:
     # Text colors
@@ -81,6 +116,7 @@ class CustomFormatter(logging.Formatter):
     def __init__(self, fmt=None, datefmt=None, style='%'):
         super().__init__(fmt, datefmt, style)
         self.default_format = "%(color)s%(file)s:%(line)s | %(name)s | \033[4m%(levelname)s%(reset)s%(color)s | %(asctime)s ||-> %(msg)s%(reset)s"
+        self._formatter = logging.Formatter(self.default_format, datefmt="%Y-%m-%d %I:%M:%S %p")
 
     def format(self, record):
         # Set default color if not present
@@ -90,26 +126,119 @@ class CustomFormatter(logging.Formatter):
             record.reset = Colors.RESET
         
         # Populate custom fields
-        record.file = os.path.relpath(record.pathname) if os.path.exists(record.pathname) else record.pathname
+        record.file = _relative_path(record.pathname)
         record.line = record.lineno
         
         # Format the message
-        log_fmt = self.default_format
-        formatter = logging.Formatter(log_fmt, datefmt="%Y-%m-%d %I:%M:%S %p")
-        return formatter.format(record)
+        return self._formatter.format(record)
 
 class JsonFormatter(logging.Formatter):
     def format(self, record):
         log_data = {
             "timestamp": self.formatTime(record, "%Y-%m-%d %I:%M:%S %p"),
-            "file": os.path.relpath(record.pathname) if os.path.exists(record.pathname) else record.pathname,
+            "file": _relative_path(record.pathname),
             "line": record.lineno,
             "name": record.name,
             "level": record.levelname,
             "message": record.getMessage(),
         }
+        # structured request record attached by telemetry.LogSink
+        request = getattr(record, "request", None)
+        if request is not None:
+            log_data["request"] = request
         return json.dumps(log_data)
 
+class BatchingQueueListener:
+    """
+    Background thread draining a log queue: everything already queued (up to batch_size records) is handled per
+    wake up and written to each stream handler with one write + flush, instead of one write + flush per record.
+    Records carrying console_text (raw print-style output from log()) are written verbatim to stdout instead of
+    going through the console handler.
+    """
+    _sentinel = object()
+
+    def __init__(self, log_queue, *handlers, console_handler=None, batch_size=256):
+        self.queue = log_queue
+        self.handlers = list(handlers)
+        self.console_handler = console_handler
+        self.batch_size = batch_size
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="requestez-log", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Writes everything queued so far and stops the thread."""
+        if self._thread is None:
+            return
+        self.queue.put(self._sentinel)
+        self._thread.join()
+        self._thread = None
+
+    def _run(self):
+        q = self.queue
+        while True:
+            batch = [q.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(q.get_nowait())
+                except queue.Empty:
+                    break
+            records = [record for record in batch if record is not self._sentinel]
+            if records:
+                try:
+                    self.handle_batch(records)
+                except Exception:
+                    # a failing handler must not kill the thread, queue.join() in flush() would never return
+                    pass
+            for _ in batch:
+                q.task_done()
+            if len(records) != len(batch):
+                break
+
+    def handle_batch(self, records: List[logging.LogRecord]):
+        # print-style output goes to stdout like the synchronous log() does
+        console_text = [record.console_text for record in records if getattr(record, "console_text", None) is not None]
+        if console_text:
+            sys.stdout.write("".join(console_text))
+            sys.stdout.flush()
+        for handler in list(self.handlers):
+            stream = getattr(handler, "stream", None)
+            if not isinstance(handler, logging.StreamHandler) or stream is None:
+                for record in records:
+                    if record.levelno >= handler.level:
+                        handler.handle(record)
+                continue
+            chunks = []
+            for record in records:
+                if record.levelno < handler.level:
+                    continue
+                if handler is self.console_handler and getattr(record, "console_text", None) is not None:
+                    continue
+                if not handler.filter(record):
+                    continue
+                try:
+                    chunks.append(handler.format(record) + handler.terminator)
+                except Exception:
+                    handler.handleError(record)
+            if chunks:
+                handler.acquire()
+                try:
+                    stream.write("".join(chunks))
+                    stream.flush()
+                except Exception:
+                    handler.handleError(records[-1])
+                finally:
+                    handler.release()
+
+
+class _PassThroughQueueHandler(logging.handlers.QueueHandler):
+    """Enqueues records untouched, formatting happens on the listener thread."""
+    def prepare(self, record):
+        return record
+
+
 class LOGGER:
     _instance = None
 
@@ -133,13 +262,74 @@ class LOGGER:
         
         self.file_handler = None
         self.json_file_handler = None
+        self.queue_handler = None
+        self.queue_listener = None
         self.initialized = True
 
+    def _handlers(self):
+        if self.queue_listener is not None:
+            return list(self.queue_listener.handlers)
+        return list(self.logger.handlers)
+
+    def _attach(self, handler):
+        if self.queue_listener is not None:
+            self.queue_listener.handlers.append(handler)
+        else:
+            self.logger.addHandler(handler)
+
+    def _detach(self, handler):
+        if self.queue_listener is not None:
+            # let records already queued for this handler reach it first
+            self.flush()
+            if handler in self.queue_listener.handlers:
+                self.queue_listener.handlers.remove(handler)
+        else:
+            self.logger.removeHandler(handler)
+
+    def enable_async_logging(self, batch_size: int = 256):
+        """
+        Moves console and file/json output to a background thread.
+        Logging calls only enqueue a record, a BatchingQueueListener drains the queue and writes in batches,
+        so request threads and the event loop never block on terminal or disk I/O.
+
+        :param batch_size: max records written per wake up of the listener
+        """
+        if self.queue_listener is not None:
+            return
+        handlers = list(self.logger.handlers)
+        log_queue = queue.Queue()
+        self.queue_listener = BatchingQueueListener(log_queue, *handlers, console_handler=self.console_handler,
+                                                    batch_size=batch_size)
+        self.queue_handler = _PassThroughQueueHandler(log_queue)
+        for handler in handlers:
+            self.logger.removeHandler(handler)
+        self.logger.addHandler(self.queue_handler)
+        self.queue_listener.start()
+        atexit.register(self.disable_async_logging)
+
+    def disable_async_logging(self):
+        """Flushes everything still queued and goes back to writing from the calling thread."""
+        if self.queue_listener is None:
+            return
+        listener = self.queue_listener
+        listener.stop()
+        self.logger.removeHandler(self.queue_handler)
+        self.queue_listener = None
+        self.queue_handler = None
+        for handler in listener.handlers:
+            self.logger.addHandler(handler)
+        atexit.unregister(self.disable_async_logging)
+
+    def flush(self):
+        """Blocks until every queued record has been written (no-op when async logging is off)."""
+        if self.queue_listener is not None:
+            self.queue_listener.queue.join()
+
     def set_level(self, level):
         level_code = self._convert_log_level(level)
         self.logger.setLevel(level_code)
         # Also set handler levels to ensure they capture everything
-        for handler in self.logger.handlers:
+        for handler in self._handlers():
             handler.setLevel(level_code)
 
     def enable_file_logging(self, enabled: bool = True, log_path: Optional[str] = None, json_path: Optional[str] = None):
@@ -149,58 +339,69 @@ class LOGGER:
 
         if log_path:
             if self.file_handler:
-                self.logger.removeHandler(self.file_handler)
+                self._detach(self.file_handler)
             self.file_handler = logging.FileHandler(log_path)
             self.file_handler.setFormatter(CustomFormatter()) # Use same format for text file
-            self.logger.addHandler(self.file_handler)
+            self._attach(self.file_handler)
             
         if json_path:
             if self.json_file_handler:
-                self.logger.removeHandler(self.json_file_handler)
+                self._detach(self.json_file_handler)
             self.json_file_handler = logging.FileHandler(json_path)
             self.json_file_handler.setFormatter(JsonFormatter())
-            self.logger.addHandler(self.json_file_handler)
+            self._attach(self.json_file_handler)
 
         print(f"Logging enabled. Logs will be saved to {log_path} and {json_path}")
 
     def disable_file_logging(self):
         if self.file_handler:
-            self.logger.removeHandler(self.file_handler)
+            self._detach(self.file_handler)
             self.file_handler = None
         if self.json_file_handler:
-            self.logger.removeHandler(self.json_file_handler)
+            self._detach(self.json_file_handler)
             self.json_file_handler = None
 
     def _convert_log_level(self, level):
         if isinstance(level, int):
             return level
-        level = level.lower()
-        mapping = {
-            "i": logging.INFO, "info": logging.INFO,
-            "w": logging.WARNING, "warning": logging.WARNING,
-            "c": logging.CRITICAL, "critical": logging.CRITICAL,
-            "e": logging.ERROR, "error": logging.ERROR,
-            "d": logging.DEBUG, "debug": logging.DEBUG
-        }
-        return mapping.get(level, logging.INFO)
+        try:
+            return _LEVELS[level]
+        except KeyError:
+            return _LEVELS.get(level.lower(), logging.INFO)
+
+    def is_enabled(self, level) -> bool:
+        """Cheap check whether a record at level would be emitted at all."""
+        return self.logger.isEnabledFor(self._convert_log_level(level))
+
+    def has_file_output(self) -> bool:
+        """True if any handler besides the console one would receive records."""
+        if self.queue_listener is not None:
+            return True
+        for handler in self.logger.handlers:
+            if handler is not self.console_handler:
+                return True
+        return False
 
     def log(self, level, *messages, **kwargs):
         level_code = self._convert_log_level(level)
+        # Bail out before any formatting or stack walking
+        if not self.logger.isEnabledFor(level_code):
+            return
         
         # Handle color
         color = kwargs.get('color')
         color_code = Colors.get_color(color)
         
-        # Format messages
+        # Messages are joined lazily, only if a handler formats the record
         sep = kwargs.get('sep', ' ')
-        msg = sep.join(map(str, messages))
+        msg = _Message(messages, sep)
         
         # Add extra context for the formatter
         extra = {'color': color_code}
         
         if kwargs.get('full_stack'):
              import traceback
-             msg += "\n" + "".join(traceback.format_stack()[:-1])
+             msg = str(msg) + "\n" + "".join(traceback.format_stack()[:-1])
 
         # Determine stack level
         stack_depth = kwargs.get('stack_depth', 2)
@@ -208,6 +409,9 @@ class LOGGER:
         # Check if we should skip console logging (handled by caller if stack=False)
         if kwargs.get('skip_console'):
             extra['skip_console'] = True
+        # Raw print-style output routed through the async queue (see log())
+        if kwargs.get('console_text') is not None:
+            extra['console_text'] = kwargs['console_text']
         
         self.logger.log(level_code, msg, extra=extra, stacklevel=stack_depth)
 
@@ -230,11 +434,27 @@ def set_log_level(log_level="i"):
 def get_logger():
     return logger
 
-def log(*messages, sep=" ", end="\n", flush=False, color=None, stack=False, log_level="info", msg="args : ", full_stack=False, **kwargs):
+def log(*messages, sep=" ", end="\n", flush=False, color=None, stack=False, log_level="info", msg="args : ", full_stack=False, lazy=False, **kwargs):
+    """
+    :param lazy: call every callable in messages to get its value, only once the level is known to be enabled
+        (e.g. log(lambda: expensive_dump(data), log_level="debug", lazy=True))
+    """
+    # Nothing below runs (joining, printing, stack walking) if the level is disabled
+    if not logger.is_enabled(log_level):
+        return
+    with span("log", "logging"):
+        # _log is one frame further from the caller than stack_depth counts
+        kwargs['stack_depth'] = kwargs.get('stack_depth', 3) + 1
+        _log(messages, sep, end, flush, color, stack, log_level, msg, full_stack, lazy, **kwargs)
+
+
+def _log(messages, sep, end, flush, color, stack, log_level, msg, full_stack, lazy, **kwargs):
     # 'msg' prefix is handled differently, we just prepend it if provided
     if msg and msg != "args : ":
          messages = (msg,) + messages
-    
+    if lazy:
+        messages = tuple(message() if callable(message) else message for message in messages)
+
     # If stack or full_stack is True, behave like a logger (formatted)
     if stack or full_stack:
         stack_depth = kwargs.get('stack_depth', 3)
@@ -244,42 +464,51 @@ def log(*messages, sep=" ", end="\n", flush=False, color=None, stack=False, log_
         # 1. Print to console manually
         color_code = Colors.get_color(color)
         reset_code = Colors.RESET if color else ""
-        
+
         # Construct message for printing
         print_msg = sep.join(map(str, messages))
-        
+        stack_depth = kwargs.get('stack_depth', 3)
+
+        # Async logging: the console write happens on the listener thread, in order with every other record
+        if logger.queue_listener is not None:
+            console_text = f"{color_code}{print_msg}{reset_code}{end}" if color else f"{print_msg}{end}"
+            logger.log(log_level, print_msg, color=color, full_stack=full_stack, stack_depth=stack_depth,
+                       console_text=console_text)
+            return
+
         if color:
             sys.stdout.write(color_code)
-        
+
         sys.stdout.write(print_msg)
-        
+
         if color:
             sys.stdout.write(reset_code)
-            
+
         sys.stdout.write(end)
         if flush:
             sys.stdout.flush()
-            
+
         # 2. Log to file (skip console)
         # We need to log it so it appears in the file if file logging is enabled
         # But we don't want it to appear in console again.
         # We use a special flag 'skip_console'
-        stack_depth = kwargs.get('stack_depth', 3)
-        logger.log(log_level, *messages, sep=sep, color=color, full_stack=full_stack, stack_depth=stack_depth, skip_console=True)
+        # Without any file handler the record would only be dropped by ConsoleFilter, so don't build it
+        if logger.has_file_output():
+            logger.log(log_level, print_msg, color=color, full_stack=full_stack, stack_depth=stack_depth, skip_console=True)
 
-def info(*messages, sep=" ", end="\n", flush=False, color="blue", stack=False, msg="args : ", full_stack=False):
+def info(*messages, sep=" ", end="\n", flush=False, color="blue", stack=False, msg="args : ", full_stack=False, lazy=False):
     # User -> info -> log -> logger.log
     # Depth: 4
-    log(*messages, sep=sep, end=end, flush=flush, color=color, stack=stack, log_level="info", msg=msg, full_stack=full_stack, stack_depth=4)
+    log(*messages, sep=sep, end=end, flush=flush, color=color, stack=stack, log_level="info", msg=msg, full_stack=full_stack, lazy=lazy, stack_depth=4)
 
-def debug(*messages, sep=" ", end="\n", flush=False, color=None, stack=False, msg="args : ", full_stack=False):
-    log(*messages, sep=sep, end=end, flush=flush, color=color, stack=stack, log_level="debug", msg=msg, full_stack=full_stack, stack_depth=4)
+def debug(*messages, sep=" ", end="\n", flush=False, color=None, stack=False, msg="args : ", full_stack=False, lazy=False):
+    log(*messages, sep=sep, end=end, flush=flush, color=color, stack=stack, log_level="debug", msg=msg, full_stack=full_stack, lazy=lazy, stack_depth=4)
 
-def warning(*messages, sep=" ", end="\n", flush=False, color="yellow", stack=False, msg="args : ", full_stack=False):
-    log(*messages, sep=sep, end=end, flush=flush, color=color, stack=stack, log_level="warning", msg=msg, full_stack=full_stack, stack_depth=4)
+def warning(*messages, sep=" ", end="\n", flush=False, color="yellow", stack=False, msg="args : ", full_stack=False, lazy=False):
+    log(*messages, sep=sep, end=end, flush=flush, color=color, stack=stack, log_level="warning", msg=msg, full_stack=full_stack, lazy=lazy, stack_depth=4)
 
-def error(*messages, sep=" ", end="\n", flush=False, color="red", stack=False, msg="args : ", full_stack=False):
-    log(*messages, sep=sep, end=end, flush=flush, color=color, stack=stack, log_level="error", msg=msg, full_stack=full_stack, stack_depth=4)
+def error(*messages, sep=" ", end="\n", flush=False, color="red", stack=False, msg="args : ", full_stack=False, lazy=False):
+    log(*messages, sep=sep, end=end, flush=flush, color=color, stack=stack, log_level="error", msg=msg, full_stack=full_stack, lazy=lazy, stack_depth=4)
 
-def critical(*messages, sep=" ", end="\n", flush=False, color="orange", stack=False, msg="args : ", full_stack=False):
-    log(*messages, sep=sep, end=end, flush=flush, color=color, stack=stack, log_level="critical", msg=msg, full_stack=full_stack, stack_depth=4)
+def critical(*messages, sep=" ", end="\n", flush=False, color="orange", stack=False, msg="args : ", full_stack=False, lazy=False):
+    log(*messages, sep=sep, end=end, flush=flush, color=color, stack=stack, log_level="critical", msg=msg, full_stack=full_stack, lazy=lazy, stack_depth=4)
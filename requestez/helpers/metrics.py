@@ -0,0 +1,374 @@
+"""
+In-process metrics: counters, gauges and fixed-bucket histograms with labels.
+Exposed as Prometheus text (registry.exposition()) or a plain dict (registry.snapshot()).
+"""
+import functools
+import math
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+from urllib.parse import urlsplit
+
+# seconds, tuned for HTTP requests (a few ms on a warm connection up to slow downloads)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# seconds, tuned for parsing a page
+PARSE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+# label value recorded instead of the values past a label's limit
+OTHER = "other"
+# distinct hosts the built-in per-host metrics keep apart (see set_host_limit)
+DEFAULT_HOST_LIMIT = 1000
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels_text(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _CounterValue:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1):
+        if amount < 0:
+            raise ValueError("counters can only increase")
+        with self._lock:
+            self.value += amount
+
+
+class _GaugeValue:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def set(self, value: float):
+        self.value = value
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1):
+        self.inc(-amount)
+
+
+class _HistogramValue:
+    __slots__ = ("bounds", "counts", "sum", "count", "_lock")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        # one slot per bound plus the +Inf overflow, cumulated only when read
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def cumulative(self) -> List[Tuple[float, int]]:
+        with self._lock:
+            counts = list(self.counts)
+        total = 0
+        result = []
+        for bound, count in zip(self.bounds + (math.inf,), counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimates the q quantile by linear interpolation inside the bucket it falls in (like histogram_quantile)."""
+        buckets = self.cumulative()
+        total = buckets[-1][1]
+        if not total:
+            return None
+        rank = q * total
+        lower_bound, lower_count = 0.0, 0
+        for bound, count in buckets:
+            if count >= rank:
+                if bound == math.inf:
+                    return lower_bound
+                if count == lower_count:
+                    return bound
+                return lower_bound + (bound - lower_bound) * (rank - lower_count) / (count - lower_count)
+            lower_bound, lower_count = bound, count
+        return lower_bound
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str = "", labelnames: Iterable[str] = (),
+                 limits: Optional[Dict[str, int]] = None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        # label name -> distinct values kept, new values past it are recorded as OTHER (bounds the children)
+        self.limits: Dict[str, int] = dict(limits or {})
+        self._seen: Dict[str, set] = {}
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values, **kwargs):
+        """The child for one combination of label values (created on first use)."""
+        if kwargs:
+            values = tuple(str(kwargs[name]) for name in self.labelnames)
+        else:
+            values = tuple(str(value) for value in values)
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}")
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                if self.limits:
+                    values = self._limit(values)
+                child = self._children.get(values)
+                if child is None:
+                    child = self._children[values] = self._new_child()
+        return child
+
+    def _limit(self, values: Tuple[str, ...]) -> Tuple[str, ...]:
+        limited = list(values)
+        for index, name in enumerate(self.labelnames):
+            limit = self.limits.get(name)
+            if limit is None:
+                continue
+            seen = self._seen.setdefault(name, set())
+            if limited[index] not in seen:
+                if len(seen) >= limit:
+                    limited[index] = OTHER
+                else:
+                    seen.add(limited[index])
+        return tuple(limited)
+
+    def _unlabelled(self):
+        if self.labelnames:
+            raise ValueError(f"{self.name} has labels, use .labels(...)")
+        return self.labels()
+
+    def children(self) -> List[Tuple[Tuple[str, ...], object]]:
+        with self._lock:
+            return list(self._children.items())
+
+    def clear(self):
+        with self._lock:
+            self._children.clear()
+            self._seen.clear()
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterValue()
+
+    def inc(self, amount: float = 1):
+        self._unlabelled().inc(amount)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeValue()
+
+    def set(self, value: float):
+        self._unlabelled().set(value)
+
+    def inc(self, amount: float = 1):
+        self._unlabelled().inc(amount)
+
+    def dec(self, amount: float = 1):
+        self._unlabelled().dec(amount)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str = "", labelnames: Iterable[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS, limits: Optional[Dict[str, int]] = None):
+        super().__init__(name, documentation, labelnames, limits)
+        self.buckets = tuple(sorted(bucket for bucket in buckets if bucket != math.inf))
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float):
+        self._unlabelled().observe(value)
+
+
+class MetricsRegistry:
+    """Holds metrics by name. counter / gauge / histogram return the existing metric when called again."""
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, documentation: str, labelnames: Iterable[str], **kwargs):
+        metric = self._metrics.get(name)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.get(name)
+                if metric is None:
+                    metric = self._metrics[name] = cls(name, documentation, labelnames, **kwargs)
+        if not isinstance(metric, cls):
+            raise ValueError(f"{name} is already registered as a {metric.kind}")
+        return metric
+
+    def counter(self, name: str, documentation: str = "", labelnames: Iterable[str] = (),
+                limits: Optional[Dict[str, int]] = None) -> Counter:
+        """:param limits: label name -> distinct values kept, later new values are recorded as OTHER"""
+        return self._get_or_create(Counter, name, documentation, labelnames, limits=limits)
+
+    def gauge(self, name: str, documentation: str = "", labelnames: Iterable[str] = (),
+              limits: Optional[Dict[str, int]] = None) -> Gauge:
+        return self._get_or_create(Gauge, name, documentation, labelnames, limits=limits)
+
+    def histogram(self, name: str, documentation: str = "", labelnames: Iterable[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS, limits: Optional[Dict[str, int]] = None) -> Histogram:
+        return self._get_or_create(Histogram, name, documentation, labelnames, limits=limits, buckets=buckets)
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def metrics(self) -> List[_Metric]:
+        with self._lock:
+            return list(self._metrics.values())
+
+    def reset(self):
+        """Drops every recorded value (the metrics themselves stay registered)."""
+        for metric in self.metrics():
+            metric.clear()
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """
+        Plain dict of every metric:
+        {name: {"type": ..., "values": [{"labels": {...}, "value": ...}]}}, histograms report
+        count, sum, cumulative buckets and p50 / p90 / p99 estimates instead of value.
+        """
+        result = {}
+        for metric in self.metrics():
+            values = []
+            for label_values, child in metric.children():
+                entry = {"labels": dict(zip(metric.labelnames, label_values))}
+                if isinstance(child, _HistogramValue):
+                    entry.update(count=child.count, sum=child.sum,
+                                 buckets={_format_value(bound): count for bound, count in child.cumulative()},
+                                 p50=child.quantile(0.5), p90=child.quantile(0.9), p99=child.quantile(0.99))
+                else:
+                    entry["value"] = child.value
+                values.append(entry)
+            result[metric.name] = {"type": metric.kind, "help": metric.documentation, "values": values}
+        return result
+
+    def exposition(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        for metric in self.metrics():
+            if metric.documentation:
+                lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for label_values, child in metric.children():
+                if isinstance(child, _HistogramValue):
+                    for bound, count in child.cumulative():
+                        labels = _labels_text(metric.labelnames, label_values, f'le="{_format_value(bound)}"')
+                        lines.append(f"{metric.name}_bucket{labels} {count}")
+                    labels = _labels_text(metric.labelnames, label_values)
+                    lines.append(f"{metric.name}_sum{labels} {_format_value(child.sum)}")
+                    lines.append(f"{metric.name}_count{labels} {child.count}")
+                else:
+                    labels = _labels_text(metric.labelnames, label_values)
+                    lines.append(f"{metric.name}{labels} {_format_value(child.value)}")
+        return "\n".join(lines) + "\n"
+
+
+_registry = MetricsRegistry()
+
+
+def get_registry() -> MetricsRegistry:
+    """The process wide registry requestez instruments."""
+    return _registry
+
+
+def timed(histogram: Histogram, *label_values) -> Callable:
+    """Decorator observing the wall time of every call in histogram (with the given label values)."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                histogram.labels(*label_values).observe(time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+# metrics requestez itself records, the host labels keep DEFAULT_HOST_LIMIT hosts apart
+_HOSTS = {"host": DEFAULT_HOST_LIMIT}
+REQUESTS = _registry.counter("requestez_requests_total", "Requests performed by sessions",
+                             ("backend", "method", "host", "status"), _HOSTS)
+REQUEST_ERRORS = _registry.counter("requestez_request_errors_total", "Requests that raised before a response",
+                                   ("backend", "host", "error"), _HOSTS)
+REQUEST_SECONDS = _registry.histogram("requestez_request_seconds", "Time until the response headers arrived",
+                                      ("host",), limits=_HOSTS)
+IN_FLIGHT = _registry.gauge("requestez_requests_in_flight", "Requests currently being performed")
+DOWNLOADS = _registry.counter("requestez_downloads_total", "Files downloaded by Session.download", ("status",))
+DOWNLOAD_BYTES = _registry.counter("requestez_download_bytes_total", "Bytes written by Session.download", ("host",),
+                                   _HOSTS)
+DOWNLOAD_SECONDS = _registry.histogram("requestez_download_seconds", "Time to download one file", ("host",),
+                                       limits=_HOSTS)
+SEGMENTS = _registry.counter("requestez_segments_total", "m3u8 segments downloaded")
+SEGMENT_BATCH_SECONDS = _registry.histogram("requestez_segment_batch_seconds",
+                                            "Time to download every segment of a playlist")
+PARSE_SECONDS = _registry.histogram("requestez_parse_seconds", "Time spent in a parser per call", ("parser",),
+                                    buckets=PARSE_BUCKETS)
+
+
+def set_host_limit(limit: Optional[int]):
+    """
+    Distinct hosts the built-in per-host metrics keep apart, the others are counted under host="other".
+    0 records every request under "other" (no per-host series), None removes the limit (unbounded on large crawls).
+    Applies to hosts not seen yet.
+    """
+    for metric in (REQUESTS, REQUEST_ERRORS, REQUEST_SECONDS, DOWNLOAD_BYTES, DOWNLOAD_SECONDS):
+        with metric._lock:
+            if limit is None:
+                metric.limits.pop("host", None)
+            else:
+                metric.limits["host"] = limit
+
+
+def observe_request(backend: str, method: str, url: str, status: int, seconds: float):
+    host = urlsplit(url).hostname or ""
+    REQUESTS.labels(backend, method, host, status).inc()
+    REQUEST_SECONDS.labels(host).observe(seconds)
+
+
+def observe_error(backend: str, url: str, error: BaseException):
+    REQUEST_ERRORS.labels(backend, urlsplit(url).hostname or "", type(error).__name__).inc()
@@ -1,12 +1,128 @@
 import sys
+import math
 import time
 import datetime
-from typing import Optional, Union
+import threading
+from collections import deque
+from typing import Any, Callable, Dict, Optional, Union
 from ..parsers import secondsToText
 from .logger import Colors
 
+
+class RateEstimator:
+    """
+    Throughput over a sliding time window plus an exponentially weighted moving average.
+    Used by pbar for its rate / ETA and by the downloader for chunk sizing and stall detection.
+
+    :param window: seconds of samples kept for the windowed (instantaneous) rate
+    :param half_life: seconds after which a sample's weight in the EWMA has halved
+    :param clock: monotonic time source (overridable for tests)
+    """
+    def __init__(self, window: float = 5.0, half_life: float = 2.0, clock: Callable[[], float] = time.monotonic):
+        self.window = window
+        self.half_life = half_life
+        self.clock = clock
+        self.total = 0
+        self.start = clock()
+        self.last_progress = self.start
+        self._samples = deque()
+        self._window_amount = 0
+        self._ewma: Optional[float] = None
+        self._last_sample = self.start
+        # amount added since _last_sample, samples on the same clock tick are folded into the next one
+        self._pending = 0.0
+        self._slow_since: Optional[float] = None
+
+    def reset(self):
+        self.__init__(self.window, self.half_life, self.clock)
+
+    def add(self, amount: float, now: Optional[float] = None):
+        """Records amount units completed at now (default: the clock)."""
+        if now is None:
+            now = self.clock()
+        self.total += amount
+        self._samples.append((now, amount))
+        self._window_amount += amount
+        self._prune(now)
+        if amount:
+            self.last_progress = now
+        self._pending += amount
+        elapsed = now - self._last_sample
+        if elapsed > 0:
+            sample_rate = self._pending / elapsed
+            self._pending = 0.0
+            if self._ewma is None:
+                self._ewma = sample_rate
+            else:
+                weight = 1 - math.exp(-elapsed * math.log(2) / self.half_life)
+                self._ewma += weight * (sample_rate - self._ewma)
+            self._last_sample = now
+
+    def _prune(self, now: float):
+        samples = self._samples
+        horizon = now - self.window
+        while samples and samples[0][0] <= horizon:
+            self._window_amount -= samples.popleft()[1]
+
+    def rate(self, now: Optional[float] = None) -> float:
+        """Units per second over the last window seconds (drops to 0 while nothing arrives)."""
+        if now is None:
+            now = self.clock()
+        self._prune(now)
+        span = min(now - self.start, self.window)
+        return self._window_amount / span if span > 0 else 0.0
+
+    @property
+    def ewma(self) -> float:
+        """Smoothed units per second, less jumpy than rate() for an ETA."""
+        return self._ewma or 0.0
+
+    def average(self, now: Optional[float] = None) -> float:
+        """Units per second since the start."""
+        elapsed = (self.clock() if now is None else now) - self.start
+        return self.total / elapsed if elapsed > 0 else 0.0
+
+    def eta(self, remaining: float) -> Optional[float]:
+        """Seconds until remaining more units are done at the smoothed rate, None while unknown."""
+        rate = self.ewma
+        return remaining / rate if rate > 0 else None
+
+    def idle_for(self, now: Optional[float] = None) -> float:
+        """Seconds since the last non zero sample."""
+        return (self.clock() if now is None else now) - self.last_progress
+
+    def stalled(self, min_rate: float, grace: float, now: Optional[float] = None) -> bool:
+        """
+        True when the windowed rate stayed below min_rate for grace seconds (or nothing arrived for grace seconds).
+        Meant to be polled regularly, the slow period is tracked between calls.
+        :param min_rate: units per second below which the transfer counts as stalled
+        :param grace: seconds of slow progress tolerated before reporting a stall
+        """
+        if now is None:
+            now = self.clock()
+        if self.idle_for(now) >= grace:
+            return True
+        if self.rate(now) >= min_rate:
+            self._slow_since = None
+            return False
+        if self._slow_since is None:
+            self._slow_since = now
+        return now - self._slow_since >= grace
+
+
 class pbar:
-    def __init__(self, total: int, prefix: str = '', suffix: str = '', decimals: int = 1, length: int = 50, fill: str = '█', unit: str = "it", color: str = "reset"):
+    # class wide default for bars created without an explicit headless argument, set pbar.headless = True
+    # to silence every bar requestez draws (downloads, segments, ...) while still counting progress
+    headless = False
+
+    def __init__(self, total: int, prefix: str = '', suffix: str = '', decimals: int = 1, length: int = 50, fill: str = '█', unit: str = "it", color: str = "reset",
+                 min_interval: float = 0.1, min_delta: float = 0.1, headless: Optional[bool] = None, counter: Any = None):
+        """
+        :param min_interval: minimum seconds between two redraws
+        :param min_delta: minimum change in percent between two redraws
+        :param headless: never write to the terminal, only count (None uses the pbar.headless class default)
+        :param counter: object with inc(amount) fed with every increment (e.g. a helpers.metrics Counter)
+        """
         self.total = total
         self.prefix = prefix
         self.suffix = suffix
@@ -23,11 +139,24 @@ class pbar:
         self.started = False
         
         # Rate calculation
-        self.recent_rates = []
-        self.max_recent_rates = 10
+        self.throughput = RateEstimator()
+
+        # Redraw throttling
+        self.min_interval = min_interval
+        self.min_delta = min_delta
+        if headless is not None:
+            self.headless = headless
+        self.counter = counter
+        self.finished = False
+        self._last_draw = 0.0
+        self._last_drawn_iteration = 0
+        # iterations needed before the percent moved by min_delta
+        self._delta_iterations = total * min_delta / 100 if total else 0
 
         # Initial print
-        self._print_progress(0)
+        if not self.headless:
+            self._print_progress(0)
+            self._last_draw = time.monotonic()
 
     def update(self, progress: Optional[int] = None, plus: Optional[int] = None, color: Optional[str] = None, new_line: bool = False, finish: str = "\n"):
         """
@@ -41,54 +170,81 @@ class pbar:
         """
         if not self.started:
             self.start_time = time.time()
+            self.throughput.reset()
             self.started = True
 
+        previous = self.iteration
         if progress is not None:
             self.iteration = progress
         elif plus is not None:
             self.iteration += plus
         else:
             self.iteration += 1
+        if self.iteration != previous:
+            self.throughput.add(self.iteration - previous)
+            if self.counter is not None and self.iteration > previous:
+                self.counter.inc(self.iteration - previous)
+
+        # an unknown (0) total only finishes through close()
+        done = bool(self.total) and self.iteration >= self.total and not self.finished
+        if self.headless:
+            self.finished = self.finished or done
+            return
+        if not done:
+            # skip the redraw unless enough time passed and the bar visibly moved
+            now = time.monotonic()
+            if now - self._last_draw < self.min_interval \
+                    or abs(self.iteration - self._last_drawn_iteration) < self._delta_iterations:
+                return
+            self._last_draw = now
 
         current_color_code = self.color_code
         if color:
             current_color_code = Colors.get_color(color)
 
         self._print_progress(self.iteration, color_code=current_color_code, new_line=new_line)
+        self._last_drawn_iteration = self.iteration
 
-        if self.iteration >= self.total:
+        if done:
+            self.finished = True
             self._finish(finish)
 
+    def close(self, finish: str = "\n"):
+        """Draws the final state if a throttled update was skipped (e.g. the total was unknown) and ends the bar."""
+        if self.finished:
+            return
+        self.finished = True
+        if self.headless:
+            return
+        if self.iteration != self._last_drawn_iteration:
+            self._print_progress(self.iteration)
+        self._finish(finish)
+
     def _print_progress(self, iteration, color_code=None, new_line=False):
         if color_code is None:
             color_code = self.color_code
 
-        percent = ("{0:." + str(self.decimals) + "f}").format(100 * (iteration / float(self.total)))
-        filled_length = int(self.length * iteration // self.total)
+        ratio = min(iteration / float(self.total), 1.0) if self.total else 0.0
+        percent = ("{0:." + str(self.decimals) + "f}").format(100 * ratio)
+        filled_length = int(self.length * ratio)
         bar = self.fill * filled_length + '-' * (self.length - filled_length)
 
         # Time calculations
         current_time = time.time()
         elapsed_time = current_time - self.start_time
         
-        # Rate calculation
-        if iteration > 0 and elapsed_time > 0:
-            rate = iteration / elapsed_time
-        else:
-            rate = 0
-            
+        # Rate calculation: current throughput over the window, ETA from the smoothed rate
+        rate = self.throughput.rate()
+        average = self.throughput.average()
+
         # ETA calculation
-        remaining = self.total - iteration
-        if rate > 0:
-            eta_seconds = remaining / rate
-            eta = secondsToText(int(eta_seconds))
-        else:
-            eta = "Unknown"
+        eta_seconds = self.throughput.eta(self.total - iteration) if self.total else None
+        eta = secondsToText(int(eta_seconds)) if eta_seconds is not None else "Unknown"
             
         elapsed_str = secondsToText(int(elapsed_time))
         
         # Rate string
-        rate_str = f"{rate:.2f} {self.unit}/s"
+        rate_str = f"{rate:.2f} {self.unit}/s (avg {average:.2f})"
 
         # Construct the line
         # Format: Prefix | Percent% |Bar| Iteration/Total | Suffix | Elapsed | ETA | Rate
@@ -102,6 +258,70 @@ class pbar:
         sys.stdout.write(finish_str)
         sys.stdout.flush()
 
+class _WorkerBar:
+    """Per worker handle of a MultiBar, same update signature as pbar."""
+    __slots__ = ("_multi", "name")
+
+    def __init__(self, multi: "MultiBar", name: str):
+        self._multi = multi
+        self.name = name
+
+    def update(self, progress: Optional[int] = None, plus: Optional[int] = None, **kwargs):
+        self._multi.update(plus=1 if progress is None and plus is None else plus, progress=progress, worker=self.name)
+
+    def close(self, finish: str = "\n"):
+        pass
+
+
+class MultiBar:
+    """
+    One overall bar fed by many concurrent workers.
+    Workers only add to their own counter under a lock, the shared bar is redrawn at most once per min_interval
+    and its suffix shows how many workers contributed.
+
+    :param total: total over every worker
+    :param kwargs: passed to pbar (prefix, unit, color, min_interval, headless, ...)
+    """
+    def __init__(self, total: int, **kwargs):
+        self._lock = threading.Lock()
+        self._counts: Dict[str, int] = {}
+        self._suffix = kwargs.pop("suffix", "")
+        self.bar = pbar(total, suffix=self._suffix, **kwargs)
+
+    def worker(self, name: Optional[str] = None) -> _WorkerBar:
+        """A pbar like handle for one worker (named after the calling thread by default)."""
+        return _WorkerBar(self, name or threading.current_thread().name)
+
+    def update(self, plus: Optional[int] = None, progress: Optional[int] = None, worker: Optional[str] = None,
+               color: Optional[str] = None, finish: str = "\n"):
+        """
+        :param plus: amount this worker progressed (default 1)
+        :param progress: absolute progress of this worker
+        :param worker: worker name, defaults to the calling thread's name
+        """
+        if worker is None:
+            worker = threading.current_thread().name
+        with self._lock:
+            before = self._counts.get(worker, 0)
+            now = progress if progress is not None else before + (1 if plus is None else plus)
+            self._counts[worker] = now
+            self.bar.suffix = f"{self._suffix} {len(self._counts)} workers".strip()
+            self.bar.update(plus=now - before, color=color, finish=finish)
+
+    def counts(self) -> Dict[str, int]:
+        """Progress per worker."""
+        with self._lock:
+            return dict(self._counts)
+
+    @property
+    def iteration(self) -> int:
+        return self.bar.iteration
+
+    def close(self, finish: str = "\n"):
+        with self._lock:
+            self.bar.close(finish)
+
+
 if __name__ == "__main__":
     # Test
     total_items = 50
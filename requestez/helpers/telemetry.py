@@ -0,0 +1,176 @@
+"""
+Structured per-request records.
+Sessions build a RequestRecord for every request once at least one sink is listening,
+sinks are plain callables (a RingBuffer, a LogSink feeding JsonFormatter, or any user callback).
+"""
+import json
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import urlencode, urlsplit
+from .logger import get_logger
+
+Sink = Callable[["RequestRecord"], Any]
+
+
+class RequestRecord:
+    """
+    One request as seen by a session.
+
+    :ivar timings: seconds since the request started, keys present depend on the backend
+        ("dns", "connect", "tls", "ttfb", "total")
+    :ivar retries: retries performed for this request (filled in by retrying layers)
+    :ivar cache_hit: True if the response did not come from the network
+    """
+    __slots__ = ("method", "url", "host", "status", "bytes_in", "bytes_out", "timings", "retries", "redirects",
+                 "cache_hit", "error", "started", "backend")
+
+    def __init__(self, method: str, url: str, status: Optional[int] = None, bytes_in: Optional[int] = None,
+                 bytes_out: int = 0, timings: Optional[Dict[str, float]] = None, retries: int = 0,
+                 redirects: int = 0, cache_hit: bool = False, error: Optional[str] = None,
+                 started: Optional[float] = None, backend: Optional[str] = None):
+        self.method = method
+        self.url = url
+        self.host = urlsplit(url).hostname
+        self.status = status
+        self.bytes_in = bytes_in
+        self.bytes_out = bytes_out
+        self.timings = timings or {}
+        self.retries = retries
+        self.redirects = redirects
+        self.cache_hit = cache_hit
+        self.error = error
+        self.started = time.time() if started is None else started
+        self.backend = backend
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self):
+        total = self.timings.get("total")
+        total = f"{total * 1000:.1f}ms" if total is not None else "?"
+        return f"<RequestRecord {self.method} {self.url} {self.status or self.error} {total}>"
+
+
+def body_size(kwargs: Dict[str, Any]) -> int:
+    """Best effort size of the request body passed to _perform_request."""
+    for key in ("data", "content", "json"):
+        body = kwargs.get(key)
+        if body is None:
+            continue
+        if isinstance(body, (bytes, bytearray)):
+            return len(body)
+        if isinstance(body, str):
+            return len(body.encode("utf-8"))
+        if key == "json":
+            return len(json.dumps(body))
+        if isinstance(body, dict):
+            return len(urlencode(body))
+    return 0
+
+
+def response_size(response: Any, streamed: bool) -> Optional[int]:
+    """Body size without forcing a streamed body to be read."""
+    if not streamed:
+        try:
+            return len(response.content)
+        except Exception:
+            pass
+    length = response.headers.get("content-length")
+    return int(length) if length is not None and length.isdigit() else None
+
+
+def build_record(method: str, url: str, kwargs: Dict[str, Any], response: Any = None, started: float = None,
+                 total: float = None, timings: Optional[Dict[str, float]] = None, backend: Optional[str] = None,
+                 error: Optional[BaseException] = None) -> RequestRecord:
+    timings = dict(timings or {})
+    if total is not None:
+        timings["total"] = total
+    record = RequestRecord(method, url, bytes_out=body_size(kwargs), timings=timings, started=started,
+                           backend=backend)
+    if error is not None:
+        record.error = f"{type(error).__name__}: {error}"
+        return record
+    record.status = response.status_code
+    record.bytes_in = response_size(response, bool(kwargs.get("stream")))
+    record.redirects = len(getattr(response, "history", None) or ())
+    record.cache_hit = bool(getattr(response, "from_cache", False))
+    return record
+
+
+class RingBuffer:
+    """Sink keeping the last maxlen records in memory."""
+    def __init__(self, maxlen: int = 1000):
+        self._records = deque(maxlen=maxlen)
+
+    def __call__(self, record: RequestRecord):
+        self._records.append(record)
+
+    def records(self) -> List[RequestRecord]:
+        return list(self._records)
+
+    def slowest(self, count: int = 10) -> List[RequestRecord]:
+        return sorted(self._records, key=lambda record: record.timings.get("total", 0), reverse=True)[:count]
+
+    def clear(self):
+        self._records.clear()
+
+    def __len__(self):
+        return len(self._records)
+
+
+class LogSink:
+    """
+    Sink logging each record through the requestez logger.
+    The record is attached as `request` so JsonFormatter writes it as a structured field.
+
+    :param level: log level of the records
+    :param console: also print to the console (off by default, the file/json handlers are the target)
+    """
+    def __init__(self, level: str = "info", console: bool = False):
+        self.level = level
+        self.console = console
+
+    def __call__(self, record: RequestRecord):
+        logger = get_logger()
+        if not logger.is_enabled(self.level):
+            return
+        message = f"{record.method} {record.url} {record.status or record.error}"
+        logger.logger.log(logger._convert_log_level(self.level), message,
+                          extra={"request": record.to_dict(), "skip_console": not self.console})
+
+
+class Telemetry:
+    """Fans records out to sinks. Sessions skip building records entirely while no sink is registered."""
+    def __init__(self):
+        self._sinks: List[Sink] = []
+        self._lock = threading.Lock()
+
+    @property
+    def active(self) -> bool:
+        return bool(self._sinks)
+
+    def add_sink(self, sink: Sink) -> Sink:
+        with self._lock:
+            self._sinks = self._sinks + [sink]
+        return sink
+
+    def remove_sink(self, sink: Sink):
+        with self._lock:
+            self._sinks = [existing for existing in self._sinks if existing is not sink]
+
+    def emit(self, record: RequestRecord):
+        for sink in self._sinks:
+            try:
+                sink(record)
+            except Exception as e:
+                get_logger().log("e", "telemetry sink", sink, "failed:", e, color="red")
+
+
+_telemetry = Telemetry()
+
+
+def get_telemetry() -> Telemetry:
+    """The process wide Telemetry used by sessions whose `telemetry` attribute is None."""
+    return _telemetry
@@ -0,0 +1,215 @@
+"""
+Opt-in tracing spans.
+Spans nest through a context variable (so they follow threads and asyncio tasks), cost a single global check while
+tracing is off, and can be exported as a Chrome trace (chrome://tracing, Perfetto) or summarised as a top-N table.
+"""
+import contextvars
+import functools
+import inspect
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+
+_current: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("requestez_span", default=None)
+_tracer: Optional["Tracer"] = None
+
+
+class Span:
+    """One timed section. times are perf_counter seconds, child_time is the time spent in direct children."""
+    __slots__ = ("name", "category", "start", "end", "parent", "args", "child_time", "tid")
+
+    def __init__(self, name: str, category: str, parent: Optional["Span"], args: Optional[Dict[str, Any]], tid: int):
+        self.name = name
+        self.category = category
+        self.parent = parent
+        self.args = args
+        self.tid = tid
+        self.child_time = 0.0
+        self.end = 0.0
+        self.start = time.perf_counter()
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+    @property
+    def self_time(self) -> float:
+        # children running concurrently (asyncio tasks) can add up to more than the span itself
+        return max(self.duration - self.child_time, 0.0)
+
+    def __repr__(self):
+        return f"<Span {self.name} {self.duration * 1000:.3f}ms>"
+
+
+def _lane() -> int:
+    """Chrome trace "thread" of a root span: the asyncio task when there is one, so concurrent tasks don't overlap."""
+    # asyncio is only looked up, a process that never imported it has no tasks
+    asyncio = sys.modules.get("asyncio")
+    task = None
+    if asyncio is not None:
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            pass
+    return id(task) if task is not None else threading.get_ident()
+
+
+class _SpanContext:
+    __slots__ = ("_tracer", "_name", "_category", "_args", "_span", "_token")
+
+    def __init__(self, tracer: "Tracer", name: str, category: str, args: Optional[Dict[str, Any]]):
+        self._tracer = tracer
+        self._name = name
+        self._category = category
+        self._args = args
+
+    def __enter__(self) -> Span:
+        parent = _current.get()
+        self._span = Span(self._name, self._category, parent, self._args, parent.tid if parent else _lane())
+        self._token = _current.set(self._span)
+        return self._span
+
+    def __exit__(self, exc_type, exc, tb):
+        span = self._span
+        span.end = time.perf_counter()
+        _current.reset(self._token)
+        if exc_type is not None:
+            span.args = dict(span.args or {}, error=exc_type.__name__)
+        if span.parent is not None:
+            span.parent.child_time += span.duration
+        self._tracer.record(span)
+
+
+class _NoSpan:
+    """Shared do-nothing context manager handed out while tracing is off."""
+    __slots__ = ()
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, exc_type, exc, tb):
+        return None
+
+
+_NO_SPAN = _NoSpan()
+
+
+class Tracer:
+    """
+    Collects finished spans.
+
+    :param max_spans: only the most recent max_spans spans are kept
+    """
+    def __init__(self, max_spans: int = 100000):
+        self.spans: deque = deque(maxlen=max_spans)
+        self.origin = time.perf_counter()
+        self.pid = os.getpid()
+
+    def record(self, span: Span):
+        self.spans.append(span)
+
+    def clear(self):
+        self.spans.clear()
+
+    def chrome_events(self) -> List[Dict[str, Any]]:
+        events = []
+        for span in list(self.spans):
+            event = {"name": span.name, "cat": span.category, "ph": "X", "pid": self.pid, "tid": span.tid,
+                     "ts": (span.start - self.origin) * 1e6, "dur": span.duration * 1e6}
+            if span.args:
+                event["args"] = {key: value if isinstance(value, (int, float, bool)) or value is None else str(value)
+                                 for key, value in span.args.items()}
+            events.append(event)
+        return events
+
+    def export_chrome(self, path: str):
+        """Writes the spans as a Chrome trace-event JSON file (open in chrome://tracing or ui.perfetto.dev)."""
+        with open(path, "w") as file:
+            json.dump({"traceEvents": self.chrome_events(), "displayTimeUnit": "ms"}, file)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Per span name: calls, total, self (total minus children), max, all in seconds."""
+        stats: Dict[str, Dict[str, float]] = {}
+        for span in list(self.spans):
+            entry = stats.get(span.name)
+            if entry is None:
+                entry = stats[span.name] = {"calls": 0, "total": 0.0, "self": 0.0, "max": 0.0}
+            duration = span.duration
+            entry["calls"] += 1
+            entry["total"] += duration
+            entry["self"] += span.self_time
+            entry["max"] = max(entry["max"], duration)
+        return stats
+
+    def summary(self, top: int = 20, sort: str = "self") -> str:
+        """Text table of the top spans by self (default) or total time."""
+        stats = sorted(self.stats().items(), key=lambda item: item[1][sort], reverse=True)[:top]
+        lines = [f"{'span':<40} {'calls':>8} {'self ms':>12} {'total ms':>12} {'mean ms':>10} {'max ms':>10}"]
+        for name, entry in stats:
+            lines.append(f"{name:<40} {entry['calls']:>8} {entry['self'] * 1000:>12.3f} {entry['total'] * 1000:>12.3f}"
+                         f" {entry['total'] / entry['calls'] * 1000:>10.3f} {entry['max'] * 1000:>10.3f}")
+        return "\n".join(lines)
+
+
+def enable_tracing(max_spans: int = 100000) -> Tracer:
+    """Starts recording spans into a new Tracer and returns it."""
+    global _tracer
+    _tracer = Tracer(max_spans)
+    return _tracer
+
+
+def disable_tracing() -> Optional[Tracer]:
+    """Stops recording, returns the tracer that was active (its spans stay available)."""
+    global _tracer
+    tracer, _tracer = _tracer, None
+    return tracer
+
+
+def get_tracer() -> Optional[Tracer]:
+    return _tracer
+
+
+def is_tracing() -> bool:
+    return _tracer is not None
+
+
+def span(name: str, category: str = "requestez", **args):
+    """
+    Context manager timing a section as a span nested in the current one. A shared no-op while tracing is off.
+
+        with span("login", user=name):
+            ...
+    """
+    tracer = _tracer
+    if tracer is None:
+        return _NO_SPAN
+    return _SpanContext(tracer, name, category, args or None)
+
+
+def traced(name: Optional[str] = None, category: str = "requestez") -> Callable:
+    """Decorator running every call of a function (sync or async) inside a span named name (default: qualname)."""
+    def decorator(func):
+        span_name = name or f"{func.__module__}.{func.__qualname__}"
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                tracer = _tracer
+                if tracer is None:
+                    return await func(*args, **kwargs)
+                with _SpanContext(tracer, span_name, category, None):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            tracer = _tracer
+            if tracer is None:
+                return func(*args, **kwargs)
+            with _SpanContext(tracer, span_name, category, None):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -1,7 +1,49 @@
-from curl_cffi import requests
-from typing import Any, Optional, Dict, List
-import time
+from typing import Any, Callable, Optional, Dict, List, TYPE_CHECKING
+from urllib.parse import urlsplit
 from ..base import BaseSession, BaseAsyncSession
+from ..services.cache import LRUCache
+
+if TYPE_CHECKING:
+    from curl_cffi import requests
+
+
+def _requests():
+    """curl_cffi.requests, imported when the first session is created instead of with requestez.kurl."""
+    from curl_cffi import requests
+    return requests
+
+# curl's cumulative phase timers -> telemetry phase
+_CURL_TIMINGS = {
+    "NAMELOOKUP_TIME": "dns",
+    "CONNECT_TIME": "connect",
+    "APPCONNECT_TIME": "tls",
+    "STARTTRANSFER_TIME": "ttfb",
+}
+
+
+def _curl_infos() -> List[Any]:
+    from curl_cffi import CurlInfo
+    return [getattr(CurlInfo, name) for name in _CURL_TIMINGS]
+
+
+def _new_session(factory, impersonate):
+    """Creates a curl_cffi session recording phase timings, on versions that support curl_infos."""
+    try:
+        return factory(impersonate=impersonate, curl_infos=_curl_infos())
+    except (TypeError, ImportError, AttributeError):
+        return factory(impersonate=impersonate)
+
+
+def _curl_timings(response: Any) -> Dict[str, float]:
+    infos = getattr(response, "infos", None)
+    if not infos:
+        return {}
+    timings = {}
+    for info, value in infos.items():
+        phase = _CURL_TIMINGS.get(getattr(info, "name", None))
+        if phase is not None and value:
+            timings[phase] = value
+    return timings
 
 class Session(BaseSession):
     """
@@ -9,12 +51,18 @@ class Session(BaseSession):
     """
     def __init__(self, human_browsing=False, impersonate="chrome124"):
         super().__init__(human_browsing=human_browsing)
-        self.session = requests.Session(impersonate=impersonate)
+        self.session = _new_session(_requests().Session, impersonate)
 
     def _perform_request(self, method: str, url: str, **kwargs) -> Any:
         # curl_cffi supports requests-like API
         return self.session.request(method, url, **kwargs)
 
+    def _cookie_jar(self):
+        return self.session.cookies.jar
+
+    def _timings(self, response: Any) -> Dict[str, float]:
+        return _curl_timings(response)
+
 
 class AsyncSession(BaseAsyncSession):
     """
@@ -23,10 +71,10 @@ class AsyncSession(BaseAsyncSession):
     def __init__(self, impersonate="chrome124"):
         super().__init__()
         self.impersonate = impersonate
-        self._client: Optional[requests.AsyncSession] = None
+        self._client: Optional["requests.AsyncSession"] = None
 
     async def __aenter__(self):
-        self._client = requests.AsyncSession(impersonate=self.impersonate)
+        self._client = _new_session(_requests().AsyncSession, self.impersonate)
         return self
 
     async def __aexit__(self, exc_type, exc, tb):
@@ -34,7 +82,7 @@ class AsyncSession(BaseAsyncSession):
             await self._client.close()
 
     @property
-    def client(self) -> requests.AsyncSession:
+    def client(self) -> "requests.AsyncSession":
         if self._client is None:
             raise RuntimeError("Session is not active. Use 'async with AsyncSession() as session:' syntax.")
         return self._client
@@ -42,39 +90,149 @@ class AsyncSession(BaseAsyncSession):
     async def _perform_request(self, method: str, url: str, **kwargs) -> Any:
         return await self.client.request(method, url, **kwargs)
 
-    async def save_data(self) -> Dict[str, Any]:
-        """
-        Saves the current session state to a JSON-dumpable dictionary.
-        """
-        cookies: List[Dict[str, Any]] = []
-        for cookie in self.client.cookies.jar:
-            cookies.append({
-                "name": cookie.name,
-                "value": cookie.value,
-                "domain": cookie.domain,
-                "path": cookie.path,
-                "expires": cookie.expires,
-                "secure": cookie.secure,
-                # httponly handling might vary by cookiejar version
-                "httponly": getattr(cookie, "httpOnly", False) if hasattr(cookie, "httpOnly") else False,
-            })
-        return {"cookies": cookies, "current_url": self._current_url}
-
-    async def load_data(self, data: Dict[str, Any]):
-        """
-        Loads session state from a dictionary.
-        """
-        self.client.cookies.clear()
-        self._current_url = data.get("current_url")
-
-        now = int(time.time())
-        for cookie_dict in data.get("cookies", []):
-            expires = cookie_dict.get("expires")
-            if expires is not None and expires < now:
-                continue
-            self.client.cookies.set(
-                name=cookie_dict["name"],
-                value=cookie_dict["value"],
-                domain=cookie_dict.get("domain", ""),
-                path=cookie_dict.get("path", "/"),
-            )
+    def _timings(self, response: Any) -> Dict[str, float]:
+        return _curl_timings(response)
+
+    def _cookie_jar(self):
+        return self.client.cookies.jar
+
+
+# statuses bot walls answer with, and markers of the common ones (Cloudflare, Incapsula, PerimeterX, DataDome, ...)
+BOT_WALL_STATUSES = frozenset((403, 429, 503))
+BOT_WALL_MARKERS = (b"cf-chl", b"challenge-platform", b"Just a moment...", b"Attention Required! | Cloudflare",
+                    b"_Incapsula_Resource", b"px-captcha", b"captcha-delivery.com", b"DDoS-Guard",
+                    b"Checking your browser")
+# Server values of the same services, used when the body of a streamed response can't be looked at
+_BOT_WALL_SERVERS = ("cloudflare", "ddos-guard", "datadome")
+
+
+def is_bot_wall(response: Any, streamed: bool = False) -> bool:
+    """
+    True when response looks like an anti-bot challenge rather than the page: a challenge header, or a bot wall
+    status with a challenge marker in the first 32 KB of the body (with a bot protection Server header when the
+    response is streamed, its body is not read).
+    """
+    headers = response.headers
+    if headers.get("cf-mitigated") == "challenge":
+        return True
+    if response.status_code not in BOT_WALL_STATUSES:
+        return False
+    if streamed:
+        server = (headers.get("server") or "").lower()
+        return any(name in server for name in _BOT_WALL_SERVERS) or "x-datadome" in headers
+    head = response.content[:32768]
+    return any(marker in head for marker in BOT_WALL_MARKERS)
+
+
+class _Escalation:
+    """Per-host choice between the light and the impersonating backend, shared by both hybrid sessions."""
+    def _init_escalation(self, escalate_for: float, detect: Callable[[Any, bool], bool]):
+        # hosts currently sent through curl_cffi, each entry expires after escalate_for seconds
+        self.escalated = LRUCache(maxsize=4096, ttl=escalate_for)
+        self.detect = detect
+        self.escalations = 0
+
+    def escalate(self, host: str):
+        """Sends host through the impersonating backend until the escalation expires."""
+        self.escalated.set(host, True)
+        self.escalations += 1
+
+    def is_escalated(self, host: str) -> bool:
+        return host in self.escalated
+
+
+class HybridSession(_Escalation, BaseSession):
+    """
+    Synchronous Session sending through requests and switching a host to curl_cffi impersonation when it answers
+    with a bot wall (the blocked request is retried impersonated). Both backends share one cookie jar.
+
+    :param escalate_for: seconds a host stays on the impersonating backend
+    :param detect: detect(response, streamed) -> True for a bot wall, is_bot_wall by default
+    """
+    def __init__(self, human_browsing=False, impersonate="chrome124", escalate_for: float = 3600,
+                 detect: Callable[[Any, bool], bool] = is_bot_wall):
+        super().__init__(human_browsing=human_browsing)
+        import requests
+        self._init_escalation(escalate_for, detect)
+        self.impersonate = impersonate
+        self.light = requests.Session()
+        self._heavy = None
+
+    @property
+    def heavy(self):
+        """The curl_cffi session, created on the first escalation."""
+        if self._heavy is None:
+            self._heavy = _new_session(_requests().Session, self.impersonate)
+            self._heavy.cookies = self.light.cookies
+        return self._heavy
+
+    def _perform_request(self, method: str, url: str, **kwargs) -> Any:
+        host = urlsplit(url).hostname or ""
+        if host not in self.escalated:
+            response = self.light.request(method, url, **kwargs)
+            if not self.detect(response, bool(kwargs.get("stream"))):
+                return response
+            response.close()
+            self.escalate(host)
+        return self.heavy.request(method, url, **kwargs)
+
+    def _cookie_jar(self):
+        return self.light.cookies
+
+    def _timings(self, response: Any) -> Dict[str, float]:
+        return _curl_timings(response) or super()._timings(response)
+
+
+class HybridAsyncSession(_Escalation, BaseAsyncSession):
+    """
+    Asynchronous Session sending through httpx and switching a host to curl_cffi impersonation when it answers
+    with a bot wall (the blocked request is retried impersonated). Both backends share one cookie jar.
+
+    :param escalate_for: seconds a host stays on the impersonating backend
+    :param detect: detect(response, streamed) -> True for a bot wall, is_bot_wall by default
+    """
+    def __init__(self, impersonate="chrome124", escalate_for: float = 3600,
+                 detect: Callable[[Any, bool], bool] = is_bot_wall):
+        super().__init__()
+        from ..asynchronous import Session as LightSession
+        self._init_escalation(escalate_for, detect)
+        self.light = LightSession()
+        self.impersonate = impersonate
+        self._heavy: Optional[AsyncSession] = None
+
+    async def __aenter__(self):
+        await self.light.__aenter__()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if self._heavy is not None:
+            await self._heavy.__aexit__(exc_type, exc, tb)
+        await self.light.__aexit__(exc_type, exc, tb)
+
+    async def heavy(self) -> AsyncSession:
+        """The kurl.AsyncSession, entered on the first escalation."""
+        if self._heavy is None:
+            heavy = AsyncSession(self.impersonate)
+            await heavy.__aenter__()
+            heavy.client.cookies = self.light.client.cookies.jar
+            self._heavy = heavy
+        return self._heavy
+
+    async def _perform_request(self, method: str, url: str, **kwargs) -> Any:
+        host = urlsplit(url).hostname or ""
+        if host not in self.escalated:
+            # the light session records its httpx phase timings only when this session's telemetry listens
+            self.light.telemetry = self.telemetry
+            response = await self.light._perform_request(method, url, **kwargs)
+            if not self.detect(response, bool(kwargs.get("stream"))):
+                return response
+            self.escalate(host)
+        return await (await self.heavy())._perform_request(method, url, **kwargs)
+
+    def _cookie_jar(self):
+        return self.light.client.cookies.jar
+
+    def _timings(self, response: Any) -> Dict[str, float]:
+        if hasattr(response, "extensions"):
+            return self.light._timings(response)
+        return _curl_timings(response)
@@ -0,0 +1,230 @@
+"""
+Request middleware.
+Every request a session performs goes through its MiddlewareChain, so cross-cutting behaviour (caching, signing,
+throttling, ...) is plugged in once instead of per backend.
+"""
+import functools
+import inspect
+import threading
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+
+class Request:
+    """
+    A request about to be performed. Middlewares may change any field in before_request.
+
+    :ivar kwargs: keyword arguments handed to the backend (headers, data, stream, ...)
+    :ivar context: scratch space shared by the middlewares handling this request
+    """
+    __slots__ = ("method", "url", "kwargs", "context")
+
+    def __init__(self, method: str, url: str, kwargs: Dict[str, Any]):
+        self.method = method
+        self.url = url
+        self.kwargs = kwargs
+        self.context: Dict[str, Any] = {}
+
+    def __repr__(self):
+        return f"<Request {self.method} {self.url}>"
+
+
+class Middleware:
+    """
+    Base class for middlewares, override the hooks you need.
+    Sync sessions call the hooks directly, async sessions also await them when they return an awaitable,
+    so async def overrides work for async sessions (see AsyncMiddleware).
+    """
+    def before_request(self, session, request: Request) -> Optional[Any]:
+        """Called before the request is sent. Returning a response skips the network (and later before hooks)."""
+        return None
+
+    def after_response(self, session, request: Request, response: Any) -> Any:
+        """Called in reverse order with the response, returns the response to hand on (usually the same one)."""
+        return response
+
+    def on_error(self, session, request: Request, error: Exception) -> Optional[Any]:
+        """Called in reverse order when the request raised. Returning a response recovers, None re-raises."""
+        return None
+
+    def on_abort(self, session, request: Request, error: BaseException):
+        """
+        Called in reverse order when the request was interrupted (task cancelled, KeyboardInterrupt, SystemExit).
+        Only for cleanup, the error is always re-raised. A plain method in async middlewares too, it runs while the
+        task unwinds and must not block.
+        """
+
+
+class AsyncMiddleware(Middleware):
+    """Middleware with coroutine hooks, only usable with async sessions."""
+    async def before_request(self, session, request: Request) -> Optional[Any]:
+        return None
+
+    async def after_response(self, session, request: Request, response: Any) -> Any:
+        return response
+
+    async def on_error(self, session, request: Request, error: Exception) -> Optional[Any]:
+        return None
+
+
+def _hook(middleware: Middleware, name: str) -> Optional[Callable]:
+    """The bound hook, None when the class keeps the no-op default (so it is never called)."""
+    method = getattr(type(middleware), name)
+    if method is getattr(Middleware, name) or method is getattr(AsyncMiddleware, name):
+        return None
+    return getattr(middleware, name)
+
+
+class MiddlewareChain:
+    """
+    Ordered middlewares of a session. before_request runs first to last, the other hooks last to first.
+    An empty chain costs a single truth test per request.
+    """
+    def __init__(self, middlewares: Tuple[Middleware, ...] = ()):
+        self._lock = threading.Lock()
+        self._middlewares: Tuple[Middleware, ...] = ()
+        # per middleware (before, after, error, abort) hooks with the defaults stripped out
+        self._hooks: Tuple[Tuple[Optional[Callable], ...], ...] = ()
+        # (hooks, executor, the same hooks with the sync ones run in executor), see arun
+        self._offloaded: Optional[Tuple[Any, Any, Tuple[Tuple[Optional[Callable], ...], ...]]] = None
+        for middleware in middlewares:
+            self.add(middleware)
+
+    def _rebuild(self, middlewares: List[Middleware]):
+        self._middlewares = tuple(middlewares)
+        self._hooks = tuple((_hook(middleware, "before_request"), _hook(middleware, "after_response"),
+                             _hook(middleware, "on_error"), _hook(middleware, "on_abort"))
+                            for middleware in middlewares)
+
+    def add(self, middleware: Middleware, index: Optional[int] = None) -> Middleware:
+        """Appends middleware (or inserts it at index) and returns it."""
+        with self._lock:
+            middlewares = list(self._middlewares)
+            if index is None:
+                middlewares.append(middleware)
+            else:
+                middlewares.insert(index, middleware)
+            self._rebuild(middlewares)
+        return middleware
+
+    def remove(self, middleware: Middleware):
+        with self._lock:
+            self._rebuild([existing for existing in self._middlewares if existing is not middleware])
+
+    def clear(self):
+        with self._lock:
+            self._rebuild([])
+
+    def __iter__(self):
+        return iter(self._middlewares)
+
+    def __len__(self):
+        return len(self._middlewares)
+
+    def __bool__(self):
+        return bool(self._middlewares)
+
+    def run(self, session, request: Request, send: Callable[[Request], Any]) -> Any:
+        """Runs the chain around send(request) for sync sessions."""
+        hooks = self._hooks
+        ran = 0
+        response = None
+        try:
+            for before, _, _, _ in hooks:
+                ran += 1
+                if before is not None:
+                    response = _no_coroutine(before(session, request))
+                    if response is not None:
+                        break
+            if response is None:
+                response = send(request)
+        except Exception as error:
+            for _, _, on_error, _ in reversed(hooks[:ran]):
+                if on_error is not None:
+                    response = _no_coroutine(on_error(session, request, error))
+                    if response is not None:
+                        break
+            else:
+                raise
+        except BaseException as error:
+            _abort(hooks[:ran], session, request, error)
+            raise
+        for _, after, _, _ in reversed(hooks[:ran]):
+            if after is not None:
+                response = _no_coroutine(after(session, request, response))
+        return response
+
+    def _offload(self, executor) -> Tuple[Tuple[Optional[Callable], ...], ...]:
+        hooks = self._hooks
+        offloaded = self._offloaded
+        if offloaded is None or offloaded[0] is not hooks or offloaded[1] is not executor:
+            # on_abort stays inline, it runs while the task unwinds
+            offloaded = self._offloaded = (hooks, executor, tuple(
+                (_in_executor(before, executor), _in_executor(after, executor), _in_executor(on_error, executor),
+                 on_abort) for before, after, on_error, on_abort in hooks))
+        return offloaded[2]
+
+    async def arun(self, session, request: Request, send: Callable[[Request], Awaitable[Any]],
+                   executor: Optional[Any] = None) -> Any:
+        """
+        Runs the chain around await send(request) for async sessions.
+
+        :param executor: when given, sync hooks (not coroutine functions) run in it instead of on the event loop,
+            so a blocking hook doesn't stall the other requests
+        """
+        hooks = self._hooks if executor is None else self._offload(executor)
+        ran = 0
+        response = None
+        try:
+            for before, _, _, _ in hooks:
+                ran += 1
+                if before is not None:
+                    response = await _resolve(before(session, request))
+                    if response is not None:
+                        break
+            if response is None:
+                response = await send(request)
+        except Exception as error:
+            for _, _, on_error, _ in reversed(hooks[:ran]):
+                if on_error is not None:
+                    response = await _resolve(on_error(session, request, error))
+                    if response is not None:
+                        break
+            else:
+                raise
+        except BaseException as error:
+            _abort(hooks[:ran], session, request, error)
+            raise
+        for _, after, _, _ in reversed(hooks[:ran]):
+            if after is not None:
+                response = await _resolve(after(session, request, response))
+        return response
+
+
+def _in_executor(hook: Optional[Callable], executor) -> Optional[Callable]:
+    if hook is None or inspect.iscoroutinefunction(hook):
+        return hook
+
+    def call(*args):
+        import asyncio
+        return asyncio.get_running_loop().run_in_executor(executor, functools.partial(hook, *args))
+    return call
+
+
+def _abort(hooks, session, request: Request, error: BaseException):
+    for _, _, _, on_abort in reversed(hooks):
+        if on_abort is not None:
+            on_abort(session, request, error)
+
+
+def _no_coroutine(result: Any) -> Any:
+    if inspect.isawaitable(result):
+        if inspect.iscoroutine(result):
+            result.close()
+        raise TypeError("async middleware hooks can only be used with async sessions")
+    return result
+
+
+async def _resolve(result: Any) -> Any:
+    if inspect.isawaitable(result):
+        return await result
+    return result
@@ -1,12 +1,40 @@
-import yarl
-from bs4 import BeautifulSoup
+import importlib
 from html import unescape, escape
 import re
-import m3u8 as _m3u8
 import json
-import regex as regex_original
-from typing import Literal, Union, List, Dict, Any
+import copy
+from typing import Literal, Union, List, Dict, Any, TYPE_CHECKING
+from ..helpers.metrics import PARSE_SECONDS, timed
+from ..helpers.tracing import traced
+from ..services.cache import LRUCache
+from .javascript import js_values, _hash as _js_hash
 
+_JS_TREES = LRUCache(maxsize=64)
+
+if TYPE_CHECKING:
+    import yarl
+    from bs4 import BeautifulSoup
+
+# heavy dependencies are imported on first use, these module attributes keep resolving for existing callers
+_LAZY = {
+    "yarl": ("yarl", None),
+    "BeautifulSoup": ("bs4", "BeautifulSoup"),
+    "_m3u8": ("m3u8", None),
+    "regex_original": ("regex", None),
+}
+
+
+def __getattr__(name):
+    try:
+        module_name, attribute = _LAZY[name]
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
+    module = importlib.import_module(module_name)
+    value = module if attribute is None else getattr(module, attribute)
+    globals()[name] = value
+    return value
+
+@traced("parsers.load", "parser")
 def load(string: str, escaped: bool = True, error_1: bool = True, iterate: bool = False) -> Union[Dict, str]:
     """
     Load a string as JSON (dict).
@@ -83,28 +111,37 @@ def stringify(string: Dict, escaped: bool = False) -> str:
     return result
 
 
-def html(string: str) -> BeautifulSoup:
+@traced("parsers.html", "parser")
+@timed(PARSE_SECONDS, "html")
+def html(string: str) -> "BeautifulSoup":
     """
     Parse HTML string.
     :param string: HTML string
     :return: BeautifulSoup object
     """
+    from bs4 import BeautifulSoup
     return BeautifulSoup(string, "html.parser")
 
 
-def xml(string: str) -> BeautifulSoup:
+@traced("parsers.xml", "parser")
+@timed(PARSE_SECONDS, "xml")
+def xml(string: str) -> "BeautifulSoup":
     """
     Parse XML string.
     :param string: XML string
     :return: BeautifulSoup object
     """
+    from bs4 import BeautifulSoup
     return BeautifulSoup(string, "xml")
 
 
 def reg_compile(pattern: str):
+    import regex as regex_original
     return regex_original.compile(pattern)
 
 
+@traced("parsers.regex", "parser")
+@timed(PARSE_SECONDS, "regex")
 def regex(string: str, pattern: str) -> List[str]:
     """
     Clean string and find all regex matches.
@@ -133,6 +170,7 @@ def regex(string: str, pattern: str) -> List[str]:
     a_matches = re.compile(pattern, re.IGNORECASE).findall(string)
     return [a for a in a_matches if a]
 
+@traced("parsers.get_val_js_var", "parser")
 def get_val_js_var(var_name: str, content: str, val_type: Literal["str", "int", "float", "bool"] = "str", mode: Literal["dict", "var"]="dict", minimal: bool = True, require_end_semi: bool = False) -> Union[str, int, float, bool, None]:
     """
     Finds value of variable from js style dictionary/var in HTML
@@ -166,20 +204,40 @@ def get_val_js_var(var_name: str, content: str, val_type: Literal["str", "int",
         return val
     return None
 
-def js(string: str) -> Dict:
+@traced("parsers.js", "parser")
+@timed(PARSE_SECONDS, "js")
+def js(string: str, cache: bool = True) -> Dict:
+    """
+    Parse javascript into the js2xml tree as a dict (needs js2xml and xmltodict).
+    Prefer js_values to get the actual values of variables.
+    :param string: javascript source
+    :param cache: reuse the result for scripts seen before (keyed by content hash)
+    :return: dict
+    """
+    key = _js_hash(string) if cache else None
+    if key is not None:
+        cached = _JS_TREES.get(key)
+        if cached is not None:
+            return copy.deepcopy(cached)
     import js2xml
+    import lxml.etree
     import xmltodict
     xml_data = js2xml.parse(string)
-    json_data = load(json.dumps(xmltodict.parse(xml_data.toxml()), indent=4))
+    json_data = xmltodict.parse(lxml.etree.tostring(xml_data, encoding="unicode"))
+    if key is not None:
+        _JS_TREES.set(key, copy.deepcopy(json_data))
     return json_data
 
 
+@traced("parsers.m3u8", "parser")
+@timed(PARSE_SECONDS, "m3u8")
 def m3u8(string: str):
     """
     Parse m3u8 playlist.
     :param string: content of m3u8 file
     :return: m3u8.parse(playlist)
     """
+    import m3u8 as _m3u8
     return _m3u8.parse(string)
 
 def parse_m3u8(string: str):
@@ -212,7 +270,8 @@ def reg_replace(pattern: str, sub: str, string: str) -> str:
     return re.sub(pattern, sub, string)
 
 
-def URL(string: str) -> yarl.URL:
+def URL(string: str) -> "yarl.URL":
+    import yarl
     return yarl.URL(string)
 
 
@@ -0,0 +1,188 @@
+import hashlib
+import re
+from typing import Any, Dict, Iterable, Optional
+from ..helpers.metrics import PARSE_SECONDS, timed
+from ..helpers.tracing import traced
+from ..services.cache import LRUCache
+
+# content hash -> {top level name: initializer node}, the parse is the expensive part so the AST is cached
+_PROGRAMS = LRUCache(maxsize=128)
+# a JS string escape: \u{...}, \uHHHH, \xHH, legacy octal, a line continuation or any escaped character
+_ESCAPE = re.compile(r"\\(u\{[0-9a-fA-F]+\}|u[0-9a-fA-F]{4}|x[0-9a-fA-F]{2}|[0-3][0-7]{0,2}|[4-7][0-7]?|\r\n|[\s\S])")
+_SINGLE_ESCAPES = {"b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t", "v": "\v",
+                   "\n": "", "\r": "", "\r\n": "", "\u2028": "", "\u2029": ""}
+
+
+def _hash(string: str) -> bytes:
+    return hashlib.blake2b(string.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+
+
+def _target_name(node) -> Optional[str]:
+    """Dotted name for an assignment target (a, window.cfg, window["cfg"]), None if it is not a plain name."""
+    from calmjs.parse import asttypes as js_ast
+    if isinstance(node, (js_ast.Identifier, js_ast.PropIdentifier)):
+        return node.value
+    if isinstance(node, js_ast.DotAccessor):
+        owner = _target_name(node.node)
+        if owner is not None:
+            return f"{owner}.{node.identifier.value}"
+    if isinstance(node, js_ast.BracketAccessor) and isinstance(node.expr, js_ast.String):
+        owner = _target_name(node.node)
+        if owner is not None:
+            return f"{owner}.{_string(node.expr)}"
+    return None
+
+
+def _unescape(match) -> str:
+    escape = match.group(1)
+    first = escape[0]
+    if first == "u" and len(escape) > 1:
+        code = int(escape[2:-1] if escape[1] == "{" else escape[1:], 16)
+        return chr(code) if code <= 0x10FFFF else escape
+    if first == "x" and len(escape) == 3:
+        return chr(int(escape[1:], 16))
+    if first in "01234567":
+        return chr(int(escape, 8))
+    # any other escaped character stands for itself ("\d" is "d", "\/" is "/")
+    return _SINGLE_ESCAPES.get(escape, escape)
+
+
+def _string(node) -> str:
+    """Value of a JS string literal (node.value keeps the quotes), decoded with JS escape rules."""
+    value = _ESCAPE.sub(_unescape, node.value[1:-1])
+    if any("\ud800" <= char <= "\udfff" for char in value):
+        # \uD83D\uDE00 pairs -> one character, lone surrogates are kept
+        value = value.encode("utf-16", "surrogatepass").decode("utf-16", "surrogatepass")
+    return value
+
+
+def _number(raw: str):
+    lowered = raw.lower()
+    if lowered.startswith("0x"):
+        return int(lowered, 16)
+    if "." in lowered or "e" in lowered:
+        return float(lowered)
+    return int(lowered)
+
+
+def to_python(node) -> Any:
+    """
+    Converts a JS literal AST node (calmjs.parse) straight to Python.
+    Objects become dicts, arrays lists, and anything that is not a literal (functions, calls, ...) becomes None.
+    """
+    from calmjs.parse import asttypes as js_ast
+    if isinstance(node, js_ast.Object):
+        result = {}
+        for prop in node.properties:
+            if not isinstance(prop, js_ast.Assign):
+                continue
+            key = _string(prop.left) if isinstance(prop.left, js_ast.String) else prop.left.value
+            result[key] = to_python(prop.right)
+        return result
+    if isinstance(node, js_ast.Array):
+        items = []
+        for item in node.items:
+            if isinstance(item, js_ast.Elision):
+                items.extend([None] * item.value)
+            else:
+                items.append(to_python(item))
+        return items
+    if isinstance(node, js_ast.String):
+        return _string(node)
+    if isinstance(node, js_ast.Number):
+        try:
+            return _number(node.value)
+        except ValueError:
+            # legacy octal (017) and other forms Python can't read
+            return None
+    if isinstance(node, js_ast.Boolean):
+        return node.value == "true"
+    if isinstance(node, js_ast.GroupingOp):
+        return to_python(node.expr)
+    if isinstance(node, js_ast.UnaryExpr):
+        value = to_python(node.value)
+        if node.op == "-" and isinstance(value, (int, float)):
+            return -value
+        if node.op == "+" and isinstance(value, (int, float)):
+            return value
+        if node.op == "!":
+            # minifiers write true / false as !0 / !1
+            return not value
+        return None
+    return None
+
+
+def _as_es5(string: str) -> str:
+    """string with its let / const declarations turned into var declarations of the same length."""
+    from calmjs.parse.lexers.es5 import Lexer
+    lexer = Lexer()
+    lexer.input(string)
+    tokens = list(lexer)
+    parts = []
+    start = 0
+    for index, token in enumerate(tokens):
+        if token.type == "CONST" or (token.type == "ID" and token.value == "let" and index + 1 < len(tokens)
+                                     and tokens[index + 1].type == "ID"
+                                     and (index == 0 or tokens[index - 1].type != "PERIOD")):
+            parts.append(string[start:token.lexpos])
+            parts.append("var".ljust(len(token.value)))
+            start = token.lexpos + len(token.value)
+    parts.append(string[start:])
+    return "".join(parts)
+
+
+def _top_level(string: str) -> Dict[str, Any]:
+    from calmjs.parse import asttypes as js_ast
+    from calmjs.parse.exceptions import ECMASyntaxError
+    from calmjs.parse.parsers.es5 import Parser
+    try:
+        program = Parser().parse(string)
+    except ECMASyntaxError:
+        # the parser only knows ES5, inline configs are usually ES6 only by their let / const
+        try:
+            program = Parser().parse(_as_es5(string))
+        except ECMASyntaxError as error:
+            raise SyntaxError(f"js_values parses ES5 scripts with let / const declarations only: {error}") from None
+    names = {}
+    for statement in program.children():
+        if isinstance(statement, js_ast.VarStatement):
+            for declaration in statement.children():
+                if declaration.initializer is not None:
+                    names[declaration.identifier.value] = declaration.initializer
+        elif isinstance(statement, js_ast.ExprStatement) and isinstance(statement.expr, js_ast.Assign) \
+                and statement.expr.op == "=":
+            name = _target_name(statement.expr.left)
+            if name is not None:
+                names[name] = statement.expr.right
+    return names
+
+
+@traced("parsers.js_values", "parser")
+@timed(PARSE_SECONDS, "js_values")
+def js_values(string: str, names: Optional[Iterable[str]] = None, cache: bool = True) -> Dict[str, Any]:
+    """
+    Evaluates the literal values of top level variables / assignments in a script without going through XML.
+    Needs calmjs.parse (the optional extra). Scripts must be ES5, apart from let / const declarations; other ES6
+    syntax (arrow functions, template literals, ...) raises SyntaxError.
+
+    :param string: javascript source (e.g. the contents of a <script> tag)
+    :param names: only convert these names ("config", "window.__DATA__", ...), None converts every name
+    :param cache: reuse the parsed AST for scripts seen before (keyed by content hash)
+    :return: dict of name -> Python value (dict, list, str, int, float, bool or None)
+    """
+    if names is not None:
+        names = list(names)
+        # nothing to find, skip the parse entirely
+        if not any(name.rsplit(".", 1)[-1] in string for name in names):
+            return {}
+    if cache:
+        key = _hash(string)
+        program = _PROGRAMS.get(key)
+        if program is None:
+            program = _top_level(string)
+            _PROGRAMS.set(key, program)
+    else:
+        program = _top_level(string)
+    if names is None:
+        return {name: to_python(node) for name, node in program.items()}
+    return {name: to_python(program[name]) for name in names if name in program}
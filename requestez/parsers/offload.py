@@ -0,0 +1,143 @@
+"""
+Runs CPU bound parsers off the event loop.
+Parsers are looked up by name in a registry and dispatched to a thread (or process) pool,
+so network I/O keeps flowing while pages are parsed. Sessions share a thread pool unless given their own: a process
+pool forks the running loop's process and needs a __main__ guard on spawn platforms, so it is opt-in. In "auto"
+process pools, parsers returning object trees (BeautifulSoup) still run in threads, pickling the tree back to the
+parent costs more than the parse itself.
+"""
+import functools
+import importlib
+import threading
+from typing import Any, Callable, Dict, Literal, Optional, Union, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from concurrent.futures import Executor, Future
+
+# name -> callable or "module:attribute" (resolved on first use to keep imports lazy)
+_REGISTRY: Dict[str, Union[str, Callable]] = {
+    "html": "requestez.parsers:html",
+    "xml": "requestez.parsers:xml",
+    "js": "requestez.parsers:js",
+    "js_values": "requestez.parsers:js_values",
+    "load": "requestez.parsers:load",
+    "regex": "requestez.parsers:regex",
+    "m3u8": "requestez.parsers:m3u8",
+    "m3u8_master": "requestez.parsers:m3u8_master",
+    "get_val_js_var": "requestez.parsers:get_val_js_var",
+    "packer": "requestez.encryption.unpack:PACKER",
+    "dejuice": "requestez.encryption.dejuice:DEJUICE",
+    "extract": "requestez.encryption.extract:extract_scripts",
+}
+# parsers whose results are expensive to pickle, run in threads by "auto" pools
+_THREADED = {"html", "xml"}
+_lock = threading.Lock()
+_default_pool: Optional["ParsePool"] = None
+
+
+def register_parser(name: str, parser: Union[str, Callable], threaded: bool = False):
+    """
+    Registers a parser under name.
+    For process pools the parser must be importable (a module level function or a "module:attribute" string)
+    and its arguments and result must be picklable.
+
+    :param threaded: run it in threads in "auto" pools, for parsers returning objects that are expensive to pickle
+    """
+    _REGISTRY[name] = parser
+    if threaded:
+        _THREADED.add(name)
+    else:
+        _THREADED.discard(name)
+
+
+def get_parser(name: Union[str, Callable]) -> Callable:
+    """Resolves a registered parser name (callables are returned as is)."""
+    if callable(name):
+        return name
+    try:
+        parser = _REGISTRY[name]
+    except KeyError:
+        raise KeyError(f"no parser registered as {name!r}") from None
+    if isinstance(parser, str):
+        module_name, attribute = parser.split(":")
+        parser = getattr(importlib.import_module(module_name), attribute)
+        _REGISTRY[name] = parser
+    return parser
+
+
+class ParsePool:
+    """
+    A managed pool parsers are dispatched to.
+
+    :param mode: "process" to use every core, "thread" when results are expensive to pickle
+        (e.g. large BeautifulSoup trees) or the parser releases the GIL, "auto" runs the parsers registered as
+        threaded (html, xml) in threads and the others in processes
+    :param max_workers: size of each pool (None lets the executor pick)
+    """
+    def __init__(self, mode: Literal["auto", "process", "thread"] = "auto", max_workers: Optional[int] = None):
+        if mode not in ("auto", "process", "thread"):
+            raise ValueError(f"unknown pool mode {mode!r}")
+        self.mode = mode
+        self.max_workers = max_workers
+        self._executors: Dict[str, "Executor"] = {}
+        self._lock = threading.Lock()
+
+    def _get_executor(self, kind: str) -> "Executor":
+        executor = self._executors.get(kind)
+        if executor is None:
+            with self._lock:
+                executor = self._executors.get(kind)
+                if executor is None:
+                    # imported here, the process pool pulls in multiprocessing
+                    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+                    if kind == "process":
+                        executor = ProcessPoolExecutor(max_workers=self.max_workers)
+                    else:
+                        executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                      thread_name_prefix="requestez-parse")
+                    self._executors[kind] = executor
+        return executor
+
+    @property
+    def executor(self) -> "Executor":
+        """The pool of the mode, the process pool for "auto"."""
+        return self._get_executor("thread" if self.mode == "thread" else "process")
+
+    def executor_for(self, parser: Union[str, Callable]) -> "Executor":
+        """The pool parser runs in."""
+        if self.mode == "auto" and isinstance(parser, str) and parser in _THREADED:
+            return self._get_executor("thread")
+        return self.executor
+
+    def submit(self, parser: Union[str, Callable], *args, **kwargs) -> "Future":
+        """Runs parser(*args, **kwargs) in the pool and returns a concurrent.futures.Future."""
+        return self.executor_for(parser).submit(get_parser(parser), *args, **kwargs)
+
+    async def run(self, parser: Union[str, Callable], *args, **kwargs) -> Any:
+        """Awaitable version of submit for use inside an event loop."""
+        import asyncio
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor_for(parser),
+                                          functools.partial(get_parser(parser), *args, **kwargs))
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            executors, self._executors = self._executors, {}
+        for executor in executors.values():
+            executor.shutdown(wait=wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.shutdown()
+
+
+def get_default_pool() -> ParsePool:
+    """The shared thread pool used by sessions that were not given their own."""
+    global _default_pool
+    if _default_pool is None:
+        with _lock:
+            if _default_pool is None:
+                _default_pool = ParsePool("thread")
+    return _default_pool
@@ -0,0 +1,223 @@
+"""
+Lazily decoded response and charset resolution.
+Response holds the status, headers and raw body of a request; text, json() and soup are computed on first access and
+cached, so callers that only look at the status or headers never decode the body and the others decode it once.
+CharsetResolver picks the charset text is decoded with without running statistical detection on every page.
+"""
+import codecs
+import json as _json
+import re
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+from .services.cache import LRUCache
+
+_MISSING = object()
+
+_BOMS = (
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+# <meta charset="x">, <meta http-equiv="Content-Type" content="text/html; charset=x"> and <?xml encoding="x"?>
+_DECLARED = re.compile(
+    rb"""<meta[^>]*?charset\s*=\s*["']?\s*([a-z0-9._:+-]+)|<\?xml[^>]*?encoding\s*=\s*["']([a-z0-9._:+-]+)""",
+    re.IGNORECASE,
+)
+
+
+def _charset(content_type: str) -> Optional[str]:
+    for parameter in content_type.split(";")[1:]:
+        name, _, value = parameter.partition("=")
+        if name.strip().lower() == "charset":
+            return value.strip().strip("\"'") or None
+    return None
+
+
+def _codec(name: Optional[str]) -> Optional[str]:
+    """Normalised codec name, None for names python doesn't know."""
+    if not name:
+        return None
+    if isinstance(name, bytes):
+        name = name.decode("ascii", "replace")
+    try:
+        return codecs.lookup(name).name
+    except LookupError:
+        return None
+
+
+class CharsetResolver:
+    """
+    Picks the charset of a response body, cheapest source first:
+
+    1. the Content-Type charset
+    2. a byte order mark
+    3. <meta charset> / <?xml encoding?> in the first `sniff_bytes` of the body
+    4. utf-8 for json, which has no other encoding (RFC 8259)
+    5. a strict utf-8 decode
+    6. the charset the host declared (1 or 3) on its earlier responses
+    7. charset_normalizer on the first `detect_bytes` of the body
+
+    Only declared charsets are remembered per host, so pages of a host that declares its charset on some pages only
+    are decoded without detection, and one ambiguous page can't decide the charset of the following ones.
+
+    :param sniff_bytes: bytes searched for a declared charset
+    :param detect_bytes: bytes given to charset_normalizer when nothing else matched
+    :param max_hosts: hosts whose charset is remembered (least recently used dropped first)
+    """
+    def __init__(self, sniff_bytes: int = 4096, detect_bytes: int = 65536, max_hosts: int = 4096):
+        self.sniff_bytes = sniff_bytes
+        self.detect_bytes = detect_bytes
+        self.hosts = LRUCache(maxsize=max_hosts)
+        # how often each source decided the charset
+        self.sources: Dict[str, int] = dict.fromkeys(("header", "bom", "meta", "json", "utf-8", "host", "detected"), 0)
+
+    def _learn(self, host: Optional[str], encoding: str):
+        if host and self.hosts.get(host) != encoding:
+            self.hosts.set(host, encoding)
+
+    def decode(self, content: bytes, headers: Any = None, url: Optional[str] = None,
+               encoding: Optional[str] = None) -> Tuple[str, str]:
+        """
+        Decodes content, invalid bytes are replaced.
+
+        :param headers: response headers, their Content-Type is used
+        :param url: response url, its host keys the learned charset
+        :param encoding: charset forced by the caller, skips the resolution
+        :return: (text, charset used)
+        """
+        if encoding is None:
+            encoding, text = self._resolve(content, headers, url)
+            if text is not None:
+                return text, encoding
+        return content.decode(encoding, errors="replace"), encoding
+
+    def resolve(self, content: bytes, headers: Any = None, url: Optional[str] = None) -> str:
+        """The charset decode would use."""
+        return self._resolve(content, headers, url)[0]
+
+    def _resolve(self, content: bytes, headers: Any, url: Optional[str]) -> Tuple[str, Optional[str]]:
+        """(charset, text when finding the charset already decoded content)"""
+        content_type = (headers.get("Content-Type") if headers else None) or ""
+        host = urlsplit(url).netloc.lower() if url else None
+        encoding = _codec(_charset(content_type))
+        if encoding:
+            self.sources["header"] += 1
+            self._learn(host, encoding)
+            return encoding, None
+        for bom, encoding in _BOMS:
+            if content.startswith(bom):
+                self.sources["bom"] += 1
+                return encoding, None
+        declared = _DECLARED.search(content, 0, self.sniff_bytes)
+        encoding = _codec(declared and (declared.group(1) or declared.group(2)))
+        if encoding:
+            self.sources["meta"] += 1
+            self._learn(host, encoding)
+            return encoding, None
+        if "json" in content_type.lower():
+            self.sources["json"] += 1
+            return "utf-8", None
+        try:
+            text = content.decode("utf-8")
+        except UnicodeDecodeError:
+            pass
+        else:
+            self.sources["utf-8"] += 1
+            return "utf-8", text
+        encoding = host and self.hosts.get(host)
+        if encoding:
+            self.sources["host"] += 1
+            return encoding, None
+        self.sources["detected"] += 1
+        return self._detect(content[:self.detect_bytes]), None
+
+    @staticmethod
+    def _detect(sample: bytes) -> str:
+        try:
+            from charset_normalizer import from_bytes
+        except ImportError:
+            return "utf-8"
+        best = from_bytes(sample).best()
+        return _codec(best.encoding) if best is not None else "utf-8"
+
+
+_resolver = CharsetResolver()
+
+
+def get_charset_resolver() -> CharsetResolver:
+    """The process wide CharsetResolver used by sessions whose `charsets` attribute is None."""
+    return _resolver
+
+
+def decode_response(response: Any, charsets: Optional[CharsetResolver] = None) -> str:
+    """
+    Text of a requests / httpx / curl_cffi response decoded from its bytes with a CharsetResolver.
+    Responses without a bytes body fall back to their own text.
+    """
+    content = getattr(response, "content", None)
+    if not isinstance(content, bytes):
+        return response.text
+    return (charsets or _resolver).decode(content, response.headers, str(response.url))[0]
+
+
+class Response:
+    """
+    Response returned by session.get(..., read_as="response") on async sessions and get(..., lazy=True) on sync ones.
+
+    :ivar status_code: http status
+    :ivar headers: the backend's (case insensitive) response headers
+    :ivar url: final url after redirects
+    :ivar content: raw body bytes
+    """
+    __slots__ = ("status_code", "headers", "url", "content", "encoding", "_charsets", "_text", "_json", "_soup")
+
+    def __init__(self, status_code: int, headers: Any, url: str, content: bytes, encoding: Optional[str] = None,
+                 charsets: Optional[CharsetResolver] = None):
+        self.status_code = status_code
+        self.headers = headers
+        self.url = url
+        self.content = content
+        # charset used by text, None until it is resolved
+        self.encoding = encoding
+        # resolver picking the charset when encoding is None, None uses the process wide one
+        self._charsets = charsets
+        self._text: Optional[str] = None
+        self._json: Any = _MISSING
+        self._soup: Any = None
+
+    @classmethod
+    def from_backend(cls, response: Any, charsets: Optional[CharsetResolver] = None) -> "Response":
+        """Wraps a requests / httpx / curl_cffi response whose body was read."""
+        return cls(response.status_code, response.headers, str(response.url), response.content, charsets=charsets)
+
+    @property
+    def ok(self) -> bool:
+        return 200 <= self.status_code < 400
+
+    @property
+    def text(self) -> str:
+        """The body decoded with encoding or the charset a CharsetResolver picks, cached."""
+        if self._text is None:
+            self._text, self.encoding = (self._charsets or _resolver).decode(
+                self.content, self.headers, self.url, self.encoding)
+        return self._text
+
+    def json(self) -> Any:
+        """The body parsed as json (raises ValueError when it isn't), cached."""
+        if self._json is _MISSING:
+            self._json = _json.loads(self.content if self._text is None else self._text)
+        return self._json
+
+    @property
+    def soup(self):
+        """The body parsed with parsers.html (BeautifulSoup), cached."""
+        if self._soup is None:
+            from .parsers import html
+            self._soup = html(self.text)
+        return self._soup
+
+    def __repr__(self):
+        return f"<Response [{self.status_code}] {self.url}>"
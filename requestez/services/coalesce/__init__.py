@@ -0,0 +1,189 @@
+"""
+Single-flight request coalescing.
+While a request is in flight, identical idempotent requests of the same session (same method, url, request options
+and relevant headers) wait for it and get its response instead of doing their own round trip.
+
+    session.middlewares.add(Coalesce())        # sync sessions, followers in other threads wait
+    session.middlewares.add(AsyncCoalesce())   # async sessions, followers in other tasks wait
+"""
+import asyncio
+import threading
+from typing import Any, Dict, Hashable, Iterable, Optional
+
+from ...middleware import AsyncMiddleware, Middleware, Request
+
+DEFAULT_METHODS = ("GET", "HEAD")
+# headers that change the response, the others (Referer, Cache-Control, ...) don't prevent coalescing
+DEFAULT_HEADERS = ("accept", "accept-encoding", "accept-language", "authorization", "cookie", "range",
+                   "user-agent", "x-requested-with")
+# request options that never change the response
+_IGNORED_OPTIONS = frozenset(("headers", "timeout"))
+# options that carry a body or a stream, such requests are always performed
+_UNSAFE_OPTIONS = frozenset(("data", "json", "files", "content", "stream"))
+
+
+class _KeyMixin:
+    def __init__(self, methods: Iterable[str] = DEFAULT_METHODS, headers: Iterable[str] = DEFAULT_HEADERS):
+        self.methods = frozenset(method.upper() for method in methods)
+        self.headers = frozenset(header.lower() for header in headers)
+        # requests that reused an in-flight response / requests that went to the network as leaders
+        self.coalesced = 0
+        self.leaders = 0
+
+    def key(self, session, request: Request) -> Optional[Hashable]:
+        """Identity of request, None when it must not be coalesced."""
+        if request.method.upper() not in self.methods:
+            return None
+        options = []
+        for name, value in request.kwargs.items():
+            if name in _UNSAFE_OPTIONS:
+                if value:
+                    return None
+            elif name not in _IGNORED_OPTIONS:
+                options.append((name, repr(value)))
+        headers = request.kwargs.get("headers") or {}
+        relevant = sorted((name.lower(), str(value)) for name, value in headers.items()
+                          if value is not None and name.lower() in self.headers)
+        return id(session), request.method.upper(), request.url, tuple(sorted(options)), tuple(relevant)
+
+
+class _Flight:
+    __slots__ = ("done", "response", "error", "abandoned")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.response: Any = None
+        self.error: Optional[BaseException] = None
+        # the leader was interrupted without an answer, followers send their own requests
+        self.abandoned = False
+
+
+class Coalesce(_KeyMixin, Middleware):
+    """
+    Coalescing middleware for sync sessions shared by several threads.
+
+    :param methods: methods that may be coalesced (idempotent ones only)
+    :param headers: request headers that are part of the identity of a request
+    :param timeout: seconds a follower waits for the leader before sending its own request, None waits forever.
+        A follower whose leader was interrupted (KeyboardInterrupt, SystemExit) sends its own request.
+    """
+    def __init__(self, methods: Iterable[str] = DEFAULT_METHODS, headers: Iterable[str] = DEFAULT_HEADERS,
+                 timeout: Optional[float] = None):
+        super().__init__(methods, headers)
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._flights: Dict[Hashable, _Flight] = {}
+
+    def before_request(self, session, request: Request) -> Optional[Any]:
+        key = self.key(session, request)
+        if key is None:
+            return None
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                self._flights[key] = request.context["coalesce"] = _Flight()
+                request.context["coalesce_key"] = key
+                self.leaders += 1
+                return None
+        if not flight.done.wait(self.timeout):
+            return None
+        if flight.abandoned:
+            return None
+        with self._lock:
+            self.coalesced += 1
+        if flight.error is not None:
+            raise flight.error
+        return flight.response
+
+    def _land(self, request: Request, response: Any = None, error: Optional[BaseException] = None,
+              abandoned: bool = False):
+        flight = request.context.pop("coalesce", None)
+        if flight is None:
+            return
+        with self._lock:
+            if self._flights.get(request.context["coalesce_key"]) is flight:
+                del self._flights[request.context["coalesce_key"]]
+        flight.response = response
+        flight.error = error
+        flight.abandoned = abandoned
+        flight.done.set()
+
+    def after_response(self, session, request: Request, response: Any) -> Any:
+        self._land(request, response)
+        return response
+
+    def on_error(self, session, request: Request, error: Exception) -> Optional[Any]:
+        self._land(request, error=error)
+        return None
+
+    def on_abort(self, session, request: Request, error: BaseException):
+        self._land(request, abandoned=True)
+
+
+class AsyncCoalesce(_KeyMixin, AsyncMiddleware):
+    """
+    Coalescing middleware for async sessions. A follower whose leader task is cancelled sends its own request.
+
+    :param methods: methods that may be coalesced (idempotent ones only)
+    :param headers: request headers that are part of the identity of a request
+    """
+    def __init__(self, methods: Iterable[str] = DEFAULT_METHODS, headers: Iterable[str] = DEFAULT_HEADERS):
+        super().__init__(methods, headers)
+        # key -> (future of the leader's response, leader task)
+        self._flights: Dict[Hashable, Any] = {}
+
+    async def before_request(self, session, request: Request) -> Optional[Any]:
+        key = self.key(session, request)
+        if key is None:
+            return None
+        flight = self._flights.get(key)
+        if flight is None:
+            future = asyncio.get_running_loop().create_future()
+            self._flights[key] = (future, asyncio.current_task())
+            request.context["coalesce"] = (key, future)
+            self.leaders += 1
+            return None
+        future, leader = flight
+        if not future.done():
+            await asyncio.wait((future, leader), return_when=asyncio.FIRST_COMPLETED)
+        if not future.done():
+            # the leader went away without an answer (cancelled), this request goes to the network itself
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+            return None
+        if future.cancelled():
+            return None
+        self.coalesced += 1
+        return future.result()
+
+    def _land(self, request: Request, response: Any = None, error: Optional[BaseException] = None,
+              abandoned: bool = False):
+        flight = request.context.pop("coalesce", None)
+        if flight is None:
+            return
+        key, future = flight
+        current = self._flights.get(key)
+        if current is not None and current[0] is future:
+            del self._flights[key]
+        if future.done():
+            return
+        if abandoned:
+            future.cancel()
+        elif error is None:
+            future.set_result(response)
+        else:
+            future.set_exception(error)
+            # followers raise it themselves, an unawaited future must not log "exception was never retrieved"
+            future.exception()
+
+    async def after_response(self, session, request: Request, response: Any) -> Any:
+        self._land(request, response)
+        return response
+
+    async def on_error(self, session, request: Request, error: Exception) -> Optional[Any]:
+        self._land(request, error=error)
+        return None
+
+    def on_abort(self, session, request: Request, error: BaseException):
+        # cancelled (e.g. by asyncio.timeout) while the task lives on, followers must not wait for it
+        self._land(request, abandoned=True)
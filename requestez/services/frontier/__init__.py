@@ -0,0 +1,344 @@
+"""
+Crawl frontier.
+Urls are canonicalised (parsers.URL), deduplicated through a compact seen-set, queued per host by priority and
+handed out so that every host gets at most max_per_host requests at a time and delay seconds between two starts.
+crawl() drives an async session with a pool of workers from a Frontier until it runs dry.
+"""
+import asyncio
+import hashlib
+import heapq
+import itertools
+import math
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple, Union
+from urllib.parse import urljoin
+
+from ...helpers import log
+from ...parsers import URL
+
+_DROPPED_PARAMS = ("utm_source", "utm_medium", "utm_campaign", "utm_term", "utm_content", "gclid", "fbclid")
+
+
+def canonicalize(url: str, drop_params: Iterable[str] = _DROPPED_PARAMS, sort_query: bool = True) -> str:
+    """
+    Canonical form of url used for deduplication: lower case scheme and host, no default port, dot segments
+    resolved, no fragment, tracking parameters removed and the query sorted.
+
+    :param drop_params: query parameters removed from the url
+    :param sort_query: sorts the query parameters, so ?a=1&b=2 and ?b=2&a=1 are the same url
+    """
+    parsed = URL(url)
+    if parsed.raw_fragment:
+        parsed = parsed.with_fragment(None)
+    query = None
+    if parsed.query_string:
+        drop = frozenset(drop_params)
+        query = [(name, value) for name, value in parsed.query.items() if name not in drop]
+        if sort_query:
+            query.sort()
+    if parsed.raw_path == "/":
+        # "https://host" and "https://host/" are the same page (with_path drops the query, it is set again below)
+        parsed = parsed.with_path("/")
+    if query is not None:
+        parsed = parsed.with_query(query)
+    return str(parsed)
+
+
+def _host_of(url: str) -> str:
+    """Host of an absolute url, a few string operations instead of a full urlsplit on the hot path."""
+    netloc = url.partition("://")[2]
+    for separator in "/?#":
+        netloc = netloc.partition(separator)[0]
+    netloc = netloc.rpartition("@")[2]
+    if netloc.startswith("["):
+        return netloc[1:netloc.find("]")].lower()
+    return netloc.partition(":")[0].lower()
+
+
+def _digest(item: str) -> bytes:
+    return hashlib.blake2b(item.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+
+
+class BloomFilter:
+    """
+    Fixed size Bloom filter of strings: about 2.4 bytes per item at a 1e-4 false positive rate, never a false negative.
+    A false positive makes the frontier skip a url it has not seen.
+
+    :param capacity: number of items the error rate is sized for
+    :param error_rate: false positive probability once capacity items were added
+    """
+    def __init__(self, capacity: int = 1_000_000, error_rate: float = 1e-4):
+        if capacity <= 0 or not 0 < error_rate < 1:
+            raise ValueError("capacity must be positive and error_rate between 0 and 1")
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+        self._count = 0
+
+    def _positions(self, item: str) -> List[int]:
+        digest = _digest(item)
+        # double hashing (Kirsch-Mitzenmacher), two 64 bit halves of one blake2b digest
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return [(first + index * second) % self.size for index in range(self.hashes)]
+
+    def add(self, item: str) -> bool:
+        """Adds item, returns False when it was (probably) already there."""
+        new = False
+        bits = self._bits
+        for position in self._positions(item):
+            byte, mask = position >> 3, 1 << (position & 7)
+            if not bits[byte] & mask:
+                bits[byte] |= mask
+                new = True
+        if new:
+            self._count += 1
+        return new
+
+    def __contains__(self, item: str) -> bool:
+        bits = self._bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def nbytes(self) -> int:
+        return len(self._bits)
+
+
+class HashedSet:
+    """
+    Exact seen-set of 64 bit hashes of the items: collisions are negligible below billions of items,
+    but memory grows with the number of items (about 70 bytes each), unlike a BloomFilter.
+    """
+    def __init__(self):
+        self._hashes = set()
+
+    def add(self, item: str) -> bool:
+        """Adds item, returns False when it was already there."""
+        value = int.from_bytes(_digest(item)[:8], "little")
+        if value in self._hashes:
+            return False
+        self._hashes.add(value)
+        return True
+
+    def __contains__(self, item: str) -> bool:
+        return int.from_bytes(_digest(item)[:8], "little") in self._hashes
+
+    def __len__(self) -> int:
+        return len(self._hashes)
+
+
+class FrontierItem:
+    """A queued url. data is whatever the producer attached, depth counts the links followed from a seed."""
+    __slots__ = ("url", "host", "priority", "depth", "data")
+
+    def __init__(self, url: str, host: str, priority: float, depth: int, data: Any):
+        self.url = url
+        self.host = host
+        self.priority = priority
+        self.depth = depth
+        self.data = data
+
+    def __repr__(self):
+        return f"<FrontierItem {self.url} priority={self.priority} depth={self.depth}>"
+
+
+class _Host:
+    __slots__ = ("name", "queue", "in_flight", "next_start", "scheduled", "delay")
+
+    def __init__(self, name: str, delay: float):
+        self.name = name
+        # heap of (-priority, sequence, item)
+        self.queue: List[Tuple[float, int, FrontierItem]] = []
+        self.in_flight = 0
+        self.next_start = 0.0
+        self.scheduled = False
+        self.delay = delay
+
+
+class Frontier:
+    """
+    Per-host priority queues of urls with deduplication and politeness.
+    Within a host, higher priority urls go first and equal priorities keep their insertion order. Across hosts,
+    ready hosts are served by the priority their first url had when they became ready.
+    Not thread-safe, meant to be used from one event loop (see crawl).
+
+    :param delay: default seconds between two request starts on the same host
+    :param max_per_host: requests to one host in flight at the same time
+    :param seen: seen-set (BloomFilter, HashedSet, or any object with add() returning False for known items)
+    :param max_queued: urls queued per host, further ones are dropped unseen (None keeps everything)
+    :param canonical: url -> dedup key, canonicalize by default
+    """
+    def __init__(self, delay: float = 1.0, max_per_host: int = 1, seen: Any = None,
+                 max_queued: Optional[int] = None, canonical: Callable[[str], str] = canonicalize,
+                 clock: Callable[[], float] = time.monotonic):
+        self.delay = delay
+        self.max_per_host = max_per_host
+        self.seen = seen if seen is not None else BloomFilter()
+        self.max_queued = max_queued
+        self.canonical = canonical
+        self.clock = clock
+        self._hosts: Dict[str, _Host] = {}
+        self._ready: List[Tuple[float, int, _Host]] = []
+        self._waiting: List[Tuple[float, int, _Host]] = []
+        self._sequence = itertools.count()
+        self.queued = 0
+        self.in_flight = 0
+        self.added = 0
+        self.duplicates = 0
+        self.dropped = 0
+
+    def _host(self, name: str) -> _Host:
+        host = self._hosts.get(name)
+        if host is None:
+            host = self._hosts[name] = _Host(name, self.delay)
+        return host
+
+    def set_delay(self, host: str, delay: float):
+        """Politeness delay of one host (e.g. its robots.txt Crawl-delay)."""
+        self._host(host).delay = delay
+
+    def _schedule(self, host: _Host):
+        if host.scheduled or not host.queue or host.in_flight >= self.max_per_host:
+            return
+        host.scheduled = True
+        if host.next_start <= self.clock():
+            heapq.heappush(self._ready, (host.queue[0][0], next(self._sequence), host))
+        else:
+            heapq.heappush(self._waiting, (host.next_start, next(self._sequence), host))
+
+    def add(self, url: str, priority: float = 0, depth: int = 0, data: Any = None) -> bool:
+        """
+        Queues url unless its canonical form was seen before. Urls that aren't absolute http(s) ones (relative links,
+        mailto:, javascript:, ...) are dropped.
+
+        :return: True when the url was queued
+        """
+        try:
+            key = self.canonical(url)
+        except ValueError:
+            self.dropped += 1
+            return False
+        name = _host_of(key)
+        if not name or not key.startswith(("http://", "https://")):
+            self.dropped += 1
+            return False
+        host = self._host(name)
+        # checked before the seen-set, a dropped url is not remembered and may be added once the queue drained
+        if self.max_queued is not None and len(host.queue) >= self.max_queued:
+            self.dropped += 1
+            return False
+        if not self.seen.add(key):
+            self.duplicates += 1
+            return False
+        heapq.heappush(host.queue, (-priority, next(self._sequence), FrontierItem(key, name, priority, depth, data)))
+        self.queued += 1
+        self.added += 1
+        self._schedule(host)
+        return True
+
+    def add_many(self, urls: Iterable[Union[str, Tuple[str, float]]], depth: int = 0,
+                 base: Optional[str] = None) -> int:
+        """
+        Queues urls (or (url, priority) tuples), returns how many were new.
+
+        :param base: url of the page the urls were found on, relative ones are resolved against it
+        """
+        added = 0
+        for url in urls:
+            if isinstance(url, tuple):
+                url, priority = url
+            else:
+                priority = 0
+            if base is not None:
+                url = urljoin(base, url)
+            added += self.add(url, priority, depth)
+        return added
+
+    def next_ready(self) -> Tuple[Optional[FrontierItem], Optional[float]]:
+        """
+        (item, None) when a url may be requested now, it counts as in flight until done(item).
+        Otherwise (None, seconds until a host is ready), or (None, None) when nothing is waiting for time
+        (the frontier is empty or every queued host is busy).
+        """
+        now = self.clock()
+        while self._waiting and self._waiting[0][0] <= now:
+            _, sequence, host = heapq.heappop(self._waiting)
+            heapq.heappush(self._ready, (host.queue[0][0], sequence, host))
+        if not self._ready:
+            return None, (self._waiting[0][0] - now if self._waiting else None)
+        _, _, host = heapq.heappop(self._ready)
+        host.scheduled = False
+        _, _, item = heapq.heappop(host.queue)
+        host.in_flight += 1
+        host.next_start = now + host.delay
+        self.queued -= 1
+        self.in_flight += 1
+        self._schedule(host)
+        return item, None
+
+    def done(self, item: FrontierItem):
+        """Marks item as finished, its host may get the next url after the delay."""
+        host = self._hosts[item.host]
+        host.in_flight -= 1
+        self.in_flight -= 1
+        self._schedule(host)
+
+    def __len__(self) -> int:
+        return self.queued
+
+    def __bool__(self) -> bool:
+        return bool(self.queued or self.in_flight)
+
+
+Handler = Callable[[Any, FrontierItem], Awaitable[Optional[Iterable[Union[str, Tuple[str, float]]]]]]
+
+
+async def crawl(session, frontier: Frontier, handler: Handler, workers: int = 16,
+                max_depth: Optional[int] = None) -> Dict[str, int]:
+    """
+    Crawls with workers concurrent tasks until the frontier runs dry.
+
+    :param session: the (entered) async session handed to handler
+    :param handler: async handler(session, item) performing the request, returning the urls (or (url, priority))
+        found on the page (relative ones too), they are queued one level deeper
+    :param max_depth: links found at this depth are not followed
+    :return: {"fetched": n, "errors": n}
+    """
+    stats = {"fetched": 0, "errors": 0}
+    changed = asyncio.Condition()
+
+    async def worker():
+        while True:
+            item, wait = frontier.next_ready()
+            if item is None:
+                if wait is None and not frontier.in_flight:
+                    # nothing queued and nobody left who could queue more
+                    async with changed:
+                        changed.notify_all()
+                    return
+                async with changed:
+                    try:
+                        await asyncio.wait_for(changed.wait(), wait)
+                    except asyncio.TimeoutError:
+                        pass
+                continue
+            try:
+                found = await handler(session, item)
+                stats["fetched"] += 1
+                if found and (max_depth is None or item.depth < max_depth):
+                    frontier.add_many(found, item.depth + 1, base=item.url)
+            except Exception as e:
+                stats["errors"] += 1
+                log(f"crawl: {item.url} failed: {e!r}", color="red")
+            finally:
+                frontier.done(item)
+                async with changed:
+                    changed.notify_all()
+
+    await asyncio.gather(*(worker() for _ in range(workers)))
+    return stats
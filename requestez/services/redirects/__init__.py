@@ -0,0 +1,300 @@
+"""
+Bulk redirect resolution.
+RedirectResolver (sync sessions) and AsyncRedirectResolver (async sessions) follow the full redirect chain of many
+urls at once: every hop is a HEAD request without following redirects, retried as a GET when the server refuses
+HEAD. Hop results are cached per url (and shared with the chains reaching a url while it is being requested), so
+chains going through the same tracker or shortener hop request it once. A chain ends when a hop doesn't redirect,
+redirects back into the chain (a loop) or after max_hops redirects.
+
+    resolver = RedirectResolver(requestez.Session(), concurrency=64)
+    for resolution in resolver.iter_resolve(shortlinks):      # in completion order
+        print(resolution.url, "->", resolution.final_url, resolution.outcome)
+"""
+import asyncio
+import concurrent.futures
+import itertools
+import threading
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import urljoin
+
+from ..cache import LRUCache
+
+REDIRECT_STATUSES = frozenset((301, 302, 303, 307, 308))
+# HEAD answers of servers that only handle GET, the hop is retried as a GET
+HEAD_FALLBACK_STATUSES = frozenset((400, 403, 404, 405, 501))
+
+
+class Hop:
+    """
+    One request of a chain.
+
+    :ivar location: absolute url the hop redirects to, None when it doesn't redirect
+    :ivar method: "HEAD" or "GET", the request that gave the answer
+    """
+    __slots__ = ("url", "status_code", "location", "method")
+
+    def __init__(self, url: str, status_code: int, location: Optional[str], method: str):
+        self.url = url
+        self.status_code = status_code
+        self.location = location
+        self.method = method
+
+    def __repr__(self):
+        return f"<Hop {self.method} {self.url} [{self.status_code}]>"
+
+
+class Resolution:
+    """
+    Redirect chain of a url.
+
+    :ivar chain: the hops from url on, in order
+    :ivar outcome: "resolved" (the last hop doesn't redirect), "loop" (the last hop redirects to a url of the chain),
+        "too_many_hops" or "error"
+    :ivar error: the exception that ended the chain when outcome is "error"
+    """
+    __slots__ = ("url", "chain", "outcome", "error")
+
+    def __init__(self, url: str, chain: List[Hop], outcome: str, error: Optional[BaseException] = None):
+        self.url = url
+        self.chain = chain
+        self.outcome = outcome
+        self.error = error
+
+    @property
+    def final_url(self) -> str:
+        """Url of the last hop reached."""
+        return self.chain[-1].url if self.chain else self.url
+
+    @property
+    def urls(self) -> List[str]:
+        return [hop.url for hop in self.chain]
+
+    def __repr__(self):
+        return f"<Resolution {self.url} -> {self.final_url} ({self.outcome}, {len(self.chain)} hops)>"
+
+
+class _Resolver:
+    def __init__(self, session, concurrency: int = 32, max_hops: int = 10, ttl: Optional[float] = 3600,
+                 cache_size: int = 100_000, head_first: bool = True, headers: Optional[Dict[str, str]] = None,
+                 timeout: float = 20):
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+        self.session = session
+        self.concurrency = concurrency
+        self.max_hops = max_hops
+        self.head_first = head_first
+        self.headers = headers
+        self.timeout = timeout
+        # url -> Hop, shared by every chain going through the url
+        self.cache = LRUCache(maxsize=cache_size, ttl=ttl)
+        # hops answered from the network / from the cache or a request already in flight for the url
+        self.requests = 0
+        self.cache_hits = 0
+        self._lock = threading.Lock()
+        # url -> future of the hop being requested, concurrent chains reaching the url wait for it
+        self._flights: Dict[str, Any] = {}
+
+    def _join(self, url: str, new_flight) -> Tuple[Optional[Hop], Any, bool]:
+        """(cached hop, None, False) or (None, the url's flight, True when the caller leads it)"""
+        with self._lock:
+            hop = self.cache.get(url)
+            if hop is not None:
+                self.cache_hits += 1
+                return hop, None, False
+            flight = self._flights.get(url)
+            if flight is not None:
+                self.cache_hits += 1
+                return None, flight, False
+            self.requests += 1
+            flight = self._flights[url] = new_flight()
+            return None, flight, True
+
+    def _land(self, url: str, hop: Optional[Hop]):
+        with self._lock:
+            if hop is not None:
+                self.cache.set(url, hop)
+            del self._flights[url]
+
+    @staticmethod
+    def _hop(url: str, response: Any, method: str) -> Hop:
+        location = response.headers.get("Location") if response.status_code in REDIRECT_STATUSES else None
+        return Hop(url, response.status_code, urljoin(url, location) if location else None, method)
+
+    def _step(self, chain: List[Hop], seen: set) -> Optional[str]:
+        """The url to request next, None when the chain ended (its outcome is then given by _outcome)."""
+        location = chain[-1].location
+        if location is None or location in seen or len(chain) > self.max_hops:
+            return None
+        seen.add(location)
+        return location
+
+    def _outcome(self, chain: List[Hop], seen: set) -> str:
+        location = chain[-1].location
+        if location is None:
+            return "resolved"
+        return "loop" if location in seen else "too_many_hops"
+
+
+class RedirectResolver(_Resolver):
+    """
+    Resolves redirect chains through a sync session (requestez.Session, kurl.Session, ...), concurrency threads
+    sending at a time. Requests go through the session's middlewares and transport like any other.
+
+    :param max_hops: redirects followed before giving up with "too_many_hops"
+    :param ttl: seconds a hop result is cached, None caches until evicted
+    :param head_first: starts every hop with HEAD (GET only when refused), False always uses GET
+    :param headers: per request headers on top of the session's
+    """
+    def _request(self, method: str, url: str):
+        kwargs = {"headers": self.session._build_headers(self.headers), "allow_redirects": False,
+                  "timeout": self.timeout}
+        if method == "GET":
+            # only the status and Location are needed, the body is never read
+            kwargs["stream"] = True
+        response = self.session._send(method, url, **kwargs)
+        close = getattr(response, "close", None)
+        if method == "GET" and close is not None:
+            close()
+        return response
+
+    def _fetch(self, url: str) -> Hop:
+        if self.head_first:
+            response = self._request("HEAD", url)
+            if response.status_code not in HEAD_FALLBACK_STATUSES:
+                return self._hop(url, response, "HEAD")
+        return self._hop(url, self._request("GET", url), "GET")
+
+    def hop(self, url: str) -> Hop:
+        """The (cached) answer to a request of url."""
+        hop, flight, leader = self._join(url, concurrent.futures.Future)
+        if hop is not None:
+            return hop
+        if not leader:
+            return flight.result()
+        try:
+            hop = self._fetch(url)
+        except BaseException as error:
+            flight.set_exception(error)
+            raise
+        finally:
+            self._land(url, hop)
+        flight.set_result(hop)
+        return hop
+
+    def resolve(self, url: str) -> Resolution:
+        """Follows the redirect chain of url."""
+        chain: List[Hop] = []
+        seen = {url}
+        next_url: Optional[str] = url
+        while next_url is not None:
+            try:
+                chain.append(self.hop(next_url))
+            except Exception as error:
+                return Resolution(url, chain, "error", error)
+            next_url = self._step(chain, seen)
+        return Resolution(url, chain, self._outcome(chain, seen))
+
+    def iter_resolve(self, urls: Iterable[str]) -> Iterator[Resolution]:
+        """Resolves urls concurrently, yielding the resolutions as they complete. urls is consumed lazily."""
+        urls = iter(urls)
+        with concurrent.futures.ThreadPoolExecutor(self.concurrency, thread_name_prefix="requestez-redirects") as pool:
+            pending = {pool.submit(self.resolve, url) for url in itertools.islice(urls, self.concurrency * 2)}
+            while pending:
+                done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+                pending.update(pool.submit(self.resolve, url) for url in itertools.islice(urls, len(done)))
+
+    def resolve_many(self, urls: Iterable[str]) -> List[Resolution]:
+        """Resolves urls concurrently, resolutions in the order of urls."""
+        urls = list(urls)
+        resolutions = {resolution.url: resolution for resolution in self.iter_resolve(dict.fromkeys(urls))}
+        return [resolutions[url] for url in urls]
+
+
+class AsyncRedirectResolver(_Resolver):
+    """
+    Resolves redirect chains through an entered async session (asynchronous.Session, kurl.AsyncSession, ...),
+    concurrency requests in flight at a time. See RedirectResolver for the parameters.
+    """
+    def __init__(self, session, *args, **kwargs):
+        super().__init__(session, *args, **kwargs)
+        self._limit: Optional[asyncio.Semaphore] = None
+
+    async def _request(self, method: str, url: str):
+        if self._limit is None:
+            self._limit = asyncio.Semaphore(self.concurrency)
+        headers = self.session._build_headers(self.headers, suppress_referer=True)
+        async with self._limit:
+            return await self.session._send(method, url, headers=headers, allow_redirects=False, timeout=self.timeout)
+
+    async def _fetch(self, url: str) -> Hop:
+        if self.head_first:
+            response = await self._request("HEAD", url)
+            if response.status_code not in HEAD_FALLBACK_STATUSES:
+                return self._hop(url, response, "HEAD")
+        return self._hop(url, await self._request("GET", url), "GET")
+
+    async def hop(self, url: str) -> Hop:
+        """The (cached) answer to a request of url. A chain whose leader is cancelled requests url itself."""
+        while True:
+            hop, flight, leader = self._join(url, asyncio.get_running_loop().create_future)
+            if hop is not None:
+                return hop
+            if leader:
+                break
+            try:
+                return await asyncio.shield(flight)
+            except asyncio.CancelledError:
+                if not flight.cancelled():
+                    # this chain was cancelled, not the leader
+                    raise
+                # the leader went away without an answer and landed its flight, join again (leading a new one)
+        try:
+            hop = await self._fetch(url)
+        except asyncio.CancelledError:
+            flight.cancel()
+            raise
+        except BaseException as error:
+            flight.set_exception(error)
+            # retrieved, so asyncio doesn't warn when no other chain was waiting
+            flight.exception()
+            raise
+        finally:
+            self._land(url, hop)
+        flight.set_result(hop)
+        return hop
+
+    async def resolve(self, url: str) -> Resolution:
+        """Follows the redirect chain of url."""
+        chain: List[Hop] = []
+        seen = {url}
+        next_url: Optional[str] = url
+        while next_url is not None:
+            try:
+                chain.append(await self.hop(next_url))
+            except Exception as error:
+                return Resolution(url, chain, "error", error)
+            next_url = self._step(chain, seen)
+        return Resolution(url, chain, self._outcome(chain, seen))
+
+    async def iter_resolve(self, urls: Iterable[str]) -> AsyncIterator[Resolution]:
+        """Resolves urls concurrently, yielding the resolutions as they complete. urls is consumed lazily."""
+        urls = iter(urls)
+        pending = {asyncio.ensure_future(self.resolve(url)) for url in itertools.islice(urls, self.concurrency * 2)}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()
+                pending.update(asyncio.ensure_future(self.resolve(url)) for url in itertools.islice(urls, len(done)))
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def resolve_many(self, urls: Iterable[str]) -> List[Resolution]:
+        """Resolves urls concurrently, resolutions in the order of urls."""
+        urls = list(urls)
+        unique = {url: asyncio.ensure_future(self.resolve(url)) for url in dict.fromkeys(urls)}
+        await asyncio.gather(*unique.values())
+        return [unique[url].result() for url in urls]
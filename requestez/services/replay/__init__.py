@@ -0,0 +1,400 @@
+"""
+Record / replay transport.
+A Recorder performs the requests of a session and stores every exchange (request key, status, headers, final url,
+body) in a zip archive; a Replayer answers the same requests from the archive without touching the network,
+optionally with simulated latency and bandwidth. Both plug into any session through its `transport` attribute:
+
+    with Recorder("crawl.zip") as recorder:
+        session.transport = recorder          # requests go out and are recorded
+        crawl(session)
+
+    session.transport = Replayer("crawl.zip", latency=0.05, bandwidth=2_000_000)
+    crawl(session)                            # offline, same responses
+
+The zip central directory is the index: members are named <key digest>/<sequence>.json|.body, so opening an
+archive reads no member and a replay inflates only the exchanges it serves.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import zipfile
+from datetime import timedelta
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple, Union
+from urllib.parse import urlencode
+
+from ..cache import LRUCache
+
+
+class ReplayMiss(LookupError):
+    """Raised by a Replayer for a request the archive has no exchange for."""
+
+
+def _body(kwargs: Dict[str, Any]) -> bytes:
+    """The request body in a stable form, b"" without one."""
+    if kwargs.get("json") is not None:
+        return json.dumps(kwargs["json"], sort_keys=True, separators=(",", ":")).encode()
+    data = kwargs.get("data")
+    if data is None:
+        data = kwargs.get("content")
+    if data is None:
+        return b""
+    if isinstance(data, bytes):
+        return data
+    if isinstance(data, str):
+        return data.encode()
+    if isinstance(data, dict):
+        return urlencode(sorted(data.items()), doseq=True).encode()
+    return repr(data).encode()
+
+
+def _url(url: str, kwargs: Dict[str, Any]) -> str:
+    """url with the query parameters passed as params appended, the way the backends send it."""
+    params = kwargs.get("params")
+    if not params:
+        return url
+    if isinstance(params, bytes):
+        query = params.decode()
+    elif isinstance(params, str):
+        query = params.lstrip("?")
+    else:
+        if isinstance(params, dict):
+            params = sorted(params.items())
+        query = urlencode([(name, value) for name, value in params if value is not None], doseq=True)
+    if not query:
+        return url
+    return f"{url}{'&' if '?' in url else '?'}{query}"
+
+
+def request_key(method: str, url: str, kwargs: Dict[str, Any]) -> str:
+    """Archive key of a request: a digest of its method, url (params included), body and Range header."""
+    headers = kwargs.get("headers") or {}
+    ranges = next((str(value) for name, value in headers.items() if name.lower() == "range" and value), "")
+    digest = hashlib.blake2b(digest_size=16)
+    for part in (method.upper().encode(), _url(url, kwargs).encode(), ranges.encode(), _body(kwargs)):
+        digest.update(len(part).to_bytes(8, "big"))
+        digest.update(part)
+    return digest.hexdigest()
+
+
+class Exchange:
+    """A recorded response. headers are (name, value) pairs in received order, elapsed the seconds to the headers."""
+    __slots__ = ("method", "url", "status_code", "reason", "headers", "final_url", "elapsed", "content")
+
+    def __init__(self, method: str, url: str, status_code: int, reason: str, headers: List[Tuple[str, str]],
+                 final_url: str, elapsed: float, content: bytes):
+        self.method = method
+        self.url = url
+        self.status_code = status_code
+        self.reason = reason
+        self.headers = headers
+        self.final_url = final_url
+        self.elapsed = elapsed
+        self.content = content
+
+    @classmethod
+    def from_response(cls, method: str, url: str, response: Any, content: bytes, elapsed: float) -> "Exchange":
+        """Records a requests / httpx / curl_cffi response whose body is content."""
+        headers = response.headers
+        items = headers.multi_items() if hasattr(headers, "multi_items") else headers.items()
+        reason = getattr(response, "reason", None) or getattr(response, "reason_phrase", None) or ""
+        return cls(method.upper(), url, response.status_code, str(reason), [(str(k), str(v)) for k, v in items],
+                   str(response.url), elapsed, content)
+
+    def __repr__(self):
+        return f"<Exchange {self.method} {self.url} [{self.status_code}]>"
+
+
+class Archive:
+    """
+    Exchanges stored in a zip file, bodies deflated. Thread-safe; close it (or use it as a context manager) after
+    recording, the zip central directory is only written then.
+
+    :param mode: "a" appends to the archive (created when missing), "r" only reads it
+    """
+    def __init__(self, path: Union[str, os.PathLike], mode: str = "a", compresslevel: int = 6):
+        if mode not in ("a", "r"):
+            raise ValueError('mode must be "a" or "r"')
+        self.path = os.fspath(path)
+        if mode == "a" and not os.path.exists(self.path):
+            mode = "w"
+        self._zip = zipfile.ZipFile(self.path, mode, compression=zipfile.ZIP_DEFLATED, compresslevel=compresslevel)
+        self._lock = threading.Lock()
+        # key -> exchanges recorded for it
+        self._counts: Dict[str, int] = {}
+        for name in self._zip.namelist():
+            key, _, member = name.partition("/")
+            if member.endswith(".json"):
+                self._counts[key] = max(self._counts.get(key, 0), int(member[:-5]) + 1)
+
+    def add(self, key: str, exchange: Exchange, body: Optional[BinaryIO] = None) -> int:
+        """
+        Stores exchange as the next one of key and returns its sequence number.
+
+        :param body: file the body is copied from instead of exchange.content, read from its current position
+        """
+        meta = json.dumps({
+            "method": exchange.method, "url": exchange.url, "status": exchange.status_code, "reason": exchange.reason,
+            "headers": exchange.headers, "final_url": exchange.final_url, "elapsed": exchange.elapsed,
+        }).encode()
+        with self._lock:
+            sequence = self._counts.get(key, 0)
+            if body is None:
+                self._zip.writestr(f"{key}/{sequence:06d}.body", exchange.content)
+            else:
+                # zipfile doesn't know the size upfront, zip64 headers let the body pass 2 GiB
+                with self._zip.open(f"{key}/{sequence:06d}.body", "w", force_zip64=True) as member:
+                    shutil.copyfileobj(body, member)
+            self._zip.writestr(f"{key}/{sequence:06d}.json", meta)
+            self._counts[key] = sequence + 1
+        return sequence
+
+    def get(self, key: str, sequence: int = 0) -> Exchange:
+        with self._lock:
+            meta = json.loads(self._zip.read(f"{key}/{sequence:06d}.json"))
+            content = self._zip.read(f"{key}/{sequence:06d}.body")
+        return Exchange(meta["method"], meta["url"], meta["status"], meta["reason"],
+                        [tuple(pair) for pair in meta["headers"]], meta["final_url"], meta["elapsed"], content)
+
+    def count(self, key: str) -> int:
+        """Exchanges recorded for key."""
+        return self._counts.get(key, 0)
+
+    def keys(self) -> List[str]:
+        return list(self._counts)
+
+    def __len__(self):
+        return sum(self._counts.values())
+
+    def close(self):
+        with self._lock:
+            self._zip.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class ReplayedResponse:
+    """
+    Response served from an Exchange, with the attributes requestez uses on backend responses (status_code,
+    headers, url, content, text, json(), iter_content(), elapsed).
+    """
+    def __init__(self, exchange: Exchange, bandwidth: Optional[float] = None):
+        from requests.structures import CaseInsensitiveDict
+        headers = CaseInsensitiveDict()
+        for name, value in exchange.headers:
+            headers[name] = f"{headers[name]}, {value}" if name in headers else value
+        self.status_code = exchange.status_code
+        self.reason = exchange.reason
+        self.headers = headers
+        self.url = exchange.final_url
+        self.content = exchange.content
+        self.encoding: Optional[str] = None
+        self.elapsed = timedelta(seconds=exchange.elapsed)
+        self.extensions: Dict[str, Any] = {}
+        self.exchange = exchange
+        # bytes per second iter_content is throttled to, None for no limit
+        self._bandwidth = bandwidth
+        self._text: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.status_code < 400
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            from ...response import decode_response
+            self._text = decode_response(self)
+        return self._text
+
+    def json(self, **kwargs) -> Any:
+        return json.loads(self.content, **kwargs)
+
+    def iter_content(self, chunk_size: Optional[int] = None, decode_unicode: bool = False) -> Iterator[bytes]:
+        chunk_size = chunk_size or 65536
+        for start in range(0, len(self.content), chunk_size):
+            chunk = self.content[start:start + chunk_size]
+            if self._bandwidth:
+                time.sleep(len(chunk) / self._bandwidth)
+            yield chunk
+
+    def close(self):
+        pass
+
+    def __repr__(self):
+        return f"<ReplayedResponse [{self.status_code}] {self.url}>"
+
+
+class _RecordingStream:
+    """
+    Streamed response proxy recording the body once iter_content has gone through it, or the part that was read when
+    the consumer stopped early. The body is spooled to a temporary file past spool_bytes instead of held in memory.
+    """
+    def __init__(self, response: Any, done, spool_bytes: int):
+        self._response = response
+        self._done = done
+        self._spool_bytes = spool_bytes
+
+    def __getattr__(self, name):
+        return getattr(self._response, name)
+
+    def iter_content(self, chunk_size: Optional[int] = None, **kwargs) -> Iterator[bytes]:
+        with tempfile.SpooledTemporaryFile(self._spool_bytes) as spool:
+            try:
+                for chunk in self._response.iter_content(chunk_size, **kwargs):
+                    spool.write(chunk)
+                    yield chunk
+            except GeneratorExit:
+                spool.seek(0)
+                self._done(spool)
+                raise
+            # a failed download raised to the consumer and is not recorded
+            spool.seek(0)
+            self._done(spool)
+
+
+def _archive(archive: Union[Archive, str, os.PathLike], mode: str) -> Archive:
+    return archive if isinstance(archive, Archive) else Archive(archive, mode)
+
+
+class Recorder:
+    """
+    Transport performing requests with the session's backend and recording them into an archive.
+    Streamed responses (download) are recorded once their body has been iterated, with the part that was read when
+    the download stopped early.
+
+    :param spool_bytes: bytes of a streamed body kept in memory until it is recorded, the rest goes to a temporary file
+    """
+    def __init__(self, archive: Union[Archive, str, os.PathLike], spool_bytes: int = 1 << 20):
+        self.archive = _archive(archive, "a")
+        self.spool_bytes = spool_bytes
+        self.recorded = 0
+
+    def _record(self, key: str, method: str, url: str, response: Any, content: bytes, elapsed: float,
+                body: Optional[BinaryIO] = None):
+        self.archive.add(key, Exchange.from_response(method, url, response, content, elapsed), body)
+        self.recorded += 1
+
+    def perform(self, session, method: str, url: str, kwargs: Dict[str, Any]) -> Any:
+        key = request_key(method, url, kwargs)
+        start = time.perf_counter()
+        response = session._perform_request(method, url, **kwargs)
+        elapsed = time.perf_counter() - start
+        if kwargs.get("stream"):
+            return _RecordingStream(
+                response, lambda body: self._record(key, method, url, response, b"", elapsed, body), self.spool_bytes)
+        self._record(key, method, url, response, response.content, elapsed)
+        return response
+
+    async def aperform(self, session, method: str, url: str, kwargs: Dict[str, Any]) -> Any:
+        key = request_key(method, url, kwargs)
+        start = time.perf_counter()
+        response = await session._perform_request(method, url, **kwargs)
+        self._record(key, method, url, response, response.content, time.perf_counter() - start)
+        return response
+
+    def close(self):
+        self.archive.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class Replayer:
+    """
+    Transport answering requests from an archive. The n-th identical request gets the n-th recorded exchange,
+    the last one once they are used up (rewind() starts over).
+
+    :param latency: seconds before each response, "recorded" waits as long as the recorded request took
+    :param bandwidth: bytes per second the bodies are delivered at, None for no limit
+    :param passthrough: performs requests missing from the archive instead of raising ReplayMiss
+    :param cache_size: exchanges kept inflated in memory
+    """
+    def __init__(self, archive: Union[Archive, str, os.PathLike], latency: Union[float, str] = 0.0,
+                 bandwidth: Optional[float] = None, passthrough: bool = False, cache_size: int = 256):
+        if latency != "recorded" and not isinstance(latency, (int, float)):
+            raise ValueError('latency must be seconds or "recorded"')
+        self.archive = _archive(archive, "r")
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.passthrough = passthrough
+        self._cache = LRUCache(maxsize=cache_size)
+        self._cursors: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _next(self, method: str, url: str, kwargs: Dict[str, Any]) -> Optional[Exchange]:
+        key = request_key(method, url, kwargs)
+        count = self.archive.count(key)
+        with self._lock:
+            if not count:
+                self.misses += 1
+                return None
+            self.hits += 1
+            sequence = min(self._cursors.get(key, 0), count - 1)
+            self._cursors[key] = sequence + 1
+        exchange = self._cache.get((key, sequence))
+        if exchange is None:
+            exchange = self.archive.get(key, sequence)
+            self._cache.set((key, sequence), exchange)
+        return exchange
+
+    def _respond(self, exchange: Exchange, stream: bool) -> Tuple[ReplayedResponse, float]:
+        """(response, seconds to wait before handing it out)"""
+        delay = exchange.elapsed if self.latency == "recorded" else self.latency
+        if stream:
+            return ReplayedResponse(exchange, self.bandwidth), delay
+        if self.bandwidth:
+            delay += len(exchange.content) / self.bandwidth
+        return ReplayedResponse(exchange), delay
+
+    def _miss(self, method: str, url: str):
+        return ReplayMiss(f"{method.upper()} {url} is not in {self.archive.path}")
+
+    def perform(self, session, method: str, url: str, kwargs: Dict[str, Any]) -> Any:
+        exchange = self._next(method, url, kwargs)
+        if exchange is None:
+            if self.passthrough:
+                return session._perform_request(method, url, **kwargs)
+            raise self._miss(method, url)
+        response, delay = self._respond(exchange, bool(kwargs.get("stream")))
+        if delay:
+            time.sleep(delay)
+        return response
+
+    async def aperform(self, session, method: str, url: str, kwargs: Dict[str, Any]) -> Any:
+        exchange = self._next(method, url, kwargs)
+        if exchange is None:
+            if self.passthrough:
+                return await session._perform_request(method, url, **kwargs)
+            raise self._miss(method, url)
+        response, delay = self._respond(exchange, False)
+        if delay:
+            await asyncio.sleep(delay)
+        return response
+
+    def rewind(self):
+        """Serves every key from its first exchange again."""
+        with self._lock:
+            self._cursors.clear()
+
+    def close(self):
+        self.archive.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,183 @@
+"""
+Persistent session state (cookies, current / last html url, headers) for many worker identities in one SQLite file.
+Saves are incremental: only cookies that changed since the last save or load of an identity are written,
+and an identity is only read when it is loaded, so warm-starting a worker costs one indexed query.
+"""
+import json
+import threading
+import time
+from http.cookiejar import Cookie, CookieJar
+from typing import Any, Dict, List, Optional, Tuple
+
+# (domain, path, name) -> (value, expires, secure, httponly)
+_Rows = Dict[Tuple[str, str, str], Tuple[Any, ...]]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS identities (
+    identity TEXT PRIMARY KEY,
+    meta TEXT NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS cookies (
+    identity TEXT NOT NULL,
+    domain TEXT NOT NULL,
+    path TEXT NOT NULL,
+    name TEXT NOT NULL,
+    value TEXT,
+    expires INTEGER,
+    secure INTEGER NOT NULL,
+    httponly INTEGER NOT NULL,
+    PRIMARY KEY (identity, domain, path, name)
+) WITHOUT ROWID;
+"""
+
+
+def export_cookies(jar: Optional[CookieJar]) -> List[Dict[str, Any]]:
+    """The cookies of a http.cookiejar.CookieJar (requests, httpx and curl_cffi all keep one) as plain dicts."""
+    if jar is None:
+        return []
+    return [{
+        "name": cookie.name,
+        "value": cookie.value,
+        "domain": cookie.domain,
+        "path": cookie.path,
+        "expires": cookie.expires,
+        "secure": cookie.secure,
+        "httponly": cookie.has_nonstandard_attr("HttpOnly"),
+    } for cookie in jar]
+
+
+def import_cookies(jar: Optional[CookieJar], cookies: List[Dict[str, Any]], clear: bool = True):
+    """
+    Puts cookies (as returned by export_cookies) into jar, skipping the expired ones.
+
+    :param clear: empties the jar first
+    """
+    if jar is None:
+        return
+    if clear:
+        jar.clear()
+    now = int(time.time())
+    for data in cookies:
+        expires = data.get("expires")
+        if expires is not None and expires < now:
+            continue
+        domain = data.get("domain") or ""
+        path = data.get("path") or "/"
+        jar.set_cookie(Cookie(
+            version=0, name=data["name"], value=data["value"], port=None, port_specified=False,
+            domain=domain, domain_specified=bool(domain), domain_initial_dot=domain.startswith("."),
+            path=path, path_specified=True, secure=bool(data.get("secure")), expires=expires,
+            discard=expires is None, comment=None, comment_url=None,
+            rest={"HttpOnly": None} if data.get("httponly") else {}, rfc2109=False,
+        ))
+
+
+def _rows(cookies: List[Dict[str, Any]]) -> _Rows:
+    return {(cookie.get("domain") or "", cookie.get("path") or "/", cookie["name"]):
+            (cookie["value"], cookie.get("expires"), int(bool(cookie.get("secure"))),
+             int(bool(cookie.get("httponly"))))
+            for cookie in cookies}
+
+
+class StateStore:
+    """
+    SQLite backed store of session states, shared by any number of sessions and threads.
+
+        store = StateStore("states.db")
+        session.use_state(store, "worker-17")   # restored lazily before the first request
+        ...
+        session.save_state()                     # writes only what changed
+
+    :param path: database file, ":memory:" keeps everything in this process
+    """
+    def __init__(self, path: str = ":memory:"):
+        # sqlite3 is imported here, importing requestez should not pay for it
+        import sqlite3
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        if path != ":memory:":
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        # identity -> (cookie rows, meta json) as they are in the database, what save diffs against
+        self._saved: Dict[str, Tuple[_Rows, Optional[str]]] = {}
+        # rows written by the last save, mostly for tests and monitoring
+        self.last_writes = 0
+
+    def _read(self, identity: str) -> Tuple[_Rows, Optional[str]]:
+        saved = self._saved.get(identity)
+        if saved is None:
+            row = self._db.execute("SELECT meta FROM identities WHERE identity = ?", (identity,)).fetchone()
+            cookies = self._db.execute(
+                "SELECT domain, path, name, value, expires, secure, httponly FROM cookies WHERE identity = ?",
+                (identity,))
+            saved = self._saved[identity] = ({tuple(row[:3]): tuple(row[3:]) for row in cookies},
+                                             row[0] if row else None)
+        return saved
+
+    def load(self, identity: str) -> Optional[Dict[str, Any]]:
+        """The saved state of identity ({"cookies": [...], **meta}), None if it was never saved."""
+        with self._lock:
+            rows, meta = self._read(identity)
+        if meta is None:
+            return None
+        state = json.loads(meta)
+        state["cookies"] = [{"name": name, "value": value, "domain": domain, "path": path, "expires": expires,
+                             "secure": bool(secure), "httponly": bool(httponly)}
+                            for (domain, path, name), (value, expires, secure, httponly) in rows.items()]
+        return state
+
+    def save(self, identity: str, state: Dict[str, Any]) -> int:
+        """
+        Saves state (as returned by a session's save_data) under identity, writing only the changes.
+
+        :return: number of rows written
+        """
+        rows = _rows(state.get("cookies", []))
+        meta = json.dumps({key: value for key, value in state.items() if key != "cookies"}, sort_keys=True,
+                          default=str)
+        with self._lock:
+            saved_rows, saved_meta = self._read(identity)
+            changed = [(identity, *key, *value) for key, value in rows.items() if saved_rows.get(key) != value]
+            removed = [(identity, *key) for key in saved_rows if key not in rows]
+            writes = len(changed) + len(removed) + (meta != saved_meta)
+            if writes:
+                with self._db:
+                    self._db.execute("BEGIN")
+                    if meta != saved_meta:
+                        self._db.execute("INSERT OR REPLACE INTO identities (identity, meta, updated) VALUES (?, ?, ?)",
+                                         (identity, meta, time.time()))
+                    if changed:
+                        self._db.executemany("INSERT OR REPLACE INTO cookies VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                                             changed)
+                    if removed:
+                        self._db.executemany(
+                            "DELETE FROM cookies WHERE identity = ? AND domain = ? AND path = ? AND name = ?",
+                            removed)
+                self._saved[identity] = (rows, meta)
+            self.last_writes = writes
+        return writes
+
+    def delete(self, identity: str):
+        with self._lock, self._db:
+            self._db.execute("BEGIN")
+            self._db.execute("DELETE FROM identities WHERE identity = ?", (identity,))
+            self._db.execute("DELETE FROM cookies WHERE identity = ?", (identity,))
+            self._saved.pop(identity, None)
+
+    def identities(self) -> List[str]:
+        with self._lock:
+            return [row[0] for row in self._db.execute("SELECT identity FROM identities ORDER BY identity")]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+            self._saved.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
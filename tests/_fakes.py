@@ -0,0 +1,149 @@
+"""
+Fakes shared by the tests: a backend response, sessions that answer without a network, and a local HTTP server.
+"""
+import asyncio
+import json
+import threading
+import time
+from http.cookiejar import CookieJar
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+from requestez.base import BaseAsyncSession, BaseSession
+
+
+class FakeResponse:
+    """Backend response with a bytes body, shaped like the ones of requests / httpx / curl_cffi."""
+    def __init__(self, url: str, status_code: int = 200, content: bytes = b"ok",
+                 headers: Optional[Dict[str, str]] = None):
+        self.url = url
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers if headers is not None else {}
+        self.history = []
+        self.closed = False
+
+    @property
+    def text(self) -> str:
+        return self.content.decode()
+
+    def json(self) -> Any:
+        return json.loads(self.content)
+
+    def close(self):
+        self.closed = True
+
+
+class Sent(NamedTuple):
+    """A request a fake session performed."""
+    method: str
+    url: str
+    kwargs: Dict[str, Any]
+    cookies: List[str]  # names of the cookies in the session's jar
+    at: float  # time.monotonic() when it was sent
+
+
+class _Fake:
+    """
+    Answers every request without a network. Urls containing "fail" raise ConnectionError (after the delay).
+
+    :param respond: (method, url, kwargs) -> backend response, by default a FakeResponse whose json body is
+        {"number": n (1 for the first request), "headers": the request headers}
+    :param content: body of the default responses instead of that json
+    :param delay: seconds every request takes
+    """
+    def __init__(self, respond: Optional[Callable[[str, str, Dict[str, Any]], Any]] = None,
+                 content: Optional[bytes] = None, delay: float = 0.0):
+        super().__init__()
+        self.respond = respond
+        self.content = content
+        self.delay = delay
+        self.jar = CookieJar()
+        self.sent: List[Sent] = []
+        self._sent_lock = threading.Lock()
+
+    @property
+    def calls(self) -> int:
+        return len(self.sent)
+
+    def _cookie_jar(self):
+        return self.jar
+
+    def _record(self, method: str, url: str, kwargs: Dict[str, Any]) -> int:
+        with self._sent_lock:
+            self.sent.append(Sent(method, url, kwargs, sorted(cookie.name for cookie in self.jar), time.monotonic()))
+            return len(self.sent)
+
+    def _answer(self, number: int, method: str, url: str, kwargs: Dict[str, Any]) -> Any:
+        if "fail" in url:
+            raise ConnectionError("refused")
+        if self.respond is not None:
+            return self.respond(method, url, kwargs)
+        content = self.content
+        if content is None:
+            content = json.dumps({"number": number, "headers": dict(kwargs.get("headers") or {})}).encode()
+        return FakeResponse(url, content=content)
+
+
+class FakeSession(_Fake, BaseSession):
+    """Sync fake session, see _Fake for its parameters."""
+
+    def _perform_request(self, method, url, **kwargs):
+        number = self._record(method, url, kwargs)
+        if self.delay:
+            time.sleep(self.delay)
+        return self._answer(number, method, url, kwargs)
+
+
+class FakeAsyncSession(_Fake, BaseAsyncSession):
+    """Async fake session, see _Fake for its parameters."""
+
+    async def _perform_request(self, method, url, **kwargs):
+        number = self._record(method, url, kwargs)
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        return self._answer(number, method, url, kwargs)
+
+
+class BaseHandler(BaseHTTPRequestHandler):
+    """Quiet HTTP/1.1 keep-alive handler, subclasses add the do_GET / do_POST they need."""
+    protocol_version = "HTTP/1.1"
+    # headers and body go out in separate writes, without TCP_NODELAY delayed ACKs add ~40ms per response
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def send(self, body: bytes = b"", content_type: str = "text/plain", status: int = 200, headers=()):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+
+class LocalServer:
+    """Threaded server of handler on 127.0.0.1 (a free port), usable as a context manager."""
+    def __init__(self, handler):
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self._server.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def start(self) -> "LocalServer":
+        threading.Thread(target=self._server.serve_forever, name="test-server", daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
@@ -0,0 +1,155 @@
+import asyncio
+import json
+import threading
+import time
+import unittest
+from requestez.services.coalesce import AsyncCoalesce, Coalesce
+from _fakes import FakeAsyncSession, FakeResponse, FakeSession
+
+
+class TestCoalesce(unittest.TestCase):
+    def setUp(self):
+        self.session = FakeSession(delay=0.05)
+        self.coalesce = self.session.middlewares.add(Coalesce())
+
+    def run_threads(self, target, count=8):
+        results = [None] * count
+        barrier = threading.Barrier(count)
+
+        def worker(index):
+            barrier.wait()
+            try:
+                results[index] = target()
+            except Exception as e:
+                results[index] = e
+
+        threads = [threading.Thread(target=worker, args=(index,)) for index in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_identical_gets_share_one_request(self):
+        results = self.run_threads(lambda: self.session.get("https://example.com/a", notify=False))
+        self.assertEqual(self.session.calls, 1)
+        self.assertEqual({json.loads(result)["number"] for result in results}, {1})
+        self.assertEqual((self.coalesce.leaders, self.coalesce.coalesced), (1, 7))
+
+    def test_different_urls_and_headers_are_not_shared(self):
+        self.run_threads(lambda: self.session.get(f"https://example.com/{threading.get_ident()}", notify=False), 4)
+        self.assertEqual(self.session.calls, 4)
+        self.run_threads(lambda: self.session.get("https://example.com/b", notify=False,
+                                                  headers={"Authorization": str(threading.get_ident())}), 4)
+        self.assertEqual(self.session.calls, 8)
+
+    def test_posts_are_not_coalesced(self):
+        self.run_threads(lambda: self.session.get("https://example.com/a", post=True, body={"a": 1}, notify=False), 4)
+        self.assertEqual(self.session.calls, 4)
+
+    def test_followers_get_the_leader_error(self):
+        results = self.run_threads(lambda: self.session.get("https://example.com/fail", notify=False), 4)
+        self.assertEqual(self.session.calls, 1)
+        self.assertTrue(all(isinstance(result, ConnectionError) for result in results))
+
+    def test_interrupted_leader_hands_over(self):
+        def respond(method, url, kwargs):
+            if self.session.calls == 1:
+                raise KeyboardInterrupt
+            return FakeResponse(url, content=str(self.session.calls).encode())
+
+        def leader():
+            try:
+                self.session.get("https://example.com/interrupt", notify=False)
+            except KeyboardInterrupt:
+                pass
+
+        self.session.respond = respond
+        thread = threading.Thread(target=leader)
+        thread.start()
+        time.sleep(0.01)
+        result = []
+        follower = threading.Thread(target=lambda: result.append(
+            self.session.get("https://example.com/interrupt", notify=False)), daemon=True)
+        follower.start()
+        follower.join(2)
+        thread.join()
+        self.assertEqual(result, ["2"])
+        self.assertEqual((self.session.calls, self.coalesce.coalesced), (2, 0))
+
+    def test_sequential_requests_are_sent(self):
+        self.session.get("https://example.com/a", notify=False)
+        self.session.get("https://example.com/a", notify=False)
+        self.assertEqual(self.session.calls, 2)
+
+
+class TestAsyncCoalesce(unittest.TestCase):
+    def test_identical_gets_share_one_request(self):
+        async def main():
+            session = FakeAsyncSession(delay=0.05)
+            coalesce = session.middlewares.add(AsyncCoalesce())
+            results = await asyncio.gather(*(session.get("https://example.com/a") for _ in range(10)))
+            other = await session.get("https://example.com/b")
+            return session, coalesce, results, other
+
+        session, coalesce, results, other = asyncio.run(main())
+        self.assertEqual(session.calls, 2)
+        self.assertEqual({result[2]["number"] for result in results}, {1})
+        self.assertEqual(other[2]["number"], 2)
+        self.assertEqual(coalesce.coalesced, 9)
+
+    def test_error_reaches_every_follower(self):
+        async def main():
+            session = FakeAsyncSession(delay=0.05)
+            session.middlewares.add(AsyncCoalesce())
+            results = await asyncio.gather(*(session.get("https://example.com/fail") for _ in range(3)),
+                                           return_exceptions=True)
+            return session, results
+
+        session, results = asyncio.run(main())
+        self.assertEqual(session.calls, 1)
+        self.assertTrue(all(isinstance(result, ConnectionError) for result in results))
+
+    def test_cancelled_leader_hands_over(self):
+        async def main():
+            session = FakeAsyncSession(delay=0.05)
+            session.middlewares.add(AsyncCoalesce())
+            leader = asyncio.ensure_future(session.get("https://example.com/a"))
+            await asyncio.sleep(0.01)
+            follower = asyncio.ensure_future(session.get("https://example.com/a"))
+            await asyncio.sleep(0.01)
+            leader.cancel()
+            return session, await follower
+
+        session, result = asyncio.run(main())
+        self.assertEqual(session.calls, 2)
+        self.assertEqual(result[2]["number"], 2)
+
+    def test_leader_timed_out_in_a_living_worker(self):
+        async def main():
+            session = FakeAsyncSession(delay=0.2)
+            coalesce = session.middlewares.add(AsyncCoalesce())
+
+            async def worker():
+                try:
+                    await session.get("https://example.com/a")
+                except asyncio.CancelledError:
+                    # like asyncio.timeout (3.11+), the cancelled task itself goes on
+                    pass
+                await asyncio.sleep(10)
+
+            task = asyncio.ensure_future(worker())
+            asyncio.get_running_loop().call_later(0.02, task.cancel)
+            await asyncio.sleep(0.05)
+            try:
+                return session, coalesce, await asyncio.wait_for(session.get("https://example.com/a"), 1)
+            finally:
+                task.cancel()
+
+        session, coalesce, result = asyncio.run(main())
+        self.assertEqual(result[2]["number"], 2)
+        self.assertEqual(coalesce._flights, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,136 @@
+import unittest
+import os
+import re
+import base64
+from requestez.encryption import aes_enc, aes_dec, aes_dec_many, aes_enc_salted, aes_dec_salted, bytes_to_key, \
+    get_cipher
+from requestez.encryption.unpack import Unbaser, UnpackingError, cPacker, unpack, detect, PACKER
+from requestez.encryption.dejuice import DEJUICE
+from requestez.encryption.extract import extract_scripts, extract_scripts_many
+
+
+def pack(js, radix=62):
+    """Minimal P.A.C.K.E.R. packer used to build fixtures."""
+    words = re.findall(r"\b\w+\b", js)
+    unique = sorted(set(words), key=lambda w: (-words.count(w), w))
+    unbaser = Unbaser(radix)
+    encoded = {word: unbaser.encode(index) for index, word in enumerate(unique)}
+    payload = re.sub(r"\b\w+\b", lambda m: encoded[m.group(0)], js).replace("'", "\\'")
+    return ("eval(function(p,a,c,k,e,d){while(c--)if(k[c])p=p.replace(new RegExp('\\\\b'+c.toString(a)+'\\\\b','g'),k[c]);"
+            "return p}('%s',%d,%d,'%s'.split('|'),0,{}))" % (payload, radix, len(unique), "|".join(unique)))
+
+
+class TestCipherCache(unittest.TestCase):
+    def setUp(self):
+        self.key = os.urandom(32)
+        self.iv = os.urandom(16)
+
+    def test_round_trip_modes(self):
+        for mode, iv in (("cbc", self.iv), ("ecb", None), ("cfb", self.iv), ("ofb", self.iv)):
+            for text in ("short", "long text " * 1000):
+                encrypted = aes_enc(self.key, iv, text, mode=mode)
+                self.assertEqual(aes_dec(self.key, iv, encrypted, mode=mode), text)
+
+    def test_context_is_cached(self):
+        self.assertIs(get_cipher(self.key, self.iv, "cbc"), get_cipher(self.key, self.iv, "cbc"))
+
+    def test_dec_many(self):
+        payloads = [aes_enc(self.key, self.iv, str(i)) for i in range(10)]
+        self.assertEqual(aes_dec_many(self.key, self.iv, payloads), [str(i) for i in range(10)])
+
+    def test_bytes_to_key(self):
+        salt = b"12345678"
+        self.assertEqual(len(bytes_to_key("secret", salt)), 48)
+        self.assertEqual(bytes_to_key("secret", salt), bytes_to_key(b"secret", salt))
+
+    def test_wrong_iv_length_is_rejected(self):
+        encrypted = aes_enc(self.key, self.iv, "short")
+        with self.assertRaises(ValueError):
+            aes_dec(self.key, b"12345678", encrypted)
+
+    def test_salted_round_trip(self):
+        payload = aes_enc_salted("passphrase", "hello world", salt=b"abcdefgh")
+        self.assertTrue(base64.b64decode(payload).startswith(b"Salted__abcdefgh"))
+        self.assertEqual(aes_dec_salted("passphrase", payload), "hello world")
+
+    def test_salted_rejects_unsalted(self):
+        with self.assertRaises(ValueError):
+            aes_dec_salted("passphrase", aes_enc(self.key, self.iv, "plain"))
+
+
+class TestUnpacker(unittest.TestCase):
+    js = "var player=jwplayer('vplayer');player.setup({file:'https://cdn.example/v.m3u8',label:'720p'});"
+
+    def test_unpack_radixes(self):
+        for radix in (10, 36, 62):
+            packed = pack(self.js, radix)
+            self.assertTrue(detect(packed))
+            self.assertEqual(unpack(packed), self.js)
+
+    def test_real_packer_output(self):
+        # output of Dean Edwards' packer, as used by the jsbeautifier unpacker tests
+        packed = ("eval(function(p,a,c,k,e,r){e=String;if(!''.replace(/^/,String)){while(c--)r[c]=k[c]||c;"
+                  "k=[function(e){return r[e]}];e=function(){return'\\w+'};c=1};while(c--)if(k[c])p=p.replace("
+                  "new RegExp('\\b'+e(c)+'\\b','g'),k[c]);return p}('0 2=1',3,3,'var||a'.split('|'),0,{}))")
+        self.assertTrue(detect(packed))
+        self.assertEqual(unpack(packed), "var a=1")
+
+    def test_radix_below_two_is_rejected(self):
+        with self.assertRaises(UnpackingError):
+            unpack("eval(function(p,a,c,k,e,d){return p}('0 1',1,2,'a|b'.split('|'),0,{}))")
+        with self.assertRaises(TypeError):
+            Unbaser(1)
+
+    def test_unbaser_round_trip(self):
+        for radix in (2, 16, 36, 40, 62, 70, 95):
+            unbaser = Unbaser.for_base(radix)
+            for number in (0, 1, radix - 1, radix, 12345):
+                self.assertEqual(unbaser(unbaser.encode(number)), number)
+        self.assertIs(Unbaser.for_base(62), Unbaser.for_base(62))
+
+    def test_replace_strings(self):
+        source = 'var _0x1=["a","b"];f(_0x1[1],_0x1[0],_0x1[7])'
+        self.assertEqual(cPacker._replace_strings(source), 'f("b","a",_0x1[7])')
+
+
+class TestExtract(unittest.TestCase):
+    first = "var a=1;var b='first';"
+    second = "player.setup({file:'second.m3u8'});"
+
+    def page(self):
+        juiced = base64.b64encode(pack(self.second).encode()).decode()
+        juiced = '"' + '"+"'.join(juiced[i:i + 20] for i in range(0, len(juiced), 20)) + '"'
+        inline = base64.b64encode(b"console.log('inline base64');").decode()
+        return ("<html><script>" + pack(self.first) + "</script>\n<p>text</p>\n"
+                "<script>JuicyCodes.Run(" + juiced + ");</script>"
+                "<script>eval(atob('" + inline + "'))</script>"
+                "<script src=\"data:text/javascript;base64," + inline + "\"></script></html>")
+
+    def test_extract_all_blocks(self):
+        page = self.page()
+        scripts = extract_scripts(page)
+        self.assertEqual([script.kind for script in scripts], ["packed", "juiced", "base64", "base64"])
+        self.assertEqual(scripts[0].script, self.first)
+        self.assertEqual(scripts[1].script, self.second)
+        self.assertEqual(scripts[2].script, "console.log('inline base64');")
+        for script in scripts:
+            self.assertIsNone(script.error)
+            self.assertEqual(page[script.start:script.end], script.source)
+
+    def test_extract_many(self):
+        results = extract_scripts_many([self.page()] * 3, processes=2, min_pool_batch=2)
+        self.assertEqual(len(results), 3)
+        self.assertEqual(results[2][1].script, self.second)
+
+    def test_packer_and_dejuice(self):
+        page = self.page()
+        self.assertEqual(PACKER(page), self.first)
+        self.assertEqual(DEJUICE(page), self.second)
+
+    def test_packer_custom_pattern_with_groups(self):
+        page = "<script>" + pack(self.first) + "</script>"
+        self.assertEqual(PACKER(page, r"<script>(eval\(function.*?)(</script>)"), self.first)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+import concurrent.futures
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from requestez.asynchronous.facade import FacadeSession
+from requestez.helpers import pbar
+from requestez.kurl import AsyncSession as KurlAsyncSession
+from requestez.response import CharsetResolver
+from requestez.services.coalesce import Coalesce
+from _fakes import BaseHandler, LocalServer
+
+BODY = bytes(range(256)) * 400
+
+
+class Handler(BaseHandler):
+    def do_GET(self):
+        if self.path.startswith("/slow"):
+            time.sleep(0.2)
+        if self.path.startswith("/file"):
+            start = int(self.headers.get("Range", "bytes=0-")[6:-1] or 0)
+            self.send(BODY[start:], "application/octet-stream", 206 if start else 200)
+        elif self.path.startswith("/redirect"):
+            self.send(status=302, headers=[("Location", "/page")])
+        else:
+            self.send(json.dumps({"path": self.path, "referer": self.headers.get("Referer")}).encode(),
+                      "text/html" if self.path.startswith("/page") else "application/json")
+
+
+class TestFacadeSession(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = LocalServer(Handler).start()
+        cls.url = cls.server.url
+        pbar.headless = True
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+        pbar.headless = None
+
+    def setUp(self):
+        self.session = FacadeSession()
+
+    def tearDown(self):
+        self.session.close()
+
+    def test_get_and_referer(self):
+        first = json.loads(self.session.get(f"{self.url}/page", notify=False))
+        self.assertIsNone(first["referer"])
+        second = json.loads(self.session.get(f"{self.url}/api", notify=False))
+        self.assertEqual(second["referer"], f"{self.url}/page")
+
+    def test_where_to_does_not_follow(self):
+        self.assertEqual(self.session.where_to(f"{self.url}/redirect", notify=False)["to"], "/page")
+
+    def test_download_and_resume(self):
+        folder = tempfile.mkdtemp()
+        try:
+            path = os.path.join(folder, "file.bin")
+            with open(path, "wb") as file:
+                file.write(BODY[:1000])
+            self.session.download(f"{self.url}/file", path)
+            with open(path, "rb") as file:
+                self.assertEqual(file.read(), BODY)
+        finally:
+            shutil.rmtree(folder)
+
+    def test_get_many_runs_concurrently_on_one_thread(self):
+        own_threads = lambda: [t for t in threading.enumerate() if "process_request_thread" not in t.name]
+        threads = len(own_threads())
+        start = time.perf_counter()
+        futures = self.session.get_many(f"{self.url}/slow?{index}" for index in range(50))
+        bodies = [json.loads(future.result()) for future in futures]
+        # 10 s one after the other
+        self.assertLess(time.perf_counter() - start, 5)
+        self.assertEqual([body["path"] for body in bodies], [f"/slow?{index}" for index in range(50)])
+        # the server adds a thread per connection, the facade only its small decoding pool
+        added = [thread.name for thread in own_threads()][threads:]
+        self.assertTrue(all(name.startswith("requestez-decode") for name in added))
+        self.assertLessEqual(len(added), self.session._decode_pool._max_workers)
+
+    def test_get_many_with_blocking_sync_middleware(self):
+        coalesce = self.session.middlewares.add(Coalesce())
+        futures = self.session.get_many([f"{self.url}/slow"] * 3)
+        done, _ = concurrent.futures.wait(futures, timeout=5)
+        self.assertEqual(len(done), 3)
+        self.assertEqual({future.result() for future in futures}, {futures[0].result()})
+        self.assertEqual((coalesce.leaders, coalesce.coalesced), (1, 2))
+
+    def test_get_many_decodes_off_the_loop(self):
+        threads = []
+
+        class Recording(CharsetResolver):
+            def decode(self, *args, **kwargs):
+                threads.append(threading.current_thread().name)
+                return super().decode(*args, **kwargs)
+
+        self.session.charsets = Recording()
+        bodies = [future.result() for future in self.session.get_many(f"{self.url}/api?{index}" for index in range(3))]
+        self.assertEqual([json.loads(body)["path"] for body in bodies], [f"/api?{index}" for index in range(3)])
+        self.assertEqual(len(threads), 3)
+        self.assertTrue(all(name.startswith("requestez-decode") for name in threads))
+
+    def test_kurl_backend(self):
+        with FacadeSession(backend=KurlAsyncSession()) as session:
+            self.assertEqual(json.loads(session.get(f"{self.url}/api", notify=False))["path"], "/api")
+
+
+if __name__ == "__main__":
+    unittest.main()
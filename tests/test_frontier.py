@@ -0,0 +1,146 @@
+import asyncio
+import json
+import unittest
+from requestez.services.frontier import BloomFilter, Frontier, HashedSet, canonicalize, crawl
+from _fakes import FakeAsyncSession, FakeResponse
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+# url -> links found on that page
+SITE = {
+    "https://a.example/": ["https://a.example/1", "https://a.example/2", "https://b.example/"],
+    "https://a.example/1": ["https://a.example/", "https://a.example/2#top", "https://b.example/1"],
+    "https://a.example/2": ["https://a.example/1?utm_source=x"],
+    "https://b.example/": ["https://b.example/1", "https://a.example/"],
+    "https://b.example/1": ["/3", "mailto:webmaster@b.example"],
+    "https://b.example/3": ["https://a.example/3"],
+    "https://a.example/3": [],
+}
+
+
+def answer_site(method, url, kwargs):
+    return FakeResponse(url, content=json.dumps({"links": SITE[url]}).encode())
+
+
+class TestCanonicalize(unittest.TestCase):
+    def test_equivalent_urls(self):
+        self.assertEqual(canonicalize("HTTP://Example.COM:80/a/../b?z=1&a=2&utm_source=x#frag"),
+                         "http://example.com/b?a=2&z=1")
+        self.assertEqual(canonicalize("https://x.com"), canonicalize("https://x.com/"))
+        self.assertEqual(canonicalize("https://x.com?b=1&a=2"), "https://x.com/?a=2&b=1")
+
+
+class TestSeenSets(unittest.TestCase):
+    def test_bloom_filter(self):
+        bloom = BloomFilter(capacity=10000, error_rate=0.001)
+        self.assertTrue(all(bloom.add(f"https://x.com/{i}") for i in range(10000)))
+        self.assertFalse(bloom.add("https://x.com/5"))
+        false_positives = sum(f"https://y.com/{i}" in bloom for i in range(10000))
+        self.assertLess(false_positives, 50)
+        self.assertLess(bloom.nbytes, 20000)
+
+    def test_hashed_set(self):
+        seen = HashedSet()
+        self.assertTrue(seen.add("a"))
+        self.assertFalse(seen.add("a"))
+        self.assertIn("a", seen)
+        self.assertEqual(len(seen), 1)
+
+
+class TestFrontier(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.frontier = Frontier(delay=2, clock=self.clock)
+
+    def test_dedup(self):
+        self.assertTrue(self.frontier.add("https://a.example/x#1"))
+        self.assertFalse(self.frontier.add("https://A.example/x#2"))
+        self.assertEqual((len(self.frontier), self.frontier.duplicates), (1, 1))
+
+    def test_priority_within_host(self):
+        frontier = Frontier(delay=0, max_per_host=3, clock=self.clock)
+        frontier.add("https://a.example/low", priority=0)
+        frontier.add("https://a.example/high", priority=5)
+        frontier.add("https://a.example/low2", priority=0)
+        order = [frontier.next_ready()[0].url for _ in range(3)]
+        self.assertEqual(order, ["https://a.example/high", "https://a.example/low", "https://a.example/low2"])
+
+    def test_politeness(self):
+        self.frontier.add_many(["https://a.example/1", "https://a.example/2", "https://b.example/1"])
+        first, _ = self.frontier.next_ready()
+        second, _ = self.frontier.next_ready()
+        self.assertEqual({first.host, second.host}, {"a.example", "b.example"})
+        # a.example is busy until done(), then waits for its delay
+        self.assertEqual(self.frontier.next_ready(), (None, None))
+        self.frontier.done(first if first.host == "a.example" else second)
+        self.assertEqual(self.frontier.next_ready(), (None, 2))
+        self.clock.now = 2
+        item, _ = self.frontier.next_ready()
+        self.assertEqual(item.url, "https://a.example/2")
+
+    def test_only_absolute_http_urls(self):
+        for url in ("foo/bar", "/abs", "mailto:x@y.com", "javascript:void(0)", "ftp://files.example/a"):
+            self.assertFalse(self.frontier.add(url), url)
+        self.assertEqual((self.frontier.dropped, len(self.frontier)), (5, 0))
+        self.assertEqual(self.frontier.add_many(["b", "../c", "mailto:x@y.com"], base="https://a.example/x/page"), 2)
+        self.assertEqual(sorted(item.url for _, _, item in self.frontier._host("a.example").queue),
+                         ["https://a.example/c", "https://a.example/x/b"])
+        self.assertEqual(list(self.frontier._hosts), ["a.example"])
+
+    def test_max_queued(self):
+        frontier = Frontier(max_queued=2, clock=self.clock)
+        self.assertEqual(frontier.add_many([f"https://a.example/{i}" for i in range(5)]), 2)
+        self.assertEqual(frontier.dropped, 3)
+        # the dropped urls were not marked seen, they are queued once there is room again
+        item, _ = frontier.next_ready()
+        frontier.done(item)
+        self.assertFalse(frontier.add("https://a.example/1"))
+        self.assertEqual(frontier.duplicates, 1)
+        self.assertTrue(frontier.add("https://a.example/4"))
+
+
+class TestCrawl(unittest.TestCase):
+    def test_crawl_fetches_every_page_once_politely(self):
+        async def handler(session, item):
+            status, headers, body = await session.get(item.url)
+            return body["links"]
+
+        async def main():
+            session = FakeAsyncSession(answer_site, delay=0.005)
+            frontier = Frontier(delay=0.03)
+            frontier.add("https://a.example/")
+            stats = await crawl(session, frontier, handler, workers=4)
+            return session, stats
+
+        session, stats = asyncio.run(main())
+        urls = [sent.url for sent in session.sent]
+        self.assertEqual(sorted(urls), sorted(SITE))
+        self.assertEqual(stats, {"fetched": len(SITE), "errors": 0})
+        for host in ("a.example", "b.example"):
+            starts = [sent.at for sent in session.sent if host in sent.url]
+            self.assertTrue(all(b - a >= 0.029 for a, b in zip(starts, starts[1:])))
+
+    def test_max_depth_and_errors(self):
+        async def handler(session, item):
+            if item.url.endswith("/2"):
+                raise ValueError("broken page")
+            status, headers, body = await session.get(item.url)
+            return body["links"]
+
+        async def main():
+            frontier = Frontier(delay=0)
+            frontier.add("https://a.example/")
+            return await crawl(FakeAsyncSession(answer_site, delay=0.005), frontier, handler, max_depth=1)
+
+        self.assertEqual(asyncio.run(main()), {"fetched": 3, "errors": 1})
+
+
+if __name__ == "__main__":
+    unittest.main()
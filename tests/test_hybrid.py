@@ -0,0 +1,105 @@
+import asyncio
+import time
+import unittest
+from requestez.kurl import HybridAsyncSession, HybridSession, is_bot_wall
+from _fakes import FakeResponse
+
+CHALLENGE = b"<html><head><title>Just a moment...</title></head><body>cf-chl</body></html>"
+HTML = {"Content-Type": "text/html"}
+
+
+class FakeBackend:
+    """Answers with a challenge for the hosts in walled (unless it impersonates), records the urls it got."""
+    def __init__(self, walled=(), impersonates=False):
+        self.walled = walled
+        self.impersonates = impersonates
+        self.urls = []
+
+    def respond(self, url):
+        self.urls.append(url)
+        if any(host in url for host in self.walled) and not self.impersonates:
+            return FakeResponse(url, 503, CHALLENGE, HTML)
+        return FakeResponse(url, content=b"<html>page</html>", headers=HTML)
+
+    def request(self, method, url, **kwargs):
+        return self.respond(url)
+
+    async def _perform_request(self, method, url, **kwargs):
+        return self.respond(url)
+
+    def _timings(self, response):
+        return {}
+
+
+class TestIsBotWall(unittest.TestCase):
+    def test_detection(self):
+        self.assertTrue(is_bot_wall(FakeResponse("u", 403, CHALLENGE)))
+        self.assertTrue(is_bot_wall(FakeResponse("u", 200, b"", {"cf-mitigated": "challenge"})))
+        self.assertFalse(is_bot_wall(FakeResponse("u", 403, b"forbidden")))
+        self.assertFalse(is_bot_wall(FakeResponse("u", 200, CHALLENGE)))
+
+    def test_streamed_responses_use_headers_only(self):
+        response = FakeResponse("u", 503, CHALLENGE, {"server": "cloudflare"})
+        self.assertTrue(is_bot_wall(response, streamed=True))
+        self.assertFalse(is_bot_wall(FakeResponse("u", 503, CHALLENGE, {"server": "nginx"}), streamed=True))
+
+
+class TestHybridSession(unittest.TestCase):
+    def setUp(self):
+        self.session = HybridSession(escalate_for=0.2)
+        self.session.light = FakeBackend(walled=("walled.example",))
+        self.session._heavy = FakeBackend(walled=("walled.example",), impersonates=True)
+
+    def get(self, url):
+        return self.session.get(url, notify=False)
+
+    def test_open_hosts_stay_light(self):
+        self.assertEqual(self.get("https://open.example/a"), "<html>page</html>")
+        self.assertEqual(self.session._heavy.urls, [])
+        self.assertFalse(self.session.is_escalated("open.example"))
+
+    def test_walled_host_is_escalated_and_remembered(self):
+        self.assertEqual(self.get("https://walled.example/a"), "<html>page</html>")
+        self.assertEqual(self.get("https://walled.example/b"), "<html>page</html>")
+        self.assertEqual(self.session.light.urls, ["https://walled.example/a"])
+        self.assertEqual(self.session._heavy.urls, ["https://walled.example/a", "https://walled.example/b"])
+        self.assertEqual(self.session.escalations, 1)
+
+    def test_escalation_expires(self):
+        self.get("https://walled.example/a")
+        time.sleep(0.25)
+        self.assertFalse(self.session.is_escalated("walled.example"))
+        self.get("https://walled.example/b")
+        self.assertEqual(self.session.light.urls, ["https://walled.example/a", "https://walled.example/b"])
+
+    def test_backends_share_the_cookie_jar(self):
+        session = HybridSession()
+        self.assertIs(session.heavy.cookies.jar, session.light.cookies)
+
+
+class TestHybridAsyncSession(unittest.TestCase):
+    def test_walled_host_is_escalated(self):
+        async def main():
+            session = HybridAsyncSession()
+            session.light = FakeBackend(walled=("walled.example",))
+            session._heavy = FakeBackend(walled=("walled.example",), impersonates=True)
+            results = [await session.get(url, read_as="text")
+                       for url in ("https://walled.example/a", "https://walled.example/b", "https://open.example/")]
+            return session, results
+
+        session, results = asyncio.run(main())
+        self.assertEqual([status for status, _, _ in results], [200, 200, 200])
+        self.assertEqual(session.light.urls, ["https://walled.example/a", "https://open.example/"])
+        self.assertEqual(session._heavy.urls, ["https://walled.example/a", "https://walled.example/b"])
+
+    def test_backends_share_the_cookie_jar(self):
+        async def main():
+            async with HybridAsyncSession() as session:
+                heavy = await session.heavy()
+                return heavy.client.cookies.jar is session.light.client.cookies.jar
+
+        self.assertTrue(asyncio.run(main()))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,39 @@
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY = ["requests", "bs4", "m3u8", "yarl", "regex", "curl_cffi", "httpx", "moviepy"]
+
+
+def loaded_after(statement: str):
+    code = f"import sys, json\n{statement}\nprint(json.dumps([m for m in {HEAVY!r} if m in sys.modules]))"
+    env = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, env=env, check=True)
+    return json.loads(result.stdout)
+
+
+class TestLazyImports(unittest.TestCase):
+    def test_import_requestez_is_light(self):
+        self.assertEqual(loaded_after("import requestez"), [])
+
+    def test_subpackages_are_light(self):
+        self.assertEqual(loaded_after("import requestez.parsers, requestez.kurl, requestez.asynchronous"), [])
+
+    def test_dependencies_load_on_use(self):
+        loaded = loaded_after("import requestez\nrequestez.Session()\nrequestez.parsers.html('<p>a</p>')")
+        self.assertIn("requests", loaded)
+        self.assertIn("bs4", loaded)
+
+    def test_lazy_module_attributes(self):
+        loaded = loaded_after("from requestez.parsers import BeautifulSoup, yarl\n"
+                              "from requestez.base import MOVIEPY_AVAILABLE")
+        self.assertIn("bs4", loaded)
+        self.assertIn("yarl", loaded)
+        self.assertNotIn("moviepy", loaded)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import os
+import tempfile
+import threading
+import unittest
+from requestez.helpers import debug, info, log, get_logger, set_log_level
+
+
+class TestLogging(unittest.TestCase):
+    def setUp(self):
+        temp_log = tempfile.NamedTemporaryFile(delete=False, suffix=".json")
+        self.log_file = temp_log.name
+        temp_log.close()
+        self.logger = get_logger()
+        self.level = self.logger.level()
+        self.logger.enable_file_logging(json_path=self.log_file)
+
+    def tearDown(self):
+        self.logger.disable_file_logging()
+        set_log_level(self.level)
+        os.remove(self.log_file)
+
+    def read_log(self):
+        with open(self.log_file, "r") as f:
+            return f.read()
+
+    def test_async_logging(self):
+        set_log_level("i")
+        self.logger.enable_async_logging()
+        try:
+            self.assertIsNotNone(self.logger.queue_listener)
+            info("Queued info message")
+            log("Queued raw message")
+            self.logger.flush()
+            content = self.read_log()
+            self.assertIn("Queued info message", content)
+            self.assertIn("Queued raw message", content)
+            self.logger.disable_file_logging()
+            info("After disable message")
+            self.logger.flush()
+            self.assertNotIn("After disable message", self.read_log())
+        finally:
+            self.logger.disable_async_logging()
+        self.assertIsNone(self.logger.queue_listener)
+        self.assertIn(self.logger.console_handler, self.logger.logger.handlers)
+        self.assertFalse(any(thread.name == "requestez-log" for thread in threading.enumerate()))
+
+    def test_lazy_messages_and_gating(self):
+        calls = []
+
+        def expensive():
+            calls.append(1)
+            return "Lazy computed message"
+
+        set_log_level("INFO")
+        debug(expensive, lazy=True)
+        self.assertEqual(calls, [])
+        self.assertFalse(self.logger.is_enabled("debug"))
+        info(expensive, lazy=True)
+        self.assertEqual(calls, [1])
+        self.assertIn("Lazy computed message", self.read_log())
+
+
+if __name__ == "__main__":
+    unittest.main()
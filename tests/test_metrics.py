@@ -0,0 +1,76 @@
+import unittest
+from requestez.helpers.metrics import DEFAULT_HOST_LIMIT, MetricsRegistry, get_registry, set_host_limit, timed
+from requestez.parsers import html
+from _fakes import FakeSession
+
+
+class TestMetrics(unittest.TestCase):
+    def test_counter_gauge_histogram(self):
+        registry = MetricsRegistry()
+        hits = registry.counter("hits_total", "hits", ("host",))
+        hits.labels("a").inc()
+        hits.labels(host="a").inc(2)
+        self.assertIs(registry.counter("hits_total"), hits)
+        with self.assertRaises(ValueError):
+            hits.inc()
+        with self.assertRaises(ValueError):
+            registry.gauge("hits_total")
+        registry.gauge("active").set(3)
+        latency = registry.histogram("latency_seconds", buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 0.5, 5.0):
+            latency.observe(value)
+        snapshot = registry.snapshot()
+        self.assertEqual(snapshot["hits_total"]["values"], [{"labels": {"host": "a"}, "value": 3}])
+        histogram = snapshot["latency_seconds"]["values"][0]
+        self.assertEqual(histogram["buckets"], {"0.1": 1, "1": 3, "+Inf": 4})
+        self.assertEqual(histogram["count"], 4)
+        self.assertAlmostEqual(histogram["p50"], 0.55)
+        text = registry.exposition()
+        self.assertIn('hits_total{host="a"} 3', text)
+        self.assertIn('latency_seconds_bucket{le="+Inf"} 4', text)
+        self.assertIn("# TYPE active gauge", text)
+
+    def test_label_limits(self):
+        registry = MetricsRegistry()
+        hits = registry.counter("hits_total", "hits", ("host", "status"), limits={"host": 2})
+        for host in ("a", "b", "c", "d", "a"):
+            hits.labels(host, 200).inc()
+        hits.labels("e", 404).inc()
+        self.assertEqual({labels: child.value for labels, child in hits.children()},
+                         {("a", "200"): 2, ("b", "200"): 1, ("other", "200"): 2, ("other", "404"): 1})
+        registry.reset()
+        hits.labels("c", 200).inc()
+        self.assertEqual([labels for labels, _ in hits.children()], [("c", "200")])
+
+    def test_builtin_host_labels_are_capped(self):
+        registry = get_registry()
+        set_host_limit(0)
+        try:
+            FakeSession().get("https://capped.example/metrics", notify=False)
+        finally:
+            set_host_limit(DEFAULT_HOST_LIMIT)
+        requests = registry.get("requestez_requests_total")
+        self.assertNotIn("capped.example", {labels[2] for labels, _ in requests.children()})
+        self.assertGreater(requests.labels("FakeSession", "GET", "other", 200).value, 0)
+
+    def test_timed_survives_reset(self):
+        registry = MetricsRegistry()
+        histogram = registry.histogram("calls_seconds", labelnames=("name",))
+        double = timed(histogram, "double")(lambda x: x * 2)
+        self.assertEqual(double(2), 4)
+        registry.reset()
+        double(3)
+        self.assertEqual(histogram.labels("double").count, 1)
+
+    def test_sessions_and_parsers_are_instrumented(self):
+        registry = get_registry()
+        before = registry.get("requestez_requests_total").labels("FakeSession", "GET", "example.com", 200).value
+        FakeSession().get("https://example.com/metrics", notify=False)
+        html("<p>x</p>")
+        after = registry.get("requestez_requests_total").labels("FakeSession", "GET", "example.com", 200).value
+        self.assertEqual(after, before + 1)
+        self.assertGreater(registry.get("requestez_parse_seconds").labels("html").count, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+import asyncio
+import json
+import unittest
+from requestez.middleware import AsyncMiddleware, Middleware, MiddlewareChain
+from _fakes import FakeAsyncSession, FakeResponse, FakeSession
+
+
+class Sign(Middleware):
+    def __init__(self, calls):
+        self.calls = calls
+
+    def before_request(self, session, request):
+        self.calls.append("sign")
+        request.kwargs["headers"]["X-Signature"] = "abc"
+
+    def after_response(self, session, request, response):
+        self.calls.append("signed")
+        return response
+
+
+class Cache(Middleware):
+    def __init__(self):
+        self.responses = {}
+
+    def before_request(self, session, request):
+        return self.responses.get(request.url)
+
+    def after_response(self, session, request, response):
+        self.responses[request.url] = response
+        return response
+
+
+class Fallback(Middleware):
+    def on_error(self, session, request, error):
+        return FakeResponse(request.url, content=json.dumps({"error": str(error)}).encode())
+
+
+class AsyncSign(AsyncMiddleware):
+    async def before_request(self, session, request):
+        request.kwargs["headers"]["X-Signature"] = "async"
+
+
+class TestMiddleware(unittest.TestCase):
+    def test_order_and_mutation(self):
+        calls = []
+        session = FakeSession()
+        session.middlewares.add(Sign(calls))
+        response = session.get("https://example.com", text=False, notify=False, headers={"A": "1"})
+        self.assertEqual(response.json()["headers"]["X-Signature"], "abc")
+        self.assertEqual(response.json()["headers"]["A"], "1")
+        self.assertEqual(calls, ["sign", "signed"])
+
+    def test_short_circuit_and_recovery(self):
+        session = FakeSession()
+        cache = session.middlewares.add(Cache())
+        session.middlewares.add(Fallback())
+        first = session.get("https://example.com/a", text=False, notify=False)
+        self.assertIs(session.get("https://example.com/a", text=False, notify=False), first)
+        recovered = session.get("https://example.com/fail", text=False, notify=False)
+        self.assertEqual(recovered.json(), {"error": "refused"})
+        session.middlewares.remove(cache)
+        self.assertEqual(len(session.middlewares), 1)
+        session.middlewares.clear()
+        with self.assertRaises(ConnectionError):
+            session.get("https://example.com/fail", notify=False)
+
+    def test_async_session(self):
+        async def main():
+            session = FakeAsyncSession()
+            session.middlewares.add(AsyncSign())
+            session.middlewares.add(Sign([]))
+            return await session.get("https://example.com")
+
+        status, _, content = asyncio.run(main())
+        self.assertEqual(content["headers"]["X-Signature"], "abc")
+
+    def test_async_hooks_rejected_in_sync_sessions(self):
+        chain = MiddlewareChain((AsyncSign(),))
+        with self.assertRaises(TypeError):
+            chain.run(None, None, lambda request: None)
+
+
+if __name__ == "__main__":
+    unittest.main()
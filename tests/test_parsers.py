@@ -0,0 +1,111 @@
+import unittest
+import asyncio
+from requestez.asynchronous import Session as AsyncSession
+from requestez.parsers import js, js_values
+from requestez.parsers.offload import ParsePool, register_parser, get_parser
+
+
+def count_tags(content, tag):
+    from requestez.parsers import html
+    return len(html(content).find_all(tag))
+
+
+class TestParseOffload(unittest.TestCase):
+    page = "<html><body>" + "<p>row</p>" * 50 + "</body></html>"
+
+    def test_pool_modes(self):
+        for mode in ("thread", "process"):
+            with ParsePool(mode, max_workers=2) as pool:
+                self.assertEqual(pool.submit("load", '{"a": [1, 2]}').result(), {"a": [1, 2]})
+                self.assertEqual(pool.submit(count_tags, self.page, "p").result(), 50)
+
+    def test_session_parse(self):
+        register_parser("count_tags", count_tags)
+        self.assertIs(get_parser("count_tags"), count_tags)
+
+        async def main():
+            async with AsyncSession() as session:
+                session.parse_pool = ParsePool("process", max_workers=2)
+                try:
+                    return await asyncio.gather(session.parse(self.page, "count_tags", "p"),
+                                                session.parse(self.page, "html"))
+                finally:
+                    session.parse_pool.shutdown()
+
+        count, soup = asyncio.run(main())
+        self.assertEqual(count, 50)
+        self.assertEqual(len(soup.find_all("p")), 50)
+
+    def test_auto_pool_keeps_soup_in_threads(self):
+        with ParsePool() as pool:
+            self.assertIs(pool.executor_for("html"), pool.executor_for("xml"))
+            self.assertIsNot(pool.executor_for("html"), pool.executor_for("load"))
+            self.assertEqual(len(pool.submit("html", self.page).result().find_all("p")), 50)
+            self.assertEqual(pool.submit("load", '{"a": 1}').result(), {"a": 1})
+        with ParsePool("process") as pool:
+            self.assertIs(pool.executor_for("html"), pool.executor_for("load"))
+
+    def test_default_pool_uses_threads(self):
+        from concurrent.futures import ThreadPoolExecutor
+        from requestez.parsers.offload import get_default_pool
+        self.assertIsInstance(get_default_pool().executor_for("load"), ThreadPoolExecutor)
+
+    def test_unknown_parser(self):
+        with self.assertRaises(KeyError):
+            get_parser("nope")
+
+
+class TestJsValues(unittest.TestCase):
+    script = ("var config = {file: 'https:\\/\\/cdn.example\\/v.m3u8', 'sizes': [360, 720.5, -1,,], autoplay: !0, "
+              "meta: {id: 0x1f, title: \"a\\u00e9\", extra: null}}, count = 3;"
+              "window.__DATA__ = {ok: true}; window['player'] = 'jw'; var noop = function () { return 1; };")
+
+    def test_all_names(self):
+        values = js_values(self.script)
+        self.assertEqual(values["config"], {
+            "file": "https://cdn.example/v.m3u8",
+            "sizes": [360, 720.5, -1, None],
+            "autoplay": True,
+            "meta": {"id": 31, "title": "a\u00e9", "extra": None},
+        })
+        self.assertEqual(values["count"], 3)
+        self.assertEqual(values["window.__DATA__"], {"ok": True})
+        self.assertEqual(values["window.player"], "jw")
+        self.assertIsNone(values["noop"])
+
+    def test_named_and_cached(self):
+        self.assertEqual(js_values(self.script, names=["count", "missing"]), {"count": 3})
+        first = js_values(self.script, names=["config"])
+        first["config"]["file"] = "changed"
+        self.assertEqual(js_values(self.script, names=["config"])["config"]["file"], "https://cdn.example/v.m3u8")
+        self.assertEqual(js_values("var a = 1;", names=["zzz"]), {})
+
+    def test_let_and_const(self):
+        script = 'const config = {x: 1, note: "let it be"}; let count = 2; var other = {let: 3}; other.let = 4;'
+        self.assertEqual(js_values(script), {"config": {"x": 1, "note": "let it be"}, "count": 2,
+                                             "other": {"let": 3}, "other.let": 4})
+        with self.assertRaises(SyntaxError):
+            js_values("const f = () => 1;", cache=False)
+
+    def test_js_string_escapes(self):
+        values = js_values('var a = "\\d+"; var b = "\\N"; var c = "\\x41\\u0042\\ud83d\\ude00\\101\\0";'
+                           'var d = \'\\\'q\\\' \\\\ \\/\'; var e = "a\\\nb";')
+        self.assertEqual(values, {"a": "d+", "b": "N", "c": "AB\U0001F600A\x00", "d": "'q' \\ /", "e": "ab"})
+
+    def test_js_brace_escape(self):
+        from requestez.parsers.javascript import _string
+
+        class Node:
+            value = '"\\u{1F600}\\u{41}"'
+
+        self.assertEqual(_string(Node), "\U0001F600A")
+
+    def test_js_tree(self):
+        self.assertEqual(js("var a = 1;"), {"program": {"var": {"@name": "a", "number": {"@value": "1"}}}})
+        tree = js("var a = 1;")
+        tree["program"] = None
+        self.assertIsNotNone(js("var a = 1;")["program"])
+
+
+if __name__ == "__main__":
+    unittest.main()
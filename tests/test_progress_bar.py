@@ -0,0 +1,152 @@
+import io
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from contextlib import redirect_stdout
+from unittest import mock
+from requestez.base import BaseSession
+from requestez.helpers import pbar, MultiBar, RateEstimator
+
+
+class CountingCounter:
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+
+class TestProgressBar(unittest.TestCase):
+    def test_redraws_are_throttled(self):
+        out = io.StringIO()
+        with redirect_stdout(out):
+            bar = pbar(total=10000, min_interval=60)
+            for _ in range(10000):
+                bar.update()
+        # the initial draw and the final one
+        self.assertEqual(out.getvalue().count("\r"), 2)
+        self.assertTrue(bar.finished)
+
+    def test_headless_feeds_counter(self):
+        counter = CountingCounter()
+        out = io.StringIO()
+        with redirect_stdout(out):
+            bar = pbar(total=10, headless=True, counter=counter)
+            bar.update(plus=4)
+            bar.update(progress=10)
+        self.assertEqual(out.getvalue(), "")
+        self.assertEqual(counter.value, 10)
+        self.assertTrue(bar.finished)
+
+    def test_unknown_total_finishes_on_close(self):
+        out = io.StringIO()
+        with redirect_stdout(out):
+            bar = pbar(total=0, min_interval=60)
+            bar.update(plus=5)
+            self.assertFalse(bar.finished)
+            bar.close(finish="|done")
+        self.assertTrue(out.getvalue().endswith("|done"))
+        self.assertIn("5/0", out.getvalue())
+
+    def test_multibar_workers(self):
+        multi = MultiBar(total=400, headless=True)
+
+        def work():
+            handle = multi.worker()
+            for _ in range(100):
+                handle.update()
+
+        threads = [threading.Thread(target=work, name=f"w{i}") for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(multi.iteration, 400)
+        self.assertEqual(multi.counts(), {f"w{i}": 100 for i in range(4)})
+        self.assertTrue(multi.bar.finished)
+
+    def test_segment_downloads_count_worker_slots(self):
+        bars = []
+
+        class RecordingBar(MultiBar):
+            def __init__(self, total, **kwargs):
+                super().__init__(total, headless=True, **kwargs)
+                bars.append(self)
+
+        class SegmentSession(BaseSession):
+            def _perform_request(self, method, url, **kwargs):
+                raise AssertionError("segments are not requested")
+
+            def download(self, url, file_name, **kwargs):
+                time.sleep(0.005)
+
+        folder = tempfile.mkdtemp()
+        try:
+            segments = [{"uri": f"seg{index}.ts"} for index in range(12)]
+            with mock.patch("requestez.base.MultiBar", RecordingBar):
+                SegmentSession()._download_segments(segments, folder, "https://cdn.example", multiple_threads=True,
+                                                    max_threads=3)
+        finally:
+            shutil.rmtree(folder)
+        self.assertEqual(bars[0].counts(), {f"worker-{slot}": 4 for slot in range(3)})
+        self.assertIn("3 workers", bars[0].bar.suffix)
+
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestRateEstimator(unittest.TestCase):
+    def test_window_ewma_and_average(self):
+        clock = FakeClock()
+        estimator = RateEstimator(window=2.0, half_life=1.0, clock=clock)
+        for _ in range(10):
+            clock.now += 1
+            estimator.add(100)
+        self.assertAlmostEqual(estimator.rate(), 100)
+        self.assertAlmostEqual(estimator.ewma, 100)
+        # throughput drops, the window follows immediately while the average lags
+        for _ in range(4):
+            clock.now += 1
+            estimator.add(10)
+        self.assertAlmostEqual(estimator.rate(), 10)
+        self.assertLess(estimator.ewma, 20)
+        self.assertAlmostEqual(estimator.average(), 1040 / 14)
+        self.assertAlmostEqual(estimator.eta(100), 100 / estimator.ewma)
+
+    def test_coarse_clock_keeps_same_tick_samples(self):
+        clock = FakeClock()
+        estimator = RateEstimator(half_life=1.0, clock=clock)
+        # 10 chunks of 1000 per 16 ms tick: 625000 per second
+        for _ in range(1000):
+            clock.now += 0.016
+            for _ in range(10):
+                estimator.add(1000)
+        self.assertAlmostEqual(estimator.ewma, 625000, delta=100)
+        self.assertAlmostEqual(estimator.eta(625000), 1, places=3)
+
+    def test_stall_detection(self):
+        clock = FakeClock()
+        estimator = RateEstimator(window=1.0, clock=clock)
+        clock.now = 0.5
+        estimator.add(5000)
+        self.assertFalse(estimator.stalled(min_rate=1000, grace=2))
+        for _ in range(5):
+            clock.now += 0.9
+            estimator.add(10)
+            stalled = estimator.stalled(min_rate=1000, grace=2)
+        self.assertTrue(stalled)
+        clock.now += 5
+        self.assertEqual(estimator.rate(), 0)
+        self.assertTrue(estimator.stalled(min_rate=0, grace=2))
+
+
+if __name__ == "__main__":
+    unittest.main()
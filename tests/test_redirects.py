@@ -0,0 +1,135 @@
+import asyncio
+import collections
+import time
+import unittest
+from requestez import Session
+from requestez.asynchronous import Session as HttpxSession
+from requestez.kurl import AsyncSession as KurlAsyncSession
+from requestez.services.redirects import AsyncRedirectResolver, RedirectResolver
+from _fakes import BaseHandler, LocalServer
+
+
+class Handler(BaseHandler):
+    hits = collections.Counter()
+
+    def answer(self, status, location=None, body=b""):
+        self.send(body, status=status, headers=[("Location", location)] if location else ())
+
+    def route(self):
+        Handler.hits[self.command, self.path] += 1
+        path = self.path
+        if path.startswith("/short/"):
+            self.answer(301, "/mid")
+        elif path == "/mid":
+            self.answer(302, f"http://{self.headers['Host']}/final")
+        elif path == "/final":
+            self.answer(200, body=b"final")
+        elif path == "/loop/a":
+            self.answer(302, "b")
+        elif path == "/loop/b":
+            self.answer(307, "/loop/a")
+        elif path.startswith("/chain/"):
+            self.answer(302, f"/chain/{int(path[7:]) + 1}")
+        elif path == "/nohead":
+            self.answer(405) if self.command == "HEAD" else self.answer(302, "/final", b"moved")
+        elif path.startswith("/slow/"):
+            time.sleep(0.2)
+            self.answer(200)
+        else:
+            self.answer(404)
+
+    do_GET = do_HEAD = route
+
+
+class TestRedirectResolver(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = LocalServer(Handler).start()
+        cls.url = cls.server.url
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def setUp(self):
+        Handler.hits.clear()
+
+    def check_outcomes(self, resolutions):
+        url = self.url
+        short, loop, chain, nohead = resolutions[:4]
+        self.assertEqual((short.outcome, short.urls), ("resolved", [f"{url}/short/1", f"{url}/mid", f"{url}/final"]))
+        self.assertEqual([hop.status_code for hop in short.chain], [301, 302, 200])
+        self.assertEqual((loop.outcome, loop.urls), ("loop", [f"{url}/loop/a", f"{url}/loop/b"]))
+        self.assertEqual((chain.outcome, len(chain.chain)), ("too_many_hops", 4))
+        self.assertEqual((nohead.outcome, nohead.final_url), ("resolved", f"{url}/final"))
+        self.assertEqual([hop.method for hop in nohead.chain], ["GET", "HEAD"])
+
+    def urls(self):
+        return [f"{self.url}/short/1", f"{self.url}/loop/a", f"{self.url}/chain/0", f"{self.url}/nohead",
+                f"{self.url}/short/2", f"{self.url}/short/1"]
+
+    def test_sync_chains_and_cache(self):
+        resolver = RedirectResolver(Session(), max_hops=3)
+        resolutions = resolver.resolve_many(self.urls())
+        self.check_outcomes(resolutions)
+        self.assertEqual([resolution.url for resolution in resolutions], self.urls())
+        self.assertIs(resolutions[0], resolutions[5])
+        # /mid and /final are requested once for the three chains through them
+        self.assertEqual((Handler.hits["HEAD", "/mid"], Handler.hits["HEAD", "/final"]), (1, 1))
+        self.assertEqual(Handler.hits["GET", "/final"], 0)
+        self.assertGreaterEqual(resolver.cache_hits, 2)
+
+    def test_sync_concurrency_and_errors(self):
+        resolver = RedirectResolver(Session(), concurrency=20)
+        start = time.perf_counter()
+        resolutions = list(resolver.iter_resolve(f"{self.url}/slow/{index}" for index in range(40)))
+        self.assertLess(time.perf_counter() - start, 1.5)
+        self.assertEqual(len(resolutions), 40)
+        broken = resolver.resolve("http://127.0.0.1:9/unreachable")
+        self.assertEqual((broken.outcome, broken.chain), ("error", []))
+        self.assertIsNotNone(broken.error)
+
+    def test_async_chains(self):
+        async def main(session_type):
+            async with session_type() as session:
+                resolver = AsyncRedirectResolver(session, max_hops=3, concurrency=8)
+                resolutions = await resolver.resolve_many(self.urls())
+                streamed = [resolution async for resolution in resolver.iter_resolve(self.urls()[:4])]
+                return resolutions, streamed, resolver
+
+        for session_type in (HttpxSession, KurlAsyncSession):
+            with self.subTest(session_type.__name__):
+                Handler.hits.clear()
+                resolutions, streamed, resolver = asyncio.run(main(session_type))
+                self.check_outcomes(resolutions)
+                self.assertEqual(sorted(resolution.url for resolution in streamed), sorted(self.urls()[:4]))
+                # the second pass is served from the hop cache
+                self.assertEqual(sum(Handler.hits.values()), resolver.requests + 1)
+
+    def test_async_follower_outlives_cancelled_leader(self):
+        async def main():
+            async with HttpxSession() as session:
+                resolver = AsyncRedirectResolver(session)
+                leader = asyncio.ensure_future(resolver.resolve(f"{self.url}/slow/1"))
+                await asyncio.sleep(0.05)
+                follower = asyncio.ensure_future(resolver.resolve(f"{self.url}/slow/1"))
+                await asyncio.sleep(0.05)
+                leader.cancel()
+                return await follower, leader.cancelled()
+
+        resolution, cancelled = asyncio.run(main())
+        self.assertTrue(cancelled)
+        self.assertEqual((resolution.outcome, resolution.final_url), ("resolved", f"{self.url}/slow/1"))
+        self.assertEqual(Handler.hits["HEAD", "/slow/1"], 2)
+
+    def test_ttl_expires_hops(self):
+        resolver = RedirectResolver(Session(), ttl=0.05)
+        resolver.resolve(f"{self.url}/final")
+        resolver.resolve(f"{self.url}/final")
+        time.sleep(0.1)
+        resolver.resolve(f"{self.url}/final")
+        self.assertEqual(Handler.hits["HEAD", "/final"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
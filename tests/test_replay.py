@@ -0,0 +1,172 @@
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from requestez import Session
+from requestez.asynchronous import Session as HttpxSession
+from requestez.kurl import AsyncSession as KurlAsyncSession, Session as KurlSession
+from requestez.services.replay import Archive, Recorder, ReplayMiss, Replayer, request_key
+from _fakes import BaseHandler, LocalServer
+
+FILE = bytes(range(256)) * 200
+
+
+class Handler(BaseHandler):
+    hits = 0
+
+    def do_GET(self):
+        Handler.hits += 1
+        if self.path == "/file":
+            self.send(FILE, "application/octet-stream")
+        else:
+            self.send(json.dumps({"path": self.path, "hit": Handler.hits}).encode(), "application/json")
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        self.send(json.dumps({"echo": body.decode()}).encode(), "application/json")
+
+
+class TestReplay(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, "archive.zip")
+        self.start_server()
+
+    def start_server(self):
+        self.server = LocalServer(Handler).start()
+        self.url = self.server.url
+        self.server_running = True
+
+    def tearDown(self):
+        self.stop_server()
+        shutil.rmtree(self.folder)
+
+    def stop_server(self):
+        if self.server_running:
+            self.server_running = False
+            self.server.stop()
+
+    def test_sync_sessions_record_and_replay_offline(self):
+        for name, session_type in (("requests", Session), ("curl", KurlSession)):
+            with self.subTest(name):
+                path = os.path.join(self.folder, f"{name}.zip")
+                self.server_running or self.start_server()
+                session = session_type()
+                with Recorder(path) as recorder:
+                    session.transport = recorder
+                    live = [session.get(f"{self.url}/a", notify=False) for _ in range(2)]
+                    live.append(session.post(f"{self.url}/p", body="x=1", notify=False))
+                    session.download(f"{self.url}/file", os.path.join(self.folder, f"{name}.live"), quiet=True)
+                self.assertEqual(recorder.recorded, 4)
+                self.stop_server()
+                session.transport = Replayer(path)
+                replayed = [session.get(f"{self.url}/a", notify=False) for _ in range(2)]
+                replayed.append(session.post(f"{self.url}/p", body="x=1", notify=False))
+                self.assertEqual(replayed, live)
+                target = os.path.join(self.folder, f"{name}.bin")
+                session.download(f"{self.url}/file", target, quiet=True)
+                with open(target, "rb") as file:
+                    self.assertEqual(file.read(), FILE)
+                with self.assertRaises(ReplayMiss):
+                    session.post(f"{self.url}/p", body="x=2", notify=False)
+                session.transport.close()
+
+    def test_async_sessions_record_and_replay_offline(self):
+        async def fetch(session_type, transport):
+            async with session_type() as session:
+                session.transport = transport
+                return [await session.get(f"{self.url}/a") for _ in range(3)]
+
+        for session_type in (HttpxSession, KurlAsyncSession):
+            with self.subTest(session_type.__name__):
+                self.server_running or self.start_server()
+                with Recorder(self.path) as recorder:
+                    live = asyncio.run(fetch(session_type, recorder))
+                self.stop_server()
+                with Replayer(self.path) as replayer:
+                    replayed = asyncio.run(fetch(session_type, replayer))
+                    self.assertEqual([(status, body) for status, _, body in replayed],
+                                     [(status, body) for status, _, body in live])
+                    self.assertEqual(replayed[0][1]["content-type"], "application/json")
+                    self.assertEqual((replayer.hits, replayer.misses), (3, 0))
+                os.remove(self.path)
+
+    def test_streamed_bodies_are_spooled_and_partial_reads_recorded(self):
+        session = Session()
+        with Recorder(self.path, spool_bytes=1024) as recorder:
+            session.transport = recorder
+            session.download(f"{self.url}/file", os.path.join(self.folder, "live"), quiet=True)
+            response = recorder.perform(session, "GET", f"{self.url}/file", {"stream": True})
+            chunks = response.iter_content(1000)
+            self.assertEqual(next(chunks) + next(chunks), FILE[:2000])
+            chunks.close()
+        key = request_key("GET", f"{self.url}/file", {})
+        with Archive(self.path, "r") as archive:
+            self.assertEqual(archive.get(key, 0).content, FILE)
+            self.assertEqual(archive.get(key, 1).content, FILE[:2000])
+
+    def test_params_are_part_of_the_key(self):
+        async def fetch(transport):
+            async with HttpxSession() as session:
+                session.transport = transport
+                return [(await session.get(f"{self.url}/a", params={"page": page}))[2] for page in (1, 2)]
+
+        with Recorder(self.path) as recorder:
+            live = asyncio.run(fetch(recorder))
+        self.assertEqual([body["path"] for body in live], ["/a?page=1", "/a?page=2"])
+        self.stop_server()
+        with Replayer(self.path) as replayer:
+            self.assertEqual(asyncio.run(fetch(replayer)), live)
+        self.assertEqual(request_key("GET", "u?page=1", {}), request_key("GET", "u", {"params": {"page": 1}}))
+
+    def test_sequence_repeats_last_and_rewinds(self):
+        session = Session()
+        with Recorder(self.path) as recorder:
+            session.transport = recorder
+            hits = [json.loads(session.get(f"{self.url}/a", notify=False))["hit"] for _ in range(2)]
+        session.transport = replayer = Replayer(self.path)
+        replayed = [json.loads(session.get(f"{self.url}/a", notify=False))["hit"] for _ in range(3)]
+        self.assertEqual(replayed, hits + hits[-1:])
+        replayer.rewind()
+        self.assertEqual(json.loads(session.get(f"{self.url}/a", notify=False))["hit"], hits[0])
+        replayer.close()
+
+    def test_latency_and_bandwidth(self):
+        session = Session()
+        with Recorder(self.path) as recorder:
+            session.transport = recorder
+            session.get(f"{self.url}/file", notify=False, text=False)
+        with Replayer(self.path, latency=0.05, bandwidth=len(FILE) * 10) as replayer:
+            session.transport = replayer
+            start = time.perf_counter()
+            response = session.get(f"{self.url}/file", notify=False, text=False)
+            self.assertGreaterEqual(time.perf_counter() - start, 0.15)
+            self.assertEqual(response.content, FILE)
+
+    def test_archive_index_and_keys(self):
+        with Archive(self.path) as archive:
+            self.assertEqual(len(archive), 0)
+        session = Session()
+        with Recorder(self.path) as recorder:
+            session.transport = recorder
+            session.get(f"{self.url}/a", notify=False)
+            session.get(f"{self.url}/a", headers={"Range": "bytes=5-"}, notify=False)
+        # appending keeps the earlier exchanges
+        with Recorder(self.path) as recorder:
+            session.transport = recorder
+            session.get(f"{self.url}/a", notify=False)
+        with Archive(self.path, "r") as archive:
+            self.assertEqual(len(archive), 3)
+            key = request_key("GET", f"{self.url}/a", {})
+            self.assertEqual(archive.count(key), 2)
+            self.assertEqual(archive.get(key, 1).status_code, 200)
+        self.assertNotEqual(request_key("POST", "u", {"json": {"a": 1}}), request_key("POST", "u", {"json": {"a": 2}}))
+        self.assertEqual(request_key("POST", "u", {"data": {"b": 1, "a": 2}}),
+                         request_key("POST", "u", {"data": {"a": 2, "b": 1}}))
+
+
+if __name__ == "__main__":
+    unittest.main()
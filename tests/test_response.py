@@ -0,0 +1,143 @@
+import asyncio
+import json
+import unittest
+from requestez.response import CharsetResolver, Response
+from _fakes import FakeAsyncSession, FakeSession
+
+
+class FakeBackendResponse:
+    """Backend response counting how often its body is decoded."""
+    def __init__(self, url, content=b'{"a": 1}', headers=None, status_code=200):
+        self.url = url
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers if headers is not None else {"Content-Type": "application/json"}
+        self.encoding = "ascii"
+        self.decodes = 0
+
+    @property
+    def text(self):
+        self.decodes += 1
+        return self.content.decode("ascii")
+
+    def json(self):
+        self.decodes += 1
+        return json.loads(self.content)
+
+
+def answering(response):
+    """respond hook for the fake sessions, every request gets response."""
+    return lambda method, url, kwargs: response
+
+
+class TestResponse(unittest.TestCase):
+    def test_charset_from_content_type(self):
+        response = Response(200, {"Content-Type": "text/html; charset=ISO-8859-1"}, "u", "café".encode("latin-1"))
+        self.assertEqual(response.text, "café")
+        self.assertEqual(response.encoding, "iso8859-1")
+
+    def test_decodes_from_bytes_without_the_backend(self):
+        backend = FakeBackendResponse("u", "é".encode(), {"Content-Type": "text/plain"})
+        response = Response.from_backend(backend)
+        self.assertEqual(response.text, "é")
+        self.assertEqual(response.text, "é")
+        self.assertEqual((backend.decodes, response.encoding), (0, "utf-8"))
+
+    def test_json_and_soup_are_cached(self):
+        response = Response(200, {"Content-Type": "text/html; charset=utf-8"}, "u", b"<p>[1, 2]</p>")
+        self.assertIs(response.soup, response.soup)
+        self.assertEqual(response.soup.p.text, "[1, 2]")
+        document = Response(200, {}, "u", b'{"a": [1]}')
+        self.assertIs(document.json(), document.json())
+        with self.assertRaises(ValueError):
+            Response(200, {}, "u", b"not json").json()
+
+    def test_ok(self):
+        self.assertTrue(Response(302, {}, "u", b"").ok)
+        self.assertFalse(Response(404, {}, "u", b"").ok)
+
+
+class TestCharsetResolver(unittest.TestCase):
+    def setUp(self):
+        self.resolver = CharsetResolver()
+
+    def test_header_wins_over_meta(self):
+        body = '<meta charset="utf-8"><p>café</p>'.encode("cp1252")
+        self.assertEqual(self.resolver.decode(body, {"Content-Type": "text/html; charset=windows-1252"}, "http://a/"),
+                         ('<meta charset="utf-8"><p>café</p>', "cp1252"))
+
+    def test_meta_and_xml_declarations(self):
+        self.assertEqual(self.resolver.resolve(b'<html><META http-equiv="Content-Type" '
+                                               b'content="text/html; charset=Shift_JIS">'), "shift_jis")
+        self.assertEqual(self.resolver.resolve(b"<?xml version='1.0' encoding='ISO-8859-2'?><a/>"), "iso8859-2")
+        self.assertEqual(self.resolver.resolve(b'<meta charset="unknown-charset">'), "utf-8")
+        self.assertEqual(self.resolver.resolve(b"\xef\xbb\xbfabc"), "utf-8-sig")
+
+    def test_meta_only_searched_in_the_first_bytes(self):
+        body = b" " * 5000 + b'<meta charset="koi8-r">'
+        self.assertEqual(self.resolver.resolve(body), "utf-8")
+
+    def test_host_learns_declared_charset(self):
+        self.resolver.resolve(b"x", {"Content-Type": "text/html; charset=cp1251"}, "https://Host.example/a")
+        text, encoding = self.resolver.decode("привет".encode("cp1251"), {"Content-Type": "text/html"},
+                                              "https://host.example/b")
+        self.assertEqual((text, encoding), ("привет", "cp1251"))
+        self.assertEqual((self.resolver.sources["host"], self.resolver.sources["detected"]), (1, 0))
+        # json is utf-8 whatever the host uses
+        self.assertEqual(self.resolver.resolve(b"{}", {"Content-Type": "application/json"},
+                                               "https://host.example/api"), "utf-8")
+
+    def test_detection_is_the_last_resort(self):
+        body = ("Il était une fois une très belle forêt où vivaient des élèves. " * 20).encode("cp1252")
+        text, encoding = self.resolver.decode(body, {}, "http://old.example/")
+        self.assertNotEqual(encoding, "utf-8")
+        self.assertTrue(text.startswith("Il "))
+        self.assertEqual(self.resolver.sources["detected"], 1)
+        # a detected charset is not remembered for the host
+        self.assertEqual(self.resolver.resolve(body, {}, "http://old.example/other"), encoding)
+        self.assertEqual((self.resolver.sources["detected"], self.resolver.sources["host"]), (2, 0))
+
+    def test_host_charset_does_not_override_utf8(self):
+        body = ("Il était une fois une très belle forêt où vivaient des élèves. " * 20).encode("cp1252")
+        self.resolver.decode(body, {}, "http://old.example/a")
+        page = "naïve 日本".encode("utf-8")
+        self.assertEqual(self.resolver.decode(page, {}, "http://old.example/b"), ("naïve 日本", "utf-8"))
+        self.resolver.resolve(b"x", {"Content-Type": "text/html; charset=latin-1"}, "http://latin.example/a")
+        self.assertEqual(self.resolver.decode("café".encode("utf-8"), {}, "http://latin.example/b"),
+                         ("café", "utf-8"))
+        self.assertEqual(self.resolver.sources["host"], 0)
+
+    def test_session_text_uses_the_session_resolver(self):
+        backend = FakeBackendResponse("https://example.com/", "ü".encode("latin-1"), {})
+        session = FakeSession(answering(backend))
+        session.charsets = CharsetResolver()
+        session.charsets.hosts.set("example.com", "latin-1")
+        self.assertEqual(session.get("https://example.com/", notify=False), "ü")
+        self.assertEqual(backend.decodes, 0)
+
+
+class TestLazySessions(unittest.TestCase):
+    def test_sync_lazy_get_does_not_decode(self):
+        backend = FakeBackendResponse("https://example.com/a")
+        response = FakeSession(answering(backend)).get("https://example.com/a", notify=False, lazy=True)
+        self.assertIsInstance(response, Response)
+        self.assertEqual((response.status_code, backend.decodes), (200, 0))
+        self.assertEqual(response.json(), {"a": 1})
+        self.assertEqual(backend.decodes, 0)
+
+    def test_async_read_as_response(self):
+        backend = FakeBackendResponse("https://example.com/a")
+
+        async def main():
+            session = FakeAsyncSession(answering(backend))
+            response = await session.navigate("https://example.com/a", read_as="response")
+            return session, response
+
+        session, response = asyncio.run(main())
+        self.assertEqual((response.status_code, response.url, backend.decodes), (200, "https://example.com/a", 0))
+        self.assertEqual(session.current_url, "https://example.com/a")
+        self.assertEqual(response.json(), {"a": 1})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+import asyncio
+import os
+import tempfile
+import time
+import unittest
+from http.cookiejar import CookieJar
+from requestez.services.state import StateStore, export_cookies, import_cookies
+from _fakes import FakeAsyncSession, FakeSession
+
+
+def cookie(name, value, domain="example.com", expires=None, httponly=False):
+    return {"name": name, "value": value, "domain": domain, "path": "/", "expires": expires, "secure": False,
+            "httponly": httponly}
+
+
+class TestCookies(unittest.TestCase):
+    def test_roundtrip(self):
+        jar = CookieJar()
+        cookies = [cookie("a", "1", httponly=True), cookie("b", "2", ".example.com", int(time.time()) + 60)]
+        import_cookies(jar, cookies)
+        self.assertEqual(sorted(export_cookies(jar), key=lambda c: c["name"]), cookies)
+
+    def test_expired_cookies_are_skipped(self):
+        jar = CookieJar()
+        import_cookies(jar, [cookie("old", "1", expires=int(time.time()) - 10), cookie("new", "2")])
+        self.assertEqual([c.name for c in jar], ["new"])
+
+
+class TestStateStore(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, "states.db")
+        self.store = StateStore(self.path)
+
+    def tearDown(self):
+        self.store.close()
+
+    def test_save_and_load(self):
+        self.assertIsNone(self.store.load("w1"))
+        self.store.save("w1", {"cookies": [cookie("sid", "x")], "last_html_url": "https://example.com/"})
+        with StateStore(self.path) as other:
+            state = other.load("w1")
+        self.assertEqual(state["last_html_url"], "https://example.com/")
+        self.assertEqual(state["cookies"], [cookie("sid", "x")])
+        self.assertEqual(self.store.identities(), ["w1"])
+
+    def test_only_changes_are_written(self):
+        cookies = [cookie(f"c{i}", str(i)) for i in range(50)]
+        self.assertEqual(self.store.save("w1", {"cookies": cookies, "current_url": None}), 51)
+        self.assertEqual(self.store.save("w1", {"cookies": cookies, "current_url": None}), 0)
+        cookies[3] = cookie("c3", "changed")
+        del cookies[10]
+        self.assertEqual(self.store.save("w1", {"cookies": cookies, "current_url": None}), 2)
+        self.assertEqual(len(StateStore(self.path).load("w1")["cookies"]), 49)
+
+    def test_delete(self):
+        self.store.save("w1", {"cookies": [cookie("sid", "x")]})
+        self.store.delete("w1")
+        self.assertIsNone(self.store.load("w1"))
+        self.assertEqual(self.store.identities(), [])
+
+
+class TestSessionState(unittest.TestCase):
+    def test_sync_session_restores_lazily(self):
+        store = StateStore()
+        first = FakeSession()
+        first.use_state(store, "worker")
+        import_cookies(first.jar, [cookie("sid", "x")], clear=False)
+        first.last_html_url = "https://example.com/home"
+        first.headers["Authorization"] = "Bearer t"
+        self.assertEqual(first.save_state(), 2)
+
+        second = FakeSession()
+        second.use_state(store, "worker")
+        self.assertEqual(list(second.jar), [])
+        second.get("https://example.com/api", post=True, body={}, notify=False)
+        self.assertEqual([sent.cookies for sent in second.sent], [["sid"]])
+        self.assertEqual(second.headers["Authorization"], "Bearer t")
+
+    def test_save_before_first_request_keeps_stored_state(self):
+        store = StateStore()
+        store.save("worker", {"cookies": [cookie("sid", "x")], "last_html_url": None})
+        session = FakeSession()
+        session.use_state(store, "worker")
+        self.assertEqual(session.save_state(), 1)  # the headers, the cookie is untouched
+        self.assertEqual([c["name"] for c in store.load("worker")["cookies"]], ["sid"])
+
+    def test_save_state_needs_a_store(self):
+        with self.assertRaises(RuntimeError):
+            FakeSession().save_state()
+
+    def test_async_session(self):
+        async def main():
+            store = StateStore()
+            first = FakeAsyncSession()
+            first.use_state(store, "worker")
+            await first.navigate("https://example.com/page")
+            import_cookies(first.jar, [cookie("sid", "x")], clear=False)
+            await first.save_state()
+
+            second = FakeAsyncSession()
+            second.use_state(store, "worker")
+            await second.get("https://example.com/next")
+            return second
+
+        session = asyncio.run(main())
+        self.assertEqual(session.current_url, "https://example.com/page")
+        self.assertEqual([c.name for c in session.jar], ["sid"])
+
+
+if __name__ == "__main__":
+    unittest.main()
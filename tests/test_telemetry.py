@@ -0,0 +1,58 @@
+import asyncio
+import json
+import logging
+import unittest
+from requestez.helpers.logger import JsonFormatter
+from requestez.helpers.telemetry import RingBuffer, LogSink, Telemetry, build_record, get_telemetry
+from _fakes import FakeAsyncSession, FakeResponse, FakeSession
+
+
+class TestTelemetry(unittest.TestCase):
+    def test_records_per_session(self):
+        session = FakeSession(content=b"hello")
+        session.telemetry = Telemetry()
+        buffer = session.telemetry.add_sink(RingBuffer(maxlen=2))
+        session.get("https://example.com/a", post=True, body={"q": "1"}, notify=False)
+        with self.assertRaises(ConnectionError):
+            session.get("https://example.com/fail", notify=False)
+        first, failed = buffer.records()
+        self.assertEqual((first.method, first.status, first.host), ("POST", 200, "example.com"))
+        self.assertEqual((first.bytes_in, first.bytes_out), (5, 3))
+        self.assertIn("total", first.timings)
+        self.assertEqual(first.backend, "FakeSession")
+        self.assertIsNone(failed.status)
+        self.assertTrue(failed.error.startswith("ConnectionError"))
+        session.get("https://example.com/b", notify=False)
+        self.assertEqual(len(buffer), 2)
+
+    def test_inactive_without_sinks(self):
+        self.assertFalse(Telemetry().active)
+        buffer = RingBuffer()
+        get_telemetry().add_sink(buffer)
+        try:
+            async def main():
+                return await FakeAsyncSession(content=b'{"a": 1}').get("https://example.com/api")
+            status, _, content = asyncio.run(main())
+        finally:
+            get_telemetry().remove_sink(buffer)
+        self.assertEqual((status, content), (200, {"a": 1}))
+        self.assertEqual(buffer.records()[0].url, "https://example.com/api")
+
+    def test_json_log_field(self):
+        record = build_record("GET", "https://example.com", {}, FakeResponse("https://example.com"), total=0.5)
+        captured = []
+        handler = logging.Handler()
+        handler.emit = captured.append
+        logger = logging.getLogger("requestez")
+        logger.addHandler(handler)
+        try:
+            LogSink(level="critical")(record)
+        finally:
+            logger.removeHandler(handler)
+        payload = json.loads(JsonFormatter().format(captured[0]))
+        self.assertEqual(payload["request"]["status"], 200)
+        self.assertEqual(payload["request"]["timings"], {"total": 0.5})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+from requestez.encryption import aes_dec, aes_enc
+from requestez.helpers.tracing import disable_tracing, enable_tracing, get_tracer, span, traced
+from requestez.parsers import html
+
+
+@traced("double")
+def double(x):
+    with span("inner", size=x):
+        return x * 2
+
+
+@traced("fetch")
+async def fetch(delay):
+    await asyncio.sleep(delay)
+    return delay
+
+
+class TestTracing(unittest.TestCase):
+    def tearDown(self):
+        disable_tracing()
+
+    def test_off_by_default(self):
+        self.assertIsNone(get_tracer())
+        with span("nothing") as current:
+            self.assertIsNone(current)
+        self.assertEqual(double(2), 4)
+
+    def test_nesting_and_summary(self):
+        tracer = enable_tracing()
+        with span("outer"):
+            double(1)
+            double(2)
+            html("<p>x</p>")
+        spans = {s.name: s for s in tracer.spans}
+        self.assertIs(spans["double"].parent, spans["outer"])
+        self.assertIs(spans["inner"].parent, spans["double"])
+        self.assertEqual(spans["inner"].args, {"size": 2})
+        self.assertIn("parsers.html", spans)
+        stats = tracer.stats()
+        self.assertEqual(stats["double"]["calls"], 2)
+        self.assertLessEqual(stats["outer"]["self"], stats["outer"]["total"])
+        self.assertIn("double", tracer.summary(top=3))
+
+    def test_async_tasks_and_chrome_export(self):
+        tracer = enable_tracing()
+
+        async def main():
+            with span("crawl"):
+                await asyncio.gather(fetch(0.01), fetch(0.02))
+
+        asyncio.run(main())
+        aes_dec(b"k" * 32, b"i" * 16, aes_enc(b"k" * 32, b"i" * 16, "text"))
+        fetches = [s for s in tracer.spans if s.name == "fetch"]
+        self.assertEqual(len(fetches), 2)
+        self.assertTrue(all(s.parent.name == "crawl" for s in fetches))
+        # the two fetches overlap, together they took longer than crawl
+        crawl = next(s for s in tracer.spans if s.name == "crawl")
+        self.assertGreater(crawl.child_time, crawl.duration)
+        self.assertEqual((crawl.self_time, tracer.stats()["crawl"]["self"]), (0.0, 0.0))
+        path = os.path.join(tempfile.mkdtemp(), "trace.json")
+        tracer.export_chrome(path)
+        with open(path) as file:
+            events = json.load(file)["traceEvents"]
+        names = {event["name"] for event in events}
+        self.assertTrue({"crawl", "fetch", "encryption.aes_enc", "encryption.aes_dec"} <= names)
+        self.assertTrue(all(event["ph"] == "X" and event["dur"] >= 0 for event in events))
+
+
+if __name__ == "__main__":
+    unittest.main()